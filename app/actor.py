@@ -0,0 +1,81 @@
+import asyncio
+from typing import Any, Callable
+
+from app.error import GameError
+import app.error as err
+
+# pending jobs per game before producers are pushed back
+MOVE_QUEUE_SIZE = 64
+
+
+class GameActor:
+    """Owns one game: every job touching it runs on this task, one at a time.
+
+    Sockets `await call(...)` so a flooded table slows its own readers down;
+    HTTP and other fire-and-forget producers use `try_call`, which fails fast
+    with GAME_BUSY when the queue is full.
+    """
+
+    def __init__(self, game_id: str, maxsize: int = MOVE_QUEUE_SIZE):
+        self.game_id: str = game_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self.task: asyncio.Task = asyncio.create_task(self._run())
+
+    async def call(self, fn: Callable[..., Any], *args) -> Any:
+        fut: asyncio.Future = asyncio.get_running_loop().create_future()
+        await self.queue.put((fn, args, fut))
+        return await fut
+
+    def try_call(self, fn: Callable[..., Any], *args) -> asyncio.Future:
+        fut: asyncio.Future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((fn, args, fut))
+        except asyncio.QueueFull:
+            raise GameError(err.GAME_BUSY)
+        return fut
+
+    async def stop(self):
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        while not self.queue.empty():
+            _, _, fut = self.queue.get_nowait()
+            if not fut.done():
+                fut.set_exception(GameError(err.INVALID_GAME_ID))
+
+    async def _run(self):
+        while True:
+            fn, args, fut = await self.queue.get()
+            try:
+                result = fn(*args)
+                if asyncio.iscoroutine(result):
+                    result = await result
+            except asyncio.CancelledError:
+                if not fut.done():
+                    fut.cancel()
+                raise
+            except Exception as e:
+                if not fut.done():
+                    fut.set_exception(e)
+            else:
+                if not fut.done():
+                    fut.set_result(result)
+
+
+class ActorRegistry:
+    def __init__(self):
+        self.actors: dict[str, GameActor] = {}
+
+    def get(self, game_id: str) -> GameActor:
+        # actors are started lazily, lobby tables never pay for a task
+        actor = self.actors.get(game_id)
+        if actor is None:
+            actor = self.actors[game_id] = GameActor(game_id)
+        return actor
+
+    async def remove(self, game_id: str):
+        actor = self.actors.pop(game_id, None)
+        if actor:
+            await actor.stop()
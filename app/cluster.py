@@ -0,0 +1,55 @@
+"""Run several sharded workers on one machine.
+
+    python -m app.cluster --workers 4 --base-port 8001
+
+Worker i listens on base-port + i and is told the full node list, see
+app.shard. Clients may start on any worker and follow the redirects.
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--base-port", type=int, default=8001)
+    parser.add_argument("--public-host", default=None, help="host clients use to reach the workers (default: --host)")
+    args = parser.parse_args(argv)
+
+    public: str = args.public_host or args.host
+    ports: list[int] = [args.base_port + i for i in range(args.workers)]
+    nodes: list[str] = [f"http://{public}:{port}" for port in ports]
+
+    procs: list[subprocess.Popen] = []
+    for port, node in zip(ports, nodes):
+        env = dict(os.environ, SHARD_NODES=",".join(nodes), SHARD_SELF=node)
+        procs.append(subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--host", args.host, "--port", str(port)],
+            env=env,
+        ))
+        print(f"worker {node} pid={procs[-1].pid}", flush=True)
+
+    def stop(*_):
+        for p in procs:
+            if p.poll() is None:
+                p.send_signal(signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    try:
+        # one worker dying takes its shard down; stop the rest instead of serving holes
+        os.wait()
+    except ChildProcessError:
+        pass
+    finally:
+        stop()
+        for p in procs:
+            p.wait()
+
+
+if __name__ == "__main__":
+    main()
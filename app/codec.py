@@ -0,0 +1,342 @@
+"""Compact binary encoding of WebSocket frames (negotiated with ?fmt=bin).
+
+Models are written field by field straight into a bytearray and decoded
+back with model_construct, so no intermediate dicts are built. Card names
+travel as their index in CARD_TABLE, move types as small ids, and every
+pid appearing in a state is sent once in a per-frame table and then
+referenced by a one-byte index. All integers are little endian.
+
+    response  := u8 kind=1, i16 code, u8 flags(state|seq<<1), str16 msg,
+                 [u32 seq], [u8 npids, str8 pid*, state]
+    request   := u8 kind=2, type, u8 flags(move_data|seq<<1),
+                 [u8 n, str8 tpid*, u8 m, i16 cindex*], [u32 seq]
+    type      := u8 id | 0xff str8
+
+Inbound frames in either format go through the same limits: at most
+MAX_FRAME_BYTES encoded bytes, a type of at most MAX_TYPE_LEN and pids of
+at most MAX_PID_LEN characters, MAX_NUM_PLAYERS tpids and MAX_HAND_SIZE
+cindexs, each index inside a hand. JSON frames are validated straight from the raw text
+by BoundedMoveRequest's compiled pydantic-core validator, without an
+intermediate dict.
+"""
+import struct
+from typing import Annotated
+
+from pydantic import Field, ValidationError
+
+from app.model import Card, Player, PersonalState, SingleMoveData, WsMoveRequest, WsResponse
+from app.game import (
+    CARD_TABLE, CARD_IDS, MAX_NUM_PLAYERS, MAX_HAND_SIZE,
+    DEFAULT, TAKE_FROM_PLAYED, CHECK_PLAYER_CARDS, CHECK_EMBED_CARDS, MOVE_IMPED_CARD, PICK_FROM_EMBED,
+    EXCHANGE_WITH_EMBED, PICK_PLAYER_PICK_CARD, PICK_PLAYER, EXCHANGE_CARD, CHECK_FANREN_PLAYER, GIVE_TO_NEXT,
+)
+from app.error import GameError
+import app.error as err
+
+RESPONSE = 1
+MOVE_REQUEST = 2
+
+NONE = 0xFF
+
+# wire ids, append only
+MOVE_TYPES: list[str] = [
+    DEFAULT, TAKE_FROM_PLAYED, CHECK_PLAYER_CARDS, CHECK_EMBED_CARDS, MOVE_IMPED_CARD, PICK_FROM_EMBED,
+    EXCHANGE_WITH_EMBED, PICK_PLAYER_PICK_CARD, PICK_PLAYER, EXCHANGE_CARD, CHECK_FANREN_PLAYER, GIVE_TO_NEXT,
+]
+REQUEST_TYPES: list[str] = ["INIT", "EMB", "IMP", "PLAY", "ACK"]
+
+_MOVE_TYPE_IDS: dict[str, int] = {t: i for i, t in enumerate(MOVE_TYPES)}
+_REQUEST_TYPE_IDS: dict[str, int] = {t: i for i, t in enumerate(REQUEST_TYPES)}
+
+_RESPONSE_HEAD = struct.Struct("<BhB")
+_REQUEST_HEAD = struct.Struct("<B")
+_U16 = struct.Struct("<H")
+_I16 = struct.Struct("<h")
+_U32 = struct.Struct("<I")
+
+# inbound limits; a move request is a few hundred bytes
+MAX_FRAME_BYTES = 2048
+MAX_PID_LEN = 64
+MAX_TYPE_LEN = 32
+
+Pid = Annotated[str, Field(max_length=MAX_PID_LEN)]
+CardIndex = Annotated[int, Field(ge=0, lt=MAX_HAND_SIZE)]
+
+
+class BoundedMoveData(SingleMoveData):
+    tpids: list[Pid] = Field(max_length=MAX_NUM_PLAYERS)
+    cindexs: list[CardIndex] = Field(max_length=MAX_HAND_SIZE)
+
+
+class BoundedMoveRequest(WsMoveRequest):
+    """WsMoveRequest with the inbound limits; instances are still WsMoveRequest."""
+    type: str = Field(..., max_length=MAX_TYPE_LEN)
+    move_data: BoundedMoveData | None = None
+    seq: int | None = Field(None, ge=0)
+
+
+def _put_str8(buf: bytearray, s: str):
+    b = s.encode()
+    buf.append(len(b))
+    buf += b
+
+def _put_str16(buf: bytearray, s: str):
+    b = s.encode()
+    buf += _U16.pack(len(b))
+    buf += b
+
+def _put_type(buf: bytearray, value: str, ids: dict[str, int]):
+    i = ids.get(value)
+    if i is None:
+        buf.append(NONE)
+        _put_str8(buf, value)
+    else:
+        buf.append(i)
+
+
+class _StateEncoder:
+    __slots__ = ("buf", "pids")
+
+    def __init__(self):
+        self.buf: bytearray = bytearray()
+        self.pids: dict[str, int] = {}
+
+    def pid(self, pid: str | None):
+        if pid is None:
+            self.buf.append(NONE)
+            return
+        i = self.pids.get(pid)
+        if i is None:
+            i = self.pids[pid] = len(self.pids)
+        self.buf.append(i)
+
+    def cards(self, cards: list[Card]):
+        self.buf.append(len(cards))
+        self.buf += bytes(CARD_IDS[c.name] for c in cards)
+
+    def owned_cards(self, cards: list[tuple[str, Card]]):
+        self.buf.append(len(cards))
+        for pid, c in cards:
+            self.pid(pid)
+            self.buf.append(CARD_IDS[c.name])
+
+    def pid_list(self, pids: list[str]):
+        self.buf.append(len(pids))
+        for pid in pids:
+            self.pid(pid)
+
+    def state(self, state: PersonalState):
+        player: Player = state.player
+        self.pid(player.pid)
+        self.cards(player.hand_cards)
+        self.owned_cards(player.imped_cards)
+        self.buf.append(len(player.checked_player_cards))
+        for pid, cards in player.checked_player_cards.items():
+            self.pid(pid)
+            self.cards(cards)
+        self.owned_cards(player.checked_embed_cards)
+        self.pid_list(player.checked_players)
+
+        self.buf.append(len(state.other_cards_num))
+        for pid, n in state.other_cards_num.items():
+            self.pid(pid)
+            self.buf.append(n)
+        self.buf.append(len(state.other_imped_cards))
+        for pid, owners in state.other_imped_cards.items():
+            self.pid(pid)
+            self.pid_list(owners)
+        self.owned_cards(state.played_cards)
+        self.pid_list(state.embed_cards)
+        self.buf.append(NONE if state.curr is None else state.curr)
+        self.buf.append(int(state.started) | int(state.finished) << 1)
+        _put_type(self.buf, state.curr_move_type, _MOVE_TYPE_IDS)
+        self.pid_list(state.winners)
+
+
+def encode_response(message: WsResponse) -> bytes:
+    if message.patch is not None:
+        raise ValueError("patches are only sent in the JSON delta protocol")
+    has_state: bool = message.state is not None
+    has_seq: bool = message.seq is not None
+    buf = bytearray(_RESPONSE_HEAD.pack(RESPONSE, message.code, int(has_state) | int(has_seq) << 1))
+    _put_str16(buf, message.msg)
+    if has_seq:
+        buf += _U32.pack(message.seq)
+    if has_state:
+        enc = _StateEncoder()
+        enc.state(message.state)
+        buf.append(len(enc.pids))
+        for pid in enc.pids:
+            _put_str8(buf, pid)
+        buf += enc.buf
+    return bytes(buf)
+
+
+def encode_move_request(req: WsMoveRequest) -> bytes:
+    has_data: bool = req.move_data is not None
+    has_seq: bool = req.seq is not None
+    buf = bytearray(_REQUEST_HEAD.pack(MOVE_REQUEST))
+    _put_type(buf, req.type, _REQUEST_TYPE_IDS)
+    buf.append(int(has_data) | int(has_seq) << 1)
+    if has_data:
+        buf.append(len(req.move_data.tpids))
+        for pid in req.move_data.tpids:
+            _put_str8(buf, pid)
+        buf.append(len(req.move_data.cindexs))
+        for i in req.move_data.cindexs:
+            buf += _I16.pack(i)
+    if has_seq:
+        buf += _U32.pack(req.seq)
+    return bytes(buf)
+
+
+class _Decoder:
+    __slots__ = ("data", "pos", "pids")
+
+    def __init__(self, data: bytes):
+        self.data: bytes = data
+        self.pos: int = 0
+        self.pids: list[str] = []
+
+    def u8(self) -> int:
+        v = self.data[self.pos]
+        self.pos += 1
+        return v
+
+    def unpack(self, st: struct.Struct):
+        v = st.unpack_from(self.data, self.pos)[0]
+        self.pos += st.size
+        return v
+
+    def raw_str(self, n: int) -> str:
+        end = self.pos + n
+        if end > len(self.data):
+            raise IndexError
+        s = self.data[self.pos:end].decode()
+        self.pos = end
+        return s
+
+    def str8(self) -> str:
+        return self.raw_str(self.u8())
+
+    def str16(self) -> str:
+        return self.raw_str(self.unpack(_U16))
+
+    def type(self, table: list[str]) -> str:
+        i = self.u8()
+        return self.str8() if i == NONE else table[i]
+
+    def pid(self) -> str | None:
+        i = self.u8()
+        return None if i == NONE else self.pids[i]
+
+    def card(self) -> Card:
+        return CARD_TABLE[self.u8()]
+
+    def cards(self) -> list[Card]:
+        return [self.card() for _ in range(self.u8())]
+
+    def owned_cards(self) -> list[tuple[str, Card]]:
+        return [(self.pid(), self.card()) for _ in range(self.u8())]
+
+    def pid_list(self) -> list[str]:
+        return [self.pid() for _ in range(self.u8())]
+
+    def state(self) -> PersonalState:
+        player = Player.model_construct(
+            pid=self.pid(),
+            hand_cards=self.cards(),
+            imped_cards=self.owned_cards(),
+            checked_player_cards={self.pid(): self.cards() for _ in range(self.u8())},
+            checked_embed_cards=self.owned_cards(),
+            checked_players=self.pid_list(),
+        )
+        other_cards_num = {self.pid(): self.u8() for _ in range(self.u8())}
+        other_imped_cards = {self.pid(): self.pid_list() for _ in range(self.u8())}
+        played_cards = self.owned_cards()
+        embed_cards = self.pid_list()
+        curr = self.u8()
+        flags = self.u8()
+        return PersonalState.model_construct(
+            player=player,
+            other_cards_num=other_cards_num,
+            other_imped_cards=other_imped_cards,
+            played_cards=played_cards,
+            embed_cards=embed_cards,
+            curr=None if curr == NONE else curr,
+            started=bool(flags & 1),
+            finished=bool(flags & 2),
+            curr_move_type=self.type(MOVE_TYPES),
+            winners=self.pid_list(),
+        )
+
+    def done(self):
+        if self.pos != len(self.data):
+            raise ValueError("trailing bytes")
+
+
+def decode_response(data: bytes) -> WsResponse:
+    d = _Decoder(data)
+    kind, code, flags = _RESPONSE_HEAD.unpack_from(data, 0)
+    d.pos = _RESPONSE_HEAD.size
+    if kind != RESPONSE:
+        raise ValueError("not a response frame")
+    msg = d.str16()
+    seq = d.unpack(_U32) if flags & 2 else None
+    state = None
+    if flags & 1:
+        d.pids = [d.str8() for _ in range(d.u8())]
+        state = d.state()
+    d.done()
+    return WsResponse.model_construct(code=code, msg=msg, state=state, seq=seq, base_seq=None, patch=None)
+
+
+def frame_size(data: str | bytes) -> int:
+    # text frames count in UTF-8 bytes; only encode when characters alone cannot decide
+    if isinstance(data, bytes) or len(data) > MAX_FRAME_BYTES or len(data) * 4 <= MAX_FRAME_BYTES:
+        return len(data)
+    return len(data.encode())
+
+
+def parse_move_request(data: str | bytes) -> WsMoveRequest:
+    """Validate a JSON client frame in one pass; raises FRAME_TOO_LARGE or INVALID_PARAMS."""
+    if frame_size(data) > MAX_FRAME_BYTES:
+        raise GameError(err.FRAME_TOO_LARGE)
+    try:
+        return BoundedMoveRequest.model_validate_json(data)
+    except ValidationError:
+        raise GameError(err.INVALID_PARAMS)
+
+
+def decode_move_request(data: bytes) -> WsMoveRequest:
+    """Parse a client frame; malformed input raises GameError(INVALID_PARAMS)."""
+    if len(data) > MAX_FRAME_BYTES:
+        raise GameError(err.FRAME_TOO_LARGE)
+    try:
+        d = _Decoder(data)
+        if d.u8() != MOVE_REQUEST:
+            raise ValueError("not a move request frame")
+        type_ = d.type(REQUEST_TYPES)
+        if len(type_) > MAX_TYPE_LEN:
+            raise ValueError("type too long")
+        flags = d.u8()
+        move_data = None
+        if flags & 1:
+            n = d.u8()
+            if n > MAX_NUM_PLAYERS:
+                raise ValueError("too many tpids")
+            tpids = [d.str8() for _ in range(n)]
+            if any(len(pid) > MAX_PID_LEN for pid in tpids):
+                raise ValueError("pid too long")
+            m = d.u8()
+            if m > MAX_HAND_SIZE:
+                raise ValueError("too many cindexs")
+            cindexs = [d.unpack(_I16) for _ in range(m)]
+            if any(i < 0 or i >= MAX_HAND_SIZE for i in cindexs):
+                raise ValueError("card index out of range")
+            move_data = SingleMoveData.model_construct(tpids=tpids, cindexs=cindexs)
+        seq = d.unpack(_U32) if flags & 2 else None
+        d.done()
+    except (IndexError, ValueError, struct.error, UnicodeDecodeError):
+        raise GameError(err.INVALID_PARAMS)
+    return WsMoveRequest.model_construct(type=type_, move_data=move_data, seq=seq)
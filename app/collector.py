@@ -0,0 +1,47 @@
+import asyncio
+from typing import Any, Awaitable, Callable
+
+# why a collector resolved
+READY = "READY"      # every expected player submitted
+EXPIRED = "EXPIRED"  # the phase deadline passed
+
+
+class InterCollector:
+    """Completion of one interactive phase (EXCHANGE_CARD, GIVE_TO_NEXT,
+    CHECK_FANREN_PLAYER) of one game.
+
+    `future` resolves exactly once, from `ready()` when the game reports that
+    all expected pids have submitted or from `expire()` when the scheduler
+    deadline fires. A single task awaits it and then runs `on_done`, which
+    steps the engine and broadcasts; nothing polls.
+    """
+
+    def __init__(self, game_id: str, phase: str, on_done: Callable[["InterCollector"], Awaitable[Any]]):
+        self.game_id: str = game_id
+        self.phase: str = phase
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.task: asyncio.Task = asyncio.create_task(self._wait(on_done))
+
+    @property
+    def done(self) -> bool:
+        return self.future.done()
+
+    @property
+    def reason(self) -> str | None:
+        return self.future.result() if self.future.done() and not self.future.cancelled() else None
+
+    def ready(self):
+        if not self.future.done():
+            self.future.set_result(READY)
+
+    def expire(self):
+        if not self.future.done():
+            self.future.set_result(EXPIRED)
+
+    def cancel(self):
+        self.future.cancel()
+        self.task.cancel()
+
+    async def _wait(self, on_done: Callable[["InterCollector"], Awaitable[Any]]):
+        await self.future
+        await on_done(self)
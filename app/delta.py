@@ -0,0 +1,76 @@
+from typing import Any
+
+from app.model import PatchOp, PersonalState, WsResponse
+
+# states kept per stream; a client further behind than this gets a full snapshot
+MAX_DELTA_LAG = 16
+
+
+def _escape(key: Any) -> str:
+    return str(key).replace("~", "~0").replace("/", "~1")
+
+
+def diff(old: Any, new: Any, path: str = "") -> list[PatchOp]:
+    """JSON-patch (RFC 6902 subset) turning `old` into `new`.
+
+    Dicts are diffed key by key; lists that only grew get `add .../-` ops
+    for the new tail (played_cards, imped_cards), anything else is replaced.
+    """
+    if old == new:
+        return []
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops: list[PatchOp] = []
+        for key in old:
+            if key not in new:
+                ops.append(PatchOp(op="remove", path=f"{path}/{_escape(key)}"))
+        for key, value in new.items():
+            if key not in old:
+                ops.append(PatchOp(op="add", path=f"{path}/{_escape(key)}", value=value))
+            else:
+                ops.extend(diff(old[key], value, f"{path}/{_escape(key)}"))
+        return ops
+    if isinstance(old, list) and isinstance(new, list) and len(new) > len(old) and new[:len(old)] == old:
+        return [PatchOp(op="add", path=f"{path}/-", value=v) for v in new[len(old):]]
+    return [PatchOp(op="replace", path=path, value=new)]
+
+
+class DeltaStream:
+    """Sent-state history for one (game_id, pid); seqs come from its Session.
+
+    Every patch is computed against the last state the client acknowledged,
+    not the previous frame, so frames dropped or coalesced by the send queue
+    never leave the client without a base.
+    """
+
+    def __init__(self):
+        self.last: int | None = None
+        self.acked: int | None = None
+        self.history: dict[int, dict] = {}
+
+    def ack(self, seq: int):
+        if seq not in self.history or (self.acked is not None and seq <= self.acked):
+            return
+        self.acked = seq
+        for s in [s for s in self.history if s < seq]:
+            del self.history[s]
+
+    def reset(self):
+        # next frame is a full snapshot (INIT / new client)
+        self.acked = None
+        self.history.clear()
+
+    def next_message(self, state: PersonalState, seq: int) -> WsResponse | None:
+        data: dict = state.model_dump(mode="json")
+        base: dict | None = self.history.get(self.acked) if self.acked is not None else None
+        if base is not None and len(self.history) < MAX_DELTA_LAG:
+            ops: list[PatchOp] = diff(base, data)
+            if not ops and self.history.get(self.last) == data:
+                return None
+            self.last = seq
+            self.history[seq] = data
+            return WsResponse(seq=seq, base_seq=self.acked, patch=ops)
+        if base is None or len(self.history) >= MAX_DELTA_LAG:
+            self.history.clear()
+        self.last = seq
+        self.history[seq] = data
+        return WsResponse(seq=seq, state=state)
@@ -0,0 +1,82 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable
+
+from app.game import Game, DEFAULT
+
+# default seconds a drain waits for tables before handing them off anyway
+DRAIN_DEADLINE = 300.0
+DRAIN_POLL = 1.0
+RECONNECT = "RECONNECT"
+WS_SERVICE_RESTART = 1012
+
+# drain phases
+SERVING = "serving"
+DRAINING = "draining"  # no new tables, waiting for the live ones
+HANDOFF = "handoff"    # clients told to reconnect, about to exit
+
+
+def at_checkpoint(game: Game) -> bool:
+    # between turns: no interactive phase or follow-up move is half done
+    return game.finished or not game.started or (
+        game.curr_move_type == DEFAULT and not game.inter_move_data.ops
+    )
+
+
+class Drainer:
+    """Takes a worker out of rotation for a rolling deploy.
+
+    `start()` flips `draining`, which makes /create, /join and /queue
+    answer 503 and /health report the worker as unavailable. The drain then
+    waits until every table is finished, or, when `persistent` (snapshots
+    or the event log keep games across restarts), merely at a checkpoint.
+    Past the deadline it stops waiting. `handoff` then checkpoints the
+    games and tells clients to reconnect, and `exit` stops the process.
+    """
+
+    def __init__(self,
+                 games: dict[str, Game],
+                 handoff: Callable[[], Awaitable[Any]],
+                 exit: Callable[[], Any],
+                 persistent: bool = False,
+                 poll: float = DRAIN_POLL):
+        self.games: dict[str, Game] = games
+        self.handoff: Callable[[], Awaitable[Any]] = handoff
+        self.exit: Callable[[], Any] = exit
+        self.persistent: bool = persistent
+        self.poll: float = poll
+        self.phase: str = SERVING
+        self.deadline: float | None = None
+        self.task: asyncio.Task | None = None
+
+    @property
+    def draining(self) -> bool:
+        return self.phase != SERVING
+
+    def pending(self) -> list[str]:
+        if self.persistent:
+            return [gid for gid, g in self.games.items() if not at_checkpoint(g)]
+        return [gid for gid, g in self.games.items() if g.started and not g.finished]
+
+    def start(self, deadline: float = DRAIN_DEADLINE):
+        if self.task is not None:
+            return
+        self.phase = DRAINING
+        self.deadline = time.monotonic() + deadline
+        self.task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while self.pending() and time.monotonic() < self.deadline:
+            await asyncio.sleep(self.poll)
+        self.phase = HANDOFF
+        try:
+            await self.handoff()
+        finally:
+            self.exit()
+
+    def get_stats(self) -> dict[str, Any]:
+        return {
+            "status": self.phase,
+            "pending_games": len(self.pending()) if self.draining else 0,
+            "deadline_in": max(0, int(self.deadline - time.monotonic())) if self.deadline is not None else None,
+        }
@@ -5,6 +5,11 @@ INVALID_PLAYER_ID = "INVALID_PLAYER_ID"
 INVALID_WIN_COND = "INVALID_WIN_COND"
 INVALID_GAME_ID = "INVALID_GAME_ID"
 INVALID_PARAMS = "INVALID_PARAMS"
+GAME_BUSY = "GAME_BUSY"
+QUEUE_TIMEOUT = "QUEUE_TIMEOUT"
+FRAME_TOO_LARGE = "FRAME_TOO_LARGE"
+RATE_LIMITED = "RATE_LIMITED"
+SERVER_DRAINING = "SERVER_DRAINING"
 SYSTEM_ERROR = "SYSTEM_ERROR"
 
 class GameError(Exception):
@@ -0,0 +1,184 @@
+"""Append-only per-worker log of everything that changed a game.
+
+A game is its seed plus the ordered operations applied to it: creation
+(set_num, seed), joins, start, moves (pid, type, tpids, cindexs), resolved
+interactive phases and quits. All randomness in app.game is derived from
+the seed and Game.version, so re-executing the operations rebuilds the
+exact same table:
+
+    EVENT_LOG=/var/lib/embalming/events-8001.log uvicorn app.main:app
+    python -m app.eventlog /var/lib/embalming/events-8001.log <game_id>
+
+The file is memory-mapped and grown in CHUNK_SIZE steps. A record is a
+4-byte length followed by a marshal payload. The length is written last,
+so a worker that dies mid-append leaves a zero length and the record is
+simply not there.
+"""
+import argparse
+import marshal
+import mmap
+import os
+import struct
+from typing import Iterator
+
+from app.error import GameError
+from app.game import Game
+from app.model import SingleMoveData
+
+MAGIC = b"EGLOG\x00\x00\x01"
+CHUNK_SIZE = 1 << 20
+_LEN = struct.Struct("<I")
+
+# event kinds
+NEW = "NEW"          # set_num, seed
+JOIN = "JOIN"        # pid
+START = "START"
+QUIT = "QUIT"        # pid
+MOVE = "MOVE"        # pid, req_type, (tpids, cindexs) | None
+RESOLVE = "RESOLVE"  # interactive phase resolved
+DROP = "DROP"        # evicted, not replayed
+
+Record = tuple[str, str, tuple]
+
+
+def move_args(pid: str, req_type: str, move_data: SingleMoveData | None) -> tuple:
+    return (pid, req_type, None if move_data is None else (move_data.tpids, move_data.cindexs))
+
+
+def apply_event(game: Game, kind: str, args: tuple):
+    """Re-execute one logged operation. Only operations that changed the
+    game are logged; older logs also hold rejected ones, which fail the
+    same way here and are skipped."""
+    try:
+        if kind == JOIN:
+            game.add_player(args[0])
+        elif kind == START:
+            game.start_game()
+        elif kind == QUIT:
+            game.quit_player(args[0])
+        elif kind == MOVE:
+            pid, req_type, data = args
+            move_data = None if data is None else SingleMoveData.model_construct(tpids=list(data[0]), cindexs=list(data[1]))
+            game.apply_move(pid, req_type, move_data)
+        elif kind == RESOLVE:
+            game.resolve_inter()
+        else:
+            raise ValueError(f"unknown event {kind!r}")
+    except GameError:
+        pass
+
+
+def replay(records: Iterator[Record], game_id: str | None = None) -> dict[str, Game]:
+    """Rebuild every game (or only `game_id`) that was not dropped."""
+    games: dict[str, Game] = {}
+    for gid, kind, args in records:
+        if game_id is not None and gid != game_id:
+            continue
+        if kind == NEW:
+            games[gid] = Game(args[0], seed=args[1])
+        elif kind == DROP:
+            games.pop(gid, None)
+        elif gid in games:
+            apply_event(games[gid], kind, args)
+    return games
+
+
+class EventLog:
+    def __init__(self, path: str, chunk_size: int = CHUNK_SIZE):
+        self.path: str = path
+        self.chunk_size: int = chunk_size
+        self._open()
+
+    def _open(self):
+        path: str = self.path
+        chunk_size: int = self.chunk_size
+        self.fd: int = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        size: int = os.fstat(self.fd).st_size
+        if size == 0:
+            os.ftruncate(self.fd, chunk_size)
+            os.pwrite(self.fd, MAGIC, 0)
+            size = chunk_size
+        self.mm: mmap.mmap = mmap.mmap(self.fd, size)
+        if self.mm[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not an event log")
+        self.end: int = len(MAGIC)
+        self.count: int = 0
+        for _ in self.records():
+            self.count += 1
+
+    def _scan(self) -> Iterator[tuple[int, bytes]]:
+        off: int = len(MAGIC)
+        size: int = len(self.mm)
+        while off + _LEN.size <= size:
+            (n,) = _LEN.unpack_from(self.mm, off)
+            if n == 0 or off + _LEN.size + n > size:
+                break
+            yield off + _LEN.size + n, self.mm[off + _LEN.size:off + _LEN.size + n]
+            off += _LEN.size + n
+
+    def records(self) -> Iterator[Record]:
+        for end, payload in self._scan():
+            try:
+                record = marshal.loads(payload)
+            except (EOFError, ValueError, TypeError):
+                break # torn tail
+            self.end = end
+            yield record
+
+    def append(self, game_id: str, kind: str, *args):
+        payload: bytes = marshal.dumps((game_id, kind, args))
+        need: int = self.end + _LEN.size + len(payload)
+        if need + _LEN.size > len(self.mm):
+            self.mm.resize((need // self.chunk_size + 1) * self.chunk_size)
+        self.mm[self.end + _LEN.size:need] = payload
+        _LEN.pack_into(self.mm, self.end, len(payload))
+        self.end = need
+        self.count += 1
+
+    def flush(self):
+        # appends are in the page cache already and survive a process crash;
+        # flush only matters for losing the whole machine
+        self.mm.flush()
+
+    def restore(self) -> dict[str, Game]:
+        """Replay the log and rewrite it with only the games still live."""
+        records: list[Record] = list(self.records())
+        games: dict[str, Game] = replay(iter(records))
+        live: dict[str, Game] = {gid: g for gid, g in games.items() if not g.finished}
+        if os.path.exists(self.path + ".tmp"):
+            os.unlink(self.path + ".tmp") # left over from an interrupted restore
+        tmp = EventLog(self.path + ".tmp", self.chunk_size)
+        for gid, kind, args in records:
+            if gid in live:
+                tmp.append(gid, kind, *args)
+        tmp.close()
+        self.close()
+        os.replace(self.path + ".tmp", self.path)
+        self._open()
+        return live
+
+    def get_stats(self) -> dict[str, int]:
+        return {"event_log_records": self.count, "event_log_bytes": self.end}
+
+    def close(self):
+        if not self.mm.closed:
+            self.mm.flush()
+            self.mm.close()
+        os.close(self.fd)
+
+
+def from_env() -> EventLog | None:
+    path: str | None = os.environ.get("EVENT_LOG")
+    return EventLog(path) if path else None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="replay an event log and print the rebuilt games")
+    parser.add_argument("path")
+    parser.add_argument("game_id", nargs="?")
+    args = parser.parse_args()
+    log = EventLog(args.path)
+    for gid, game in replay(log.records(), args.game_id).items():
+        print(gid, game.get_state().model_dump_json())
+    log.close()
@@ -1,9 +1,9 @@
 import random
+import functools
+import marshal
 from app.model import Card, SingleMoveData, InterMoveData, Player, GameState, PersonalState, GameInfo
 from app.error import GameError
 import app.error as err
-import asyncio
-import time
 
 # <===== global const =====>
 MAX_NUM_PLAYERS = 6
@@ -19,23 +19,76 @@ PICK_FROM_EMBED = "PICK_FROM_EMBED"
 EXCHANGE_WITH_EMBED = "EXCHANGE_WITH_EMBED"
 PICK_PLAYER_PICK_CARD = "PICK_PLAYER_PICK_CARD"
 PICK_PLAYER = "PICK_PLAYER"
-SINGLE_MOVE_TYPES: list[str] = [
-    DEFAULT, TAKE_FROM_PLAYED, CHECK_PLAYER_CARDS, CHECK_EMBED_CARDS, MOVE_IMPED_CARD, PICK_FROM_EMBED, PICK_PLAYER_PICK_CARD, PICK_PLAYER
-]
+SINGLE_MOVE_TYPES: frozenset[str] = frozenset([
+    DEFAULT, TAKE_FROM_PLAYED, CHECK_PLAYER_CARDS, CHECK_EMBED_CARDS, MOVE_IMPED_CARD, PICK_FROM_EMBED, EXCHANGE_WITH_EMBED,
+    PICK_PLAYER_PICK_CARD, PICK_PLAYER,
+])
 
 # interact move type
 EXCHANGE_CARD = "EXCHANGE_CARD"
 CHECK_FANREN_PLAYER = "CHECK_FANREN_PLAYER"
 GIVE_TO_NEXT = "GIVE_TO_NEXT"
-INTER_MOVE_TYPES: list[str] = [
+INTER_MOVE_TYPES: frozenset[str] = frozenset([
     EXCHANGE_CARD, CHECK_FANREN_PLAYER, GIVE_TO_NEXT
-]
+])
+
+# seconds an interactive phase stays open before it is resolved by the scheduler
+PHASE_TIMEOUTS: dict[str, float] = {
+    EXCHANGE_CARD: 30.0,
+    CHECK_FANREN_PLAYER: 10.0,
+    GIVE_TO_NEXT: 30.0,
+}
 
 # success type
 ADD_PLAYER = "ADD_PLAYER"
 START_GAME = "START_GAME"
 QUIT_PLAYER = "QUIT_PLAYER"
 
+# static card table, a card id is its index here
+CARD_TABLE: list[Card] = [
+    Card(name='xue-sheng-hui-zhang', point=3),
+    Card(name='bao-jian-wei-yuan', point=1),
+    Card(name='tu-shu-wei-yuan', point=1),
+    Card(name='feng-ji-wei-yuan', point=1),
+    Card(name='da-xiao-jie', point=1),
+    Card(name='xin-wen-bu', point=1),
+    Card(name='ban-zhang', point=2),
+    Card(name='you-deng-sheng', point=2),
+    Card(name='fan-ren', point=0),
+    Card(name='gong-fan', point=0),
+    Card(name='wai-xing-ren', point=-1),
+    Card(name='gan-ran-zhe', point=0),
+    Card(name='gui-zhai-bu', point=0),
+]
+CARD_IDS: dict[str, int] = {c.name: i for i, c in enumerate(CARD_TABLE)}
+
+# bumped whenever the layout written by Game.dump changes
+SNAPSHOT_FORMAT = 2
+
+CARD_POINTS: tuple[int, ...] = tuple(c.point for c in CARD_TABLE)
+(
+    XUE_SHENG_HUI_ZHANG, BAO_JIAN_WEI_YUAN, TU_SHU_WEI_YUAN, FENG_JI_WEI_YUAN, DA_XIAO_JIE, XIN_WEN_BU,
+    BAN_ZHANG, YOU_DENG_SHENG, FAN_REN, GONG_FAN, WAI_XING_REN, GAN_RAN_ZHE, GUI_ZHAI_BU,
+) = range(len(CARD_TABLE))
+GOOD_CARDS: frozenset[int] = frozenset([
+    XUE_SHENG_HUI_ZHANG, BAO_JIAN_WEI_YUAN, TU_SHU_WEI_YUAN, FENG_JI_WEI_YUAN,
+    DA_XIAO_JIE, XIN_WEN_BU, BAN_ZHANG, YOU_DENG_SHENG,
+])
+
+# move type entered after playing a card (gan-ran-zhe is handled separately)
+# TODO(规则待定): CHECK_FANREN_PLAYER 目前没有卡牌触发，原来的 you-deng-sheng 分支与 CHECK_EMBED_CARDS 重复；
+# 阶段本身和结算保留，确定由哪张牌触发后在这里接上
+PLAY_EFFECTS: dict[int, str] = {
+    BAO_JIAN_WEI_YUAN: TAKE_FROM_PLAYED,
+    FENG_JI_WEI_YUAN: CHECK_PLAYER_CARDS,
+    DA_XIAO_JIE: PICK_PLAYER_PICK_CARD,
+    YOU_DENG_SHENG: CHECK_EMBED_CARDS,
+    GONG_FAN: MOVE_IMPED_CARD,
+    GUI_ZHAI_BU: EXCHANGE_WITH_EMBED,
+    BAN_ZHANG: PICK_PLAYER,
+    XIN_WEN_BU: GIVE_TO_NEXT,
+}
+
 PLYAER_NUM_EMP_POINTS: dict = {
     3: 9,
     4: 8,
@@ -43,28 +96,108 @@ PLYAER_NUM_EMP_POINTS: dict = {
     6: 6,
 }
 
+def build_deck(num_players: int) -> list[int]:
+    counts: list[tuple[int, int]] = [
+        (XUE_SHENG_HUI_ZHANG, 3),
+        (BAO_JIAN_WEI_YUAN, 2),
+        (TU_SHU_WEI_YUAN, 3 if num_players == 5 else 2),
+        (FENG_JI_WEI_YUAN, 1 if num_players == 3 else 2),
+        (DA_XIAO_JIE, 2 if num_players == 3 else 3),
+        (XIN_WEN_BU, 2 if num_players == 3 else 3),
+        (BAN_ZHANG, 2),
+        (YOU_DENG_SHENG, 1 if num_players == 3 else 2),
+        (FAN_REN, 1),
+        (GONG_FAN, 0 if num_players == 3 else 1),
+        (WAI_XING_REN, 1),
+        (GAN_RAN_ZHE, 1),
+        (GUI_ZHAI_BU, 2 if num_players == 3 else 3),
+    ]
+    return [cid for cid, n in counts for _ in range(n)]
+
+# a hand never holds more than the whole deck; bounds card indexes in requests
+MAX_HAND_SIZE: int = max(len(build_deck(n)) for n in range(MIN_NUM_PLAYERS, MAX_NUM_PLAYERS + 1))
+
+def to_cards(cids) -> list[Card]:
+    return [CARD_TABLE[c] for c in cids]
+
+def mutates(fn):
+    # 成功修改局面的方法会推进 version，缓存的视图据此失效；
+    # 方法先校验再修改，抛出 GameError 时局面和 version 都不变
+    @functools.wraps(fn)
+    def wrapper(self, *args, **kwargs):
+        result = fn(self, *args, **kwargs)
+        self.version += 1
+        return result
+    return wrapper
+
+# <===== Seat =====>
+class Seat:
+    """Engine-side player. Cards are CARD_TABLE ids kept in bytearrays; the
+    pydantic Player is only built by to_model() at the API boundary."""
+
+    __slots__ = (
+        "pid", "hand", "imped_pids", "imped",
+        "checked_player_cards", "checked_embed_pids", "checked_embed", "checked_players",
+    )
+
+    def __init__(self, pid: str):
+        self.pid: str = pid
+        self.hand: bytearray = bytearray()
+        self.imped_pids: list[str] = [] # imped_pids[i] imprisoned imped[i]
+        self.imped: bytearray = bytearray()
+        self.checked_player_cards: dict[str, bytes] = {}
+        self.checked_embed_pids: list[str] = []
+        self.checked_embed: bytes = b""
+        self.checked_players: list[str] = []
+
+    def dump(self) -> tuple:
+        return (
+            self.pid, bytes(self.hand), self.imped_pids, bytes(self.imped),
+            self.checked_player_cards, self.checked_embed_pids, bytes(self.checked_embed), self.checked_players,
+        )
+
+    @classmethod
+    def load(cls, row: tuple) -> "Seat":
+        seat = cls(row[0])
+        seat.hand = bytearray(row[1])
+        seat.imped_pids = list(row[2])
+        seat.imped = bytearray(row[3])
+        seat.checked_player_cards = dict(row[4])
+        seat.checked_embed_pids = list(row[5])
+        seat.checked_embed = row[6]
+        seat.checked_players = list(row[7])
+        return seat
+
+    def to_model(self) -> Player:
+        return Player.model_construct(
+            pid=self.pid,
+            hand_cards=to_cards(self.hand),
+            imped_cards=list(zip(self.imped_pids, to_cards(self.imped))),
+            checked_player_cards={pid: to_cards(cids) for pid, cids in self.checked_player_cards.items()},
+            checked_embed_cards=list(zip(self.checked_embed_pids, to_cards(self.checked_embed))),
+            checked_players=list(self.checked_players),
+        )
+
 # <===== Game Class =====>
 class Game:
     def __init__(self, 
                 #  game_id: str, 
                 #  mode: bool, 
                  set_num: int,
-                 timeout: float = 30.0):
+                 timeout: float = 30.0,
+                 seed: int | None = None):
         if ((set_num < MIN_NUM_PLAYERS) or set_num > MAX_NUM_PLAYERS):
             raise GameError(err.INVALID_PLAYER_NUM)
         
         # self.id: str = game_id
         
-        self.players: list[Player] = []
-        
-        # self.hand_cards: dict[int, list[Card]] = {}
-        # self.imped_cards: dict[int, list[tuple[int, Card]]] = {} # tpid, pid, c
-        # self.checked_player_cards: dict[int, dict[int, list[str]]] = {}
-        # self.checked_embed_cards: dict[int, list[str]] = {}
-        # self.checked_players: dict[int, list[int]] = {}
+        self.players: list[Seat] = []
 
-        self.played_cards: list[tuple[str, Card]] = []
-        self.embed_cards: list[tuple[str, Card]] = [] # pid, c
+        # zones: card ids plus, at the same index, the pid that put the card there
+        self.played_pids: list[str] = []
+        self.played: bytearray = bytearray()
+        self.embed_pids: list[str] = []
+        self.embed: bytearray = bytearray()
 
         self.curr: int = None # 只负责三大操作的处理
         self.jump_curr: int = None
@@ -72,26 +205,62 @@ class Game:
         # self.advanced_mode: bool = mode
 
         self.set_num: int = set_num
+        # 所有随机性（发牌、超时补牌）都由 seed 推出，见 app.eventlog 的重放
+        self.seed: int = random.getrandbits(63) if seed is None else seed
         self.started: bool = False
         self.finished: bool = False
         
-        # self.avail_ids: set[int] = set([x for x in range(set_num)])
         self.pid_int_map: dict[str, int] = {}
         
         self.curr_move_type: str = DEFAULT
         self.jump_move_type: str = DEFAULT
 
-        # self.timeout: float = timeout
-        # self.start_time: float = 0.0
-
-        self.inter_move_data: InterMoveData = None
+        # data submitted in the current interactive phase, pid -> move
+        self.inter_move_data: InterMoveData = InterMoveData(ops={})
         self.inter_data_num: int = 0
+        self.t_pid_interact: str = None
 
-        self.timer_started: bool = False
+        # monotonically increasing state version, bumped by every successful @mutates call
+        self.version: int = 0
+        self._views: dict[str, tuple[int, PersonalState]] = {}
+        self._winners: tuple[int, list[str]] = (-1, [])
 
-        # self.permitted = False
-        # self.op_lock = asyncio.Lock()
+        # 并发由 app.actor.GameActor 保证：同一局的所有操作在一个 task 中串行执行
     
+    def dump(self) -> bytes:
+        """Compact snapshot of the whole table (marshal of plain tuples, no caches)."""
+        return marshal.dumps((
+            SNAPSHOT_FORMAT, self.version, self.set_num, self.seed, self.started, self.finished,
+            self.curr, self.jump_curr, self.curr_move_type, self.jump_move_type, self.t_pid_interact,
+            {pid: (m.tpids, m.cindexs) for pid, m in self.inter_move_data.ops.items()},
+            self.played_pids, bytes(self.played), self.embed_pids, bytes(self.embed),
+            [p.dump() for p in self.players],
+        ))
+
+    @classmethod
+    def load(cls, data: bytes) -> "Game":
+        row = marshal.loads(data)
+        if row[0] != SNAPSHOT_FORMAT:
+            raise ValueError(f"unsupported snapshot format {row[0]}")
+        (_, version, set_num, seed, started, finished,
+         curr, jump_curr, curr_move_type, jump_move_type, t_pid_interact,
+         ops, played_pids, played, embed_pids, embed, players) = row
+        game = cls(set_num, seed=seed)
+        game.version = version
+        game.started, game.finished = started, finished
+        game.curr, game.jump_curr = curr, jump_curr
+        game.curr_move_type, game.jump_move_type = curr_move_type, jump_move_type
+        game.t_pid_interact = t_pid_interact
+        game.inter_move_data = InterMoveData.model_construct(ops={
+            pid: SingleMoveData.model_construct(tpids=list(t), cindexs=list(c)) for pid, (t, c) in ops.items()
+        })
+        game.inter_data_num = len(ops)
+        game.played_pids, game.played = list(played_pids), bytearray(played)
+        game.embed_pids, game.embed = list(embed_pids), bytearray(embed)
+        game.players = [Seat.load(p) for p in players]
+        game.pid_int_map = {p.pid: i for i, p in enumerate(game.players)}
+        return game
+
     def get_info(self) -> GameInfo:
         return GameInfo(
             game_id=None,
@@ -101,59 +270,109 @@ class Game:
         )
     
     def get_state(self) -> GameState:
-        winners = self._calc_winner()
-        return GameState(
-            players=self.players,
-            played_cards = self.played_cards,
-            embed_cards=self.embed_cards,
+        return GameState.model_construct(
+            players=[p.to_model() for p in self.players],
+            played_cards=list(zip(self.played_pids, to_cards(self.played))),
+            embed_cards=list(zip(self.embed_pids, to_cards(self.embed))),
             curr=self.curr,
-            # set_num=self.set_num,
             started=self.started,
             finished=self.finished,
             curr_move_type=self.curr_move_type,
-            jump_move_type=self.jump_move_type,
-            winners = winners,
+            winners=self.get_winners(),
         )
     
+    def get_winners(self) -> list[str]:
+        if self._winners[0] != self.version:
+            self._winners = (self.version, self._calc_winner())
+        return self._winners[1]
+
     def get_personal_state(self, pid: str) -> PersonalState:
-        winners = self._calc_winner()
-        try:
-            player: Player = [p for p in self.players if p.pid == pid][0]
-            other_players: list[Player] = [p for p in self.players if p.pid != pid]
-        except:
+        # views are cached per pid against the state version, rebuilt lazily on the first read after a move
+        cached = self._views.get(pid)
+        if cached is not None and cached[0] == self.version:
+            return cached[1]
+        if pid not in self.pid_int_map:
             raise GameError(err.INVALID_PLAYER_ID)
-        return PersonalState(
-            player=player,
-            other_cards_num={
-                p.pid: len(p.hand_cards)
-                for p in other_players
-            },
-            other_imped_cards={
-                p.pid: [c[0] for c in p.imped_cards]
-                for p in other_players
-            },
-            played_cards = self.played_cards,
-            embed_cards=[c[0] for c in self.embed_cards],
+        seat: Seat = self.players[self.pid_int_map[pid]]
+        other_players: list[Seat] = [p for p in self.players if p is not seat]
+        state = PersonalState.model_construct(
+            player=seat.to_model(),
+            other_cards_num={p.pid: len(p.hand) for p in other_players},
+            other_imped_cards={p.pid: list(p.imped_pids) for p in other_players},
+            played_cards=list(zip(self.played_pids, to_cards(self.played))),
+            embed_cards=list(self.embed_pids),
             curr=self.curr,
-            # set_num=self.set_num,
             started=self.started,
             finished=self.finished,
             curr_move_type=self.curr_move_type,
-            winners = winners,
+            winners=self.get_winners(),
         )
+        self._views[pid] = (self.version, state)
+        return state
         
     def _next(self):
         for _ in range(len(self.players)):
             self.curr = (self.curr + 1) % len(self.players) 
-            if len(self.players[self.curr].hand_cards) > 1:
-                if self.jump_curr and (self.jump_curr == self.curr):
+            if len(self.players[self.curr].hand) > 1:
+                if self.jump_curr is not None and (self.jump_curr == self.curr):
                     self.curr_move_type = self.jump_move_type
                     self.jump_curr = None
                     self.jump_move_type = None
                 return
         # no next player, game is finished
         self.finished = True
+
+    def _expect(self, move_type: str):
+        if self.curr_move_type != move_type:
+            raise GameError(err.INVALID_MOVE)
+
+    def _curr_pid(self) -> str | None:
+        if self.curr is None or not 0 <= self.curr < len(self.players):
+            return None
+        return self.players[self.curr].pid
+
+    def _seat(self, pid: str) -> Seat:
+        try:
+            return self.players[self.pid_int_map[pid]]
+        except Exception:
+            raise GameError(err.INVALID_MOVE)
+
+    def _pop_hand_card(self, move_data: SingleMoveData) -> int:
+        # emb / imp / play 共用：当前玩家在 DEFAULT 阶段打出一张非犯人卡
+        self._expect(DEFAULT)
+        try:
+            hand: bytearray = self.players[self.curr].hand
+            cindex: int = move_data.cindexs[0]
+            cid: int = hand[cindex]
+        except Exception:
+            raise GameError(err.INVALID_MOVE)
+        if cid == FAN_REN:
+            raise GameError(err.INVALID_MOVE, "不可主动使用犯人卡")
+        return hand.pop(cindex)
     
+    def apply_move(self, pid: str, req_type: str, move_data: SingleMoveData | None) -> bool:
+        """Single entry point for both transports; returns True when the state changed.
+
+        EMB / IMP / PLAY are looked up by request type, anything else by the
+        current phase. Interactive phases only collect data until their
+        expected players have submitted or the phase deadline passes; the
+        caller then runs resolve_inter().
+        """
+        if self.finished:
+            raise GameError(err.INVALID_MOVE, "游戏已结束")
+        spec: MoveSpec | None = ACTION_MOVES.get(req_type) or PHASE_MOVES.get(self.curr_move_type)
+        if spec is None:
+            raise GameError(err.INVALID_MOVE)
+        spec.validate(move_data)
+        if spec.interactive:
+            self.collect_interdata(pid, move_data)
+            return False
+        if not self.started or self._curr_pid() != pid:
+            raise GameError(err.INVALID_PLAYER_ID, "不是你的回合")
+        getattr(self, spec.method)(move_data)
+        return True
+
+    @mutates
     def add_player(self, pid: str):
         if self.started:
             raise GameError(err.INVALID_MOVE)
@@ -162,35 +381,62 @@ class Game:
         if pid in self.pid_int_map.keys():
             raise GameError(err.INVALID_PLAYER_ID)
         
-        self.players.append(Player(pid=pid))
+        self.players.append(Seat(pid))
         self.pid_int_map[pid] = len(self.players) - 1
     
+    @mutates
     def quit_player(self, pid: str):
         if not self.started:
             raise GameError(err.INVALID_MOVE)
         if len(self.players) == 0:
             raise GameError(err.INVALID_PLAYER_NUM)
         try:
-            self.pid_int_map.pop(pid)
+            pos: int = self.pid_int_map.pop(pid)
         except:
             raise GameError(err.INVALID_PLAYER_ID)
 
+        self._views.pop(pid, None)
+        # 已提交的交互数据作废，结算时只看仍在座的玩家
+        if self.inter_move_data.ops.pop(pid, None) is not None:
+            self.inter_data_num = len(self.inter_move_data.ops)
         self.players = [p for p in self.players if p.pid != pid]
         for i, p in enumerate(self.players):
             self.pid_int_map[p.pid] = i
-        
+
+        # curr / jump_curr 是座位下标，前面的座位离开后要前移
+        if self.jump_curr is not None:
+            if self.jump_curr == pos:
+                self.jump_curr = None
+                self.jump_move_type = DEFAULT
+            elif self.jump_curr > pos:
+                self.jump_curr -= 1
+        if self.curr is None or self.finished:
+            return
+        if self.curr > pos:
+            self.curr -= 1
+        elif self.curr == pos:
+            # 当前玩家离开：他开启的阶段作废，轮到原本的下一位；没人能出牌时游戏结束
+            self._reset_inter()
+            self.curr_move_type = DEFAULT
+            self.curr = pos - 1
+            self._next()
+
     def _calc_winner(self) -> list[str]:
-        if self.finished == False:
+        if self.finished == False or not self.players:
             return []
         winner: list[str] = []
 
+        # 结束时每人最多剩一张牌即身份牌；传牌、换牌可能让人手牌为空，这样的玩家没有身份，不参与按身份判定
         for p in self.players:
-            if len(p.hand_cards) != 1:
+            if len(p.hand) > 1:
                 raise GameError(err.INVALID_WIN_COND)
+        roles: dict[str, int] = {p.pid: p.hand[0] for p in self.players if p.hand}
+        # 达标分数按开局人数，中途有人离开也不变
+        required_points: int = PLYAER_NUM_EMP_POINTS[self.set_num]
 
-        embed_points: int = sum([c.point for _, c in self.embed_cards])
+        embed_points: int = sum([CARD_POINTS[c] for c in self.embed])
         imped_points: dict[str, int] = {
-            p.pid: sum([c.point for _, c in p.imped_cards])
+            p.pid: sum([CARD_POINTS[c] for c in p.imped])
             for p in self.players
         }
         max_imped_points = max(imped_points.values())
@@ -198,48 +444,38 @@ class Game:
         # if waixingren imped, waixingren wins
         max_imped_pids: list[str] = [k for k, v in imped_points.items() if v == max_imped_points]
         if len(max_imped_pids) != len(self.players):
-            winner = [pid for pid in max_imped_points if self.players[self.pid_int_map[pid]].hand_cards[0].name == 'wai-xing-ren']
+            winner = [pid for pid in max_imped_pids if roles.get(pid) == WAI_XING_REN]
             if len(winner) == 1:
                 return winner
         else:
             max_imped_pids = []
         
         # if emb fails, ganranzhe wins
-        if embed_points < PLYAER_NUM_EMP_POINTS[len(self.players)]:
-            winner = [p.pid for p in self.players if p.hand_cards[0].name == 'gan-ran-zhe']
+        if embed_points < required_points:
+            winner = [pid for pid, c in roles.items() if c == GAN_RAN_ZHE]
             if len(winner) == 1:
                 return winner
         
         # if fanren not imped, fanren and gongfan win
-        n_max_imped_pids: list[str] = [k for k in range(len(self.players)) if k not in max_imped_pids]
-        winner = [pid for pid in n_max_imped_pids if self.players[self.pid_int_map[pid]].hand_cards[0].name == 'fan-ren']
+        winner = [pid for pid, c in roles.items() if pid not in max_imped_pids and c == FAN_REN]
         if len(winner) == 1:
-            winner.extend([p.pid for p in self.players if p.hand_cards[0].name == 'gong-fan'])
+            winner.extend([pid for pid, c in roles.items() if c == GONG_FAN])
             return winner
         
         # if emb points >= required, good characters win
-        if embed_points >= PLYAER_NUM_EMP_POINTS[len(self.players)]:
-            good_names = [
-                'xue-sheng-hui-zhang', 
-                'bao-jian-wei-yuan',
-                'tu-shu-wei-yuan',
-                'feng-ji-wei-yuan',
-                'da-xiao-jie',
-                'xin-wen-bu',
-                'ban-zhang',
-                'you-deng-sheng',
-            ]
-            winner = [p.pid for p in self.players if p.hand_cards[0].name in good_names]
+        if embed_points >= required_points:
+            winner = [pid for pid, c in roles.items() if c in GOOD_CARDS]
             if len(winner) != 0:
                 return winner
         
         # no one wins then guizhaibu wins
-        winner = [p.pid for p in self.players if p.hand_cards[0].name == 'gui-zhai-bu']
+        winner = [pid for pid, c in roles.items() if c == GUI_ZHAI_BU]
         if len(winner) != 0:
             return winner
         
         return winner
         
+    @mutates
     def start_game(self):
         if self.started:
             raise GameError(err.INVALID_MOVE)
@@ -250,350 +486,343 @@ class Game:
         self.curr_move_type = DEFAULT
         
         # generate deck
-        deck: list[Card] = (
-            [Card(name='xue-sheng-hui-zhang', point=3)] * 3 +
-            [Card(name='bao-jian-wei-yuan', point=1)] * 2 +
-            [Card(name='tu-shu-wei-yuan', point=1)] * (3 if len(self.players) == 5 else 2) +
-            [Card(name='feng-ji-wei-yuan', point=1)] * (1 if len(self.players) == 3 else 2) +
-            [Card(name='da-xiao-jie', point=1)] * (2 if len(self.players) == 3 else 3) +
-            [Card(name='xin-wen-bu', point=1)] * (2 if len(self.players) == 3 else 3) +
-            [Card(name='ban-zhang', point=2)] * 2 +
-            [Card(name='you-deng-sheng', point=2)] * (1 if len(self.players) == 3 else 2) +
-            [Card(name='fan-ren', point=0)] * 1 +
-            [Card(name='gong-fan', point=0)] * (0 if len(self.players) == 3 else 1) +
-            [Card(name='wai-xing-ren', point=-1)] * 1 +
-            [Card(name='gan-ran-zhe', point=0)] * 1 +
-            [Card(name='gui-zhai-bu', point=0)] * (2 if len(self.players) == 3 else 3)
-        )
+        deck: list[int] = build_deck(len(self.players))
         num_card_p = len(deck) // len(self.players)
         
         # dispatch cards
-        random.shuffle(deck)
-        for p in self.players:
-            p.hand_cards = deck[:num_card_p]
-            deck = deck[num_card_p:]
+        self._rng().shuffle(deck)
+        for i, p in enumerate(self.players):
+            p.hand = bytearray(deck[i * num_card_p:(i + 1) * num_card_p])
 
         # determine start player
         for i, p in enumerate(self.players):
-            start_card = [x for x in p.hand_cards if x.name == 'xue-sheng-hui-zhang']
-            if (len(start_card) > 0):
+            if XUE_SHENG_HUI_ZHANG in p.hand:
                 self.curr = i
                 break
-        
 
-    def inter_is_ready(self, req_num: int) -> bool:
-        return self.inter_data_num == req_num 
-    
-    def timer(self, duration: float) -> bool:
-        if self.timer_started == True:
-            return False
-        
-        import time
-        start: float = time.time()
-        while (True):
-            if time.time() - start >= duration:
-                self.timer_started = False
-                return True
+    def inter_pids(self) -> frozenset[str]:
+        # seated players expected to submit in the current interactive phase
+        if self.curr_move_type == EXCHANGE_CARD:
+            pids = [self._curr_pid(), self.t_pid_interact]
+        elif self.curr_move_type == GIVE_TO_NEXT:
+            pids = [p.pid for p in self.players if p.hand]
+        elif self.curr_move_type == CHECK_FANREN_PLAYER:
+            pids = [p.pid for p in self.players if FAN_REN in p.hand or WAI_XING_REN in p.hand]
+        else:
+            pids = []
+        return frozenset(pid for pid in pids if pid in self.pid_int_map)
+
+    def inter_is_ready(self) -> bool:
+        return self.inter_pids() <= self.inter_move_data.ops.keys()
 
+    @mutates
     def collect_interdata(self, pid: str, move_data: SingleMoveData):
-        try:
-            self.inter_data_num += 1
-            self.inter_move_data.ops[pid] = move_data
-        except:
+        if pid not in self.inter_pids():
+            raise GameError(err.INVALID_PLAYER_ID)
+        if pid in self.inter_move_data.ops:
+            raise GameError(err.INVALID_MOVE, "已经提交过")
+        if PHASE_MOVES[self.curr_move_type].cindexs:
+            # 提交时就校验下标，结算时不会再失败
+            try:
+                self._seat(pid).hand[move_data.cindexs[0]]
+            except Exception:
+                raise GameError(err.INVALID_MOVE)
+        self.inter_move_data.ops[pid] = move_data
+        self.inter_data_num = len(self.inter_move_data.ops)
+
+    def resolve_inter(self):
+        """Run the current interactive phase with whatever was submitted.
+
+        Called once per phase, when inter_is_ready() or at the phase deadline;
+        players who must give up a card but never answered get a random one.
+        """
+        spec: MoveSpec | None = PHASE_MOVES.get(self.curr_move_type)
+        if spec is None or not spec.interactive:
             raise GameError(err.INVALID_MOVE)
+        ops: dict[str, SingleMoveData] = self.inter_move_data.ops
+        if spec.cindexs:
+            rng: random.Random = self._rng()
+            for pid in sorted(self.inter_pids() - ops.keys()):
+                hand: bytearray = self._seat(pid).hand
+                if hand: # 手牌为空的玩家无牌可交
+                    ops[pid] = SingleMoveData.model_construct(tpids=[], cindexs=[rng.randrange(len(hand))])
+        getattr(self, spec.method)()
+
+    def _rng(self) -> random.Random:
+        # 由 seed 和 version 决定，快照无需保存随机数状态，重放得到同样的结果
+        return random.Random(self.seed + self.version)
+
+    def _reset_inter(self):
+        self.inter_move_data = InterMoveData(ops={})
+        self.inter_data_num = 0
+        self.t_pid_interact = None
 
     # moves
+    @mutates
     def emb_card(self, move_data: SingleMoveData):
-        try: 
-            assert self.curr_move_type == DEFAULT
-            if self.players[self.curr].hand_cards[move_data.cindexs[0]].name == 'fan-ren':
-                raise GameError(err.INVALID_MOVE, "不可主动使用犯人卡")
-            embed_card: Card = self.players[self.curr].hand_cards.pop(move_data.cindexs[0])
-        except GameError as e:
-            raise GameError(e.code, e.detail)
-        except Exception:
-            raise GameError(err.INVALID_MOVE)
-        
-        self.embed_cards.append((self.players[self.curr].pid, embed_card))
+        cid: int = self._pop_hand_card(move_data)
+        self.embed_pids.append(self.players[self.curr].pid)
+        self.embed.append(cid)
         self._next()
     
+    @mutates
     def imp_card(self, move_data: SingleMoveData):
-        try: 
-            assert self.curr_move_type == DEFAULT
-            if self.players[self.curr].hand_cards[move_data.cindexs[0]].name == 'fan-ren':
-                raise GameError(err.INVALID_MOVE, "不可主动使用犯人卡")
-            imped_card: Card = self.players[self.curr].hand_cards.pop(move_data.cindexs[0])
-        except GameError as e:
-            raise GameError(e.code, e.detail)
+        self._expect(DEFAULT)
+        try:
+            target: Seat = self._seat(move_data.tpids[0])
         except Exception:
             raise GameError(err.INVALID_MOVE)
-        
-        self.players[self.pid_int_map[move_data.tpids[0]]].imped_cards.append((self.players[self.curr].pid, imped_card))
+        cid: int = self._pop_hand_card(move_data)
+        target.imped_pids.append(self.players[self.curr].pid)
+        target.imped.append(cid)
         self._next()  
 
+    @mutates
     def play_card(self, move_data: SingleMoveData):
-        try:
-            assert self.curr_move_type == DEFAULT
-            if self.players[self.curr].hand_cards[move_data.cindexs[0]].name == 'fan-ren':
-                raise GameError(err.INVALID_MOVE, "不可主动使用犯人卡")
-            played_card: Card = self.players[self.curr].hand_cards.pop(move_data.cindexs[0])
-        except GameError as e:
-            raise GameError(e.code, e.detail)
-        except Exception:
-            raise GameError(err.INVALID_MOVE)
+        cid: int = self._pop_hand_card(move_data)
+        self.played_pids.append(self.players[self.curr].pid)
+        self.played.append(cid)
 
-        # played_card.visible = True
-        self.played_cards.append((self.players[self.curr].pid, played_card))
-
-        # single move type
-        if played_card.name == 'bao-jian-wei-yuan':
-            self.curr_move_type = TAKE_FROM_PLAYED
-        elif played_card.name == 'feng-ji-wei-yuan':
-            self.curr_move_type = CHECK_PLAYER_CARDS 
-        elif played_card.name == 'da-xiao-jie':
-            self.curr_move_type = PICK_PLAYER_PICK_CARD
-        elif played_card.name == 'you-deng-sheng':
-            self.curr_move_type = CHECK_EMBED_CARDS
-        elif played_card.name == 'gong-fan':
-            self.curr_move_type = MOVE_IMPED_CARD
-        elif played_card.name == 'gan-ran-zhe':
+        if cid == GAN_RAN_ZHE:
             self.jump_curr = self.curr
             self.jump_move_type = PICK_FROM_EMBED
-        elif played_card.name == 'gui-zhai-bu':
-            self.curr_move_type = EXCHANGE_WITH_EMBED
-
-        # interact move type
-        elif played_card.name == 'ban-zhang':
-            self.curr_move_type = PICK_PLAYER
-        elif played_card.name == 'you-deng-sheng':
-            self.curr_move_type = CHECK_FANREN_PLAYER
-        elif played_card.name == 'xin-wen-bu':
-            self.curr_move_type = GIVE_TO_NEXT
+        elif cid in PLAY_EFFECTS:
+            self.curr_move_type = PLAY_EFFECTS[cid]
 
+    @mutates
     def take_from_played(self, move_data: SingleMoveData):
+        self._expect(TAKE_FROM_PLAYED)
         try:
-            assert self.curr_move_type == TAKE_FROM_PLAYED
-            taken_card: Card = self.played_cards.pop(move_data.cindexs[0])[1]
+            cindex: int = move_data.cindexs[0]
+            cid: int = self.played[cindex]
         except:
             raise GameError(err.INVALID_MOVE)
-        
-        # taken_card.visible = False
-        self.players[self.curr].hand_cards.append(taken_card)
+        self.played.pop(cindex)
+        self.played_pids.pop(cindex)
+        self.players[self.curr].hand.append(cid)
         
         self.curr_move_type = DEFAULT
         self._next()
 
+    @mutates
     def check_fanren_player(self):
-        try:
-            assert self.curr_move_type == CHECK_FANREN_PLAYER
-        except GameError as e:
-            raise GameError(e.code)
-        
-        for t_pid, _ in self.inter_move_data.ops.items():
-            tmp_1 = [c for c in self.players[self.pid_int_map[t_pid]].hand_cards if (c.name == 'fan-ren') or (c.name == 'wai-xing-ren')]
-            if len(tmp_1) == 0:
-                raise GameError(err.INVALID_MOVE)
-            self.players[self.curr].checked_players.append(t_pid)
-
-        self.inter_move_data = None
+        self._expect(CHECK_FANREN_PLAYER)
+        # 提交者在收集时已限定为持有犯人或外星人卡的玩家；已离开的玩家跳过
+        checked: list[str] = self.players[self.curr].checked_players
+        for t_pid in self.inter_move_data.ops:
+            if t_pid in self.pid_int_map:
+                checked.append(t_pid)
+
+        self._reset_inter()
         self.curr_move_type = DEFAULT
         self._next()
-        
+
+    @mutates
     def check_player_cards(self, move_data: SingleMoveData):
+        self._expect(CHECK_PLAYER_CARDS)
         try:
-            assert self.curr_move_type == CHECK_PLAYER_CARDS
-        except GameError as e:
-            raise GameError(e.code)
-        
-        t_pid: str = move_data.tpids[0]
-        t_cards: list[Card] = [Card(c.name, c.point, 
-                                        #  c.visible
-                                         ) for c in self.players[self.pid_int_map[t_pid]].hand_cards]
-        self.players[self.curr].checked_player_cards[t_pid] = t_cards
+            t_pid: str = move_data.tpids[0]
+        except Exception:
+            raise GameError(err.INVALID_MOVE)
+        self.players[self.curr].checked_player_cards[t_pid] = bytes(self._seat(t_pid).hand)
         self.curr_move_type = DEFAULT
         self._next()
 
+    @mutates
     def pick_player_pick_card(self, move_data: SingleMoveData):
+        self._expect(PICK_PLAYER_PICK_CARD)
         try:
-            assert self.curr_move_type == PICK_PLAYER_PICK_CARD
-        except GameError as e:
-            raise GameError(e.code)
-        t_pid: str = move_data.tpids[0]
-        try:
-            card: Card = self.players[self.curr].hand_cards.pop(move_data.cindexs[0])
-            t_card: Card = self.players[self.pid_int_map[t_pid]].hand_cards.pop(move_data.cindexs[1])
+            target: Seat = self._seat(move_data.tpids[0])
+            hand: bytearray = self.players[self.curr].hand
+            cindex, t_cindex = move_data.cindexs[0], move_data.cindexs[1]
+            hand[cindex], target.hand[t_cindex]
         except:
             raise GameError(err.INVALID_MOVE)
+        if target is self.players[self.curr]:
+            raise GameError(err.INVALID_MOVE, "不可选择自己")
+        card: int = hand.pop(cindex)
+        t_card: int = target.hand.pop(t_cindex)
         
-        self.players[self.curr].hand_cards.append(card)
-        self.players[self.pid_int_map[t_pid]].hand_cards.append(t_card)
+        hand.append(card)
+        target.hand.append(t_card)
 
         self.curr_move_type = DEFAULT
         self._next()
 
+    @mutates
     def pick_player(self, move_data: SingleMoveData):
+        self._expect(PICK_PLAYER)
         try:
-            assert self.curr_move_type == PICK_PLAYER
-        except GameError as e:
-            raise GameError(e.code)
-        
-        self.t_pid_interact: str = move_data.tpids[0]
+            t_pid: str = move_data.tpids[0]
+            target: Seat = self._seat(t_pid)
+        except Exception:
+            raise GameError(err.INVALID_MOVE)
+        if target is self.players[self.curr]:
+            raise GameError(err.INVALID_MOVE, "不可选择自己")
+        self._reset_inter()
+        self.t_pid_interact = t_pid
         self.curr_move_type = EXCHANGE_CARD
         
+    @mutates
     def exchange_card(self):
-        try:
-            assert self.curr_move_type == EXCHANGE_CARD
-        except GameError as e:
-            raise GameError(e.code)
+        self._expect(EXCHANGE_CARD)
         
         ops: dict[str, SingleMoveData] = self.inter_move_data.ops
-        pid, t_pid = ops.keys()
+        if len(ops) < 2:
+            # 对方已离开，跳过交换
+            self._reset_inter()
+            self.curr_move_type = DEFAULT
+            self._next()
+            return
         try:
-            card: Card = self.players[self.pid_int_map[pid]].hand_cards.pop(ops[pid].cindexs[0])
-            t_card: Card = self.players[self.pid_int_map[t_pid]].hand_cards.pop(ops[t_pid].cindexs[0])
+            pid, t_pid = ops.keys()
+            seat, t_seat = self._seat(pid), self._seat(t_pid)
+            cindex, t_cindex = ops[pid].cindexs[0], ops[t_pid].cindexs[0]
+            seat.hand[cindex], t_seat.hand[t_cindex]
         except:
             raise GameError(err.INVALID_MOVE)
+        card: int = seat.hand.pop(cindex)
+        t_card: int = t_seat.hand.pop(t_cindex)
         
-        self.players[self.pid_int_map[pid]].hand_cards.append(t_card)
-        self.players[self.pid_int_map[t_pid]].hand_cards.append(card)
+        seat.hand.append(t_card)
+        t_seat.hand.append(card)
 
-        self.inter_move_data = None
+        self._reset_inter()
         self.curr_move_type = DEFAULT
         self._next()
 
+    @mutates
     def give_to_next(self):
+        self._expect(GIVE_TO_NEXT)
+        # 先取出所有要传的牌再发放，下标都相对传牌前的手牌；已离开的玩家跳过
         try:
-            assert self.curr_move_type == GIVE_TO_NEXT
-        except GameError as e:
-            raise GameError(e.code)
-        try:
-            for pid, move_data in self.inter_move_data.ops.items():
-                player_pos: int = self.pid_int_map[pid]
-                next_pos: int = (player_pos + 1) % self.set_num
-                card: Card = self.players[player_pos].hand_cards.pop(move_data.cindexs[0])
-                self.players[next_pos].hand_cards.append(card)
-        except:
+            gives: list[tuple[int, int]] = [
+                (self.pid_int_map[pid], move_data.cindexs[0])
+                for pid, move_data in self.inter_move_data.ops.items() if pid in self.pid_int_map
+            ]
+            for pos, cindex in gives:
+                self.players[pos].hand[cindex]
+        except Exception:
             raise GameError(err.INVALID_MOVE)
+        cards: list[int] = [self.players[pos].hand.pop(cindex) for pos, cindex in gives]
+        for (pos, _), card in zip(gives, cards):
+            self.players[(pos + 1) % len(self.players)].hand.append(card)
 
+        self._reset_inter()
         self.curr_move_type = DEFAULT
         self._next()
 
+    @mutates
     def check_embed_cards(self, move_data: SingleMoveData):
-        try:
-            assert self.curr_move_type == CHECK_EMBED_CARDS
-        except GameError as e:
-            raise GameError(e.code)
+        self._expect(CHECK_EMBED_CARDS)
         
-        embed_cards: list[tuple[str, Card]] = [(pid, Card(c.name, c.point, 
-                                                        #   c.visible
-                                                          )) for pid, c in self.embed_cards]
-        self.players[self.curr].checked_embed_cards = embed_cards
+        seat: Seat = self.players[self.curr]
+        seat.checked_embed_pids = list(self.embed_pids)
+        seat.checked_embed = bytes(self.embed)
         
         self.curr_move_type = DEFAULT
         self._next()
 
+    @mutates
     def move_imped_card(self, move_data: SingleMoveData):
+        self._expect(MOVE_IMPED_CARD)
         try:
-            assert self.curr_move_type == MOVE_IMPED_CARD
-        except GameError as e:
-            raise GameError(e.code)
-        
-        tpid_1: str = move_data.tpids[0]
-        tpid_2: str = move_data.tpids[1]
-        tcindex: int = move_data.cindexs[0]
-        
-        try:
-            moved_p_card: tuple[int, Card] = self.players[self.pid_int_map[tpid_1]].imped_cards.pop(tcindex)
+            source: Seat = self._seat(move_data.tpids[0])
+            target: Seat = self._seat(move_data.tpids[1])
+            tcindex: int = move_data.cindexs[0]
+            cid: int = source.imped[tcindex]
         except:
             raise GameError(err.INVALID_MOVE)
-        
-        self.players[self.pid_int_map[tpid_2]].imped_cards.append(moved_p_card)
+        source.imped.pop(tcindex)
+        target.imped_pids.append(source.imped_pids.pop(tcindex))
+        target.imped.append(cid)
 
         self.curr_move_type = DEFAULT
         self._next()
     
+    @mutates
     def pick_from_embed(self, move_data: SingleMoveData):
+        self._expect(PICK_FROM_EMBED)
         try:
-            assert self.curr_move_type == PICK_FROM_EMBED
-        except GameError as e:
-            raise GameError(e.code)
-        
-        try:
-            card: Card = self.embed_cards.pop(move_data.cindexs[0])[1]
+            cindex: int = move_data.cindexs[0]
+            cid: int = self.embed[cindex]
         except Exception as e:
             raise GameError(err.INVALID_MOVE)
+        self.embed.pop(cindex)
+        self.embed_pids.pop(cindex)
         
-        self.players[self.curr].hand_cards.append(card)
+        self.players[self.curr].hand.append(cid)
         self.curr_move_type = DEFAULT
         # no next, this move specifically for gan-ran-zhe, which means next is still him
         # todo: check whether gan-ran-zhe should be in embed card
 
+    @mutates
     def exchange_with_embed(self, move_data: SingleMoveData):
+        self._expect(EXCHANGE_WITH_EMBED)
+        seat: Seat = self.players[self.curr]
         try:
-            assert self.curr_move_type == EXCHANGE_WITH_EMBED
-        except GameError as e:
-            raise GameError(e.code)
-        
-        try:
-            card_1: Card = self.players[self.curr].hand_cards.pop(move_data.cindexs[0])
-            card_2: Card = self.embed_cards.pop(move_data.cindexs[1])[1]
+            cindex, e_cindex = move_data.cindexs[0], move_data.cindexs[1]
+            seat.hand[cindex], self.embed[e_cindex]
         except Exception as e:
             raise GameError(err.INVALID_MOVE, str(e))
+        card_1: int = seat.hand.pop(cindex)
+        card_2: int = self.embed.pop(e_cindex)
+        self.embed_pids.pop(e_cindex)
         
-        self.players[self.curr].hand_cards.append(card_2)
+        seat.hand.append(card_2)
         
-        self.embed_cards.append(([pid for pid, p in self.pid_int_map.items() if p == self.curr][0], card_1))
+        self.embed_pids.append(seat.pid)
+        self.embed.append(card_1)
         self.curr_move_type = DEFAULT
         self._next()
 
-    # def _check_move_data_num(self, move_data: MoveData, num_pids: int, num_tpids: int, num_cindexs: int):
-    #     try: 
-    #         assert len(move_data.pids) == num_pids
-    #         assert len(move_data.tpids) == num_tpids
-    #         assert len(move_data.cindexs) == num_cindexs
-    #     except Exception as e:
-    #         raise GameError(err.INVALID_MOVE)
-
-    # def _check_curr(self, move_data: MoveData):
-    #     try:
-    #         assert self.pid_int_map[move_data.pids[0]] == self.curr
-    #     except:
-    #         raise GameError(err.INVALID_PLAYER_ID)
-    
-    # def _check_move_type(self, move_type: str, move_type_1: str=None):
-    #     try:
-    #         if move_type_1:
-    #             assert (self.curr_move_type == move_type) or (self.curr_move_type == move_type_1)
-    #         else:
-    #             assert self.curr_move_type == move_type
-    #     except:
-    #         raise GameError(err.INVALID_MOVE)
-        
-    # def _check_fan_ren(self, move_data: MoveData):
-    #     try:
-    #         assert self.players[self.curr].hand_cards[move_data.cindexs[0]].name != 'fan-ren'
-    #     except:
-    #         raise GameError(err.INVALID_MOVE)
+# <===== Move Registry =====>
+class MoveSpec:
+    """How a move is dispatched: the Game method to call, the minimum number of
+    tpids / cindexs it reads, and whether it is an interactive phase (data is
+    collected from Game.inter_pids() and resolved once by resolve_inter)."""
+
+    __slots__ = ("method", "tpids", "cindexs", "interactive")
+
+    def __init__(self,
+                 method: str,
+                 tpids: int = 0,
+                 cindexs: int = 0,
+                 interactive: bool = False):
+        self.method: str = method
+        self.tpids: int = tpids
+        self.cindexs: int = cindexs
+        self.interactive: bool = interactive
+
+    def validate(self, move_data: SingleMoveData | None):
+        if not (self.tpids or self.cindexs):
+            return
+        if move_data is None or len(move_data.tpids) < self.tpids or len(move_data.cindexs) < self.cindexs:
+            raise GameError(err.INVALID_PARAMS)
+
+# moves chosen by the player in DEFAULT phase, keyed by request type
+ACTION_MOVES: dict[str, MoveSpec] = {
+    "EMB": MoveSpec("emb_card", cindexs=1),
+    "IMP": MoveSpec("imp_card", tpids=1, cindexs=1),
+    "PLAY": MoveSpec("play_card", cindexs=1),
+}
+
+# moves forced by the current phase, keyed by curr_move_type
+PHASE_MOVES: dict[str, MoveSpec] = {
+    PICK_FROM_EMBED: MoveSpec("pick_from_embed", cindexs=1),
+    TAKE_FROM_PLAYED: MoveSpec("take_from_played", cindexs=1),
+    CHECK_PLAYER_CARDS: MoveSpec("check_player_cards", tpids=1),
+    PICK_PLAYER_PICK_CARD: MoveSpec("pick_player_pick_card", tpids=1, cindexs=2),
+    CHECK_EMBED_CARDS: MoveSpec("check_embed_cards"),
+    MOVE_IMPED_CARD: MoveSpec("move_imped_card", tpids=2, cindexs=1),
+    EXCHANGE_WITH_EMBED: MoveSpec("exchange_with_embed", cindexs=2),
+    PICK_PLAYER: MoveSpec("pick_player", tpids=1),
+    EXCHANGE_CARD: MoveSpec("exchange_card", cindexs=1, interactive=True),
+    # 有犯人卡的玩家会自动传入自己的 pid，有外星人卡的玩家可以选择是否传入
+    CHECK_FANREN_PLAYER: MoveSpec("check_fanren_player", interactive=True),
+    GIVE_TO_NEXT: MoveSpec("give_to_next", cindexs=1, interactive=True),
+}
 
 # both: fanren can't be played, embalm, imprison
 # advanced: 
 # ordinary: waixingren no imprision other, last card can't be moved
-
-if __name__ == '__main__':
-    # ns = [1, 2, 3, 4, 5]
-    # s = ''
-    # for n in ns:
-        # s += f'_{n}'
-    hand_cards = {
-        1: [Card('A', 1), Card('B', 2)],
-        2: [Card('C', 3)]
-    }
-    print("=== 测试各种拷贝方法 ===")
-
-    # 1. 错误方法：浅拷贝两次
-    print("\n1. 浅拷贝两次:")
-    t1 = hand_cards[1].copy().copy()
-    print(t1)
-    hand_cards[1][0].name = 'CHANGED'
-    print(f"  原始卡片名称: {hand_cards[1][0].name}")
-    print(f"  副本卡片名称: {t1[0].name}")  # ❌ 也被修改了
\ No newline at end of file
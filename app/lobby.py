@@ -0,0 +1,127 @@
+import heapq
+from bisect import bisect_right, insort
+from itertools import count, islice
+from typing import Iterator
+
+from app.game import Game, MIN_NUM_PLAYERS, MAX_NUM_PLAYERS
+from app.model import GameInfo, GamePage
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class _Bucket:
+    """Creation seqs of the tables in one (set_num, started) bucket, ascending.
+
+    Removal only marks a tombstone; the list is compacted once more than
+    half of it is dead, so removals stay O(1) amortized and pages can
+    bisect straight to the cursor.
+    """
+
+    __slots__ = ("seqs", "dead")
+
+    def __init__(self):
+        self.seqs: list[int] = []
+        self.dead: set[int] = set()
+
+    def add(self, seq: int):
+        if seq in self.dead:
+            self.dead.discard(seq)
+            return
+        if not self.seqs or seq > self.seqs[-1]:
+            self.seqs.append(seq)
+        else:
+            insort(self.seqs, seq)
+
+    def remove(self, seq: int):
+        self.dead.add(seq)
+        if len(self.dead) * 2 > len(self.seqs):
+            self.seqs = [s for s in self.seqs if s not in self.dead]
+            self.dead.clear()
+
+    def after(self, cursor: int) -> Iterator[int]:
+        for i in range(bisect_right(self.seqs, cursor), len(self.seqs)):
+            seq = self.seqs[i]
+            if seq not in self.dead:
+                yield seq
+
+    def __len__(self) -> int:
+        return len(self.seqs) - len(self.dead)
+
+
+class Lobby:
+    """Incremental index of `games` for the lobby listing.
+
+    Tables are numbered in creation order and bucketed by (set_num,
+    started); a page bisects to the cursor in the matching buckets and
+    merges them, so listing costs O(page size) however many games exist.
+    Callers keep it in sync with `add` / `update` / `remove`.
+    """
+
+    def __init__(self, games: dict[str, Game]):
+        self.games: dict[str, Game] = games
+        self.seq = count(1)
+        self.entries: dict[str, tuple[int, int, bool]] = {} # game_id -> (seq, set_num, started)
+        self.ids: dict[int, str] = {}
+        self.buckets: dict[tuple[int, bool], _Bucket] = {
+            (n, started): _Bucket()
+            for n in range(MIN_NUM_PLAYERS, MAX_NUM_PLAYERS + 1)
+            for started in (False, True)
+        }
+
+    def add(self, game_id: str, game: Game):
+        seq: int = next(self.seq)
+        self.entries[game_id] = (seq, game.set_num, game.started)
+        self.ids[seq] = game_id
+        self.buckets[(game.set_num, game.started)].add(seq)
+
+    def update(self, game_id: str):
+        # only `started` moves a table between buckets
+        entry = self.entries.get(game_id)
+        game = self.games.get(game_id)
+        if entry is None or game is None or entry[2] == game.started:
+            return
+        seq, set_num, started = entry
+        self.buckets[(set_num, started)].remove(seq)
+        self.buckets[(set_num, game.started)].add(seq)
+        self.entries[game_id] = (seq, set_num, game.started)
+
+    def remove(self, game_id: str):
+        entry = self.entries.pop(game_id, None)
+        if entry is None:
+            return
+        seq, set_num, started = entry
+        del self.ids[seq]
+        self.buckets[(set_num, started)].remove(seq)
+
+    def total(self, set_num: int | None = None, started: bool | None = None) -> int:
+        return sum(len(b) for key, b in self.buckets.items() if self._match(key, set_num, started))
+
+    def page(self,
+             set_num: int | None = None,
+             started: bool | None = None,
+             cursor: int = 0,
+             limit: int = DEFAULT_PAGE_SIZE) -> GamePage:
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        streams = [b.after(cursor) for key, b in self.buckets.items() if self._match(key, set_num, started)]
+        seqs: list[int] = list(islice(heapq.merge(*streams), limit + 1))
+        infos: list[GameInfo] = []
+        for seq in seqs[:limit]:
+            game_id: str = self.ids[seq]
+            game: Game | None = self.games.get(game_id)
+            if game is None:
+                continue
+            infos.append(GameInfo.model_construct(
+                game_id=game_id,
+                set_num=game.set_num,
+                num_players=len(game.players),
+                started=game.started,
+            ))
+        return GamePage.model_construct(
+            games=infos,
+            next_cursor=seqs[limit - 1] if len(seqs) > limit else None,
+        )
+
+    @staticmethod
+    def _match(key: tuple[int, bool], set_num: int | None, started: bool | None) -> bool:
+        return (set_num is None or key[0] == set_num) and (started is None or key[1] == started)
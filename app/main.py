@@ -1,20 +1,127 @@
 # get data from frontend, check data, call game api
 # get status from game, check changed data, return to frontend
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Request, Header
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from pydantic import BaseModel
+from contextlib import asynccontextmanager
 
+import hmac
 import json
+import logging
+import os
+import signal
 import uuid
 
-from app.game import Game, SINGLE_MOVE_TYPES, INTER_MOVE_TYPES
+from app.game import Game, INTER_MOVE_TYPES, PHASE_TIMEOUTS, ACTION_MOVES
 from app.model import *
 import app.error as err
 from app.error import GameError
 import uuid
-from app.manager import ConnectionManager
+from app.manager import ConnectionManager, PROTOCOLS, DELTA, FULL, FORMATS, JSON, BIN, RECONNECT_GRACE
+from app.codec import decode_move_request, parse_move_request, BoundedMoveRequest
+from app.scheduler import Scheduler
+from app.actor import ActorRegistry, GameActor
+from app.reaper import Reaper
+from app.lobby import Lobby, DEFAULT_PAGE_SIZE
+from app.matchmaker import Matchmaker, Ticket
+from app.collector import InterCollector
+from app.shard import Shard, ShardRouter
+from app.store import GameStore, from_env as store_from_env
+from app.eventlog import EventLog, NEW, JOIN, START, QUIT, MOVE, RESOLVE, DROP, move_args, from_env as events_from_env
+from app.snapshot import Snapshotter, load as load_snapshots, from_env as snapshotter_from_env
+from app.drain import Drainer, DRAIN_DEADLINE, RECONNECT, WS_SERVICE_RESTART, HANDOFF
+import app.metrics as metrics
+import app.profiler as profiler
+from app.ratelimit import RateLimiter, RateLimitMiddleware
+import asyncio
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 热重启：在接受请求前恢复未结束的对局，玩家用原来的 game_id / pid 重连即可
+    restored: dict[str, Game] = load_snapshots(snapshotter.path) if snapshotter is not None else {}
+    # 共享存储里由本 worker 负责的对局（重启或 SHARD_NODES 变化后接手）；日志重放到最后一步，比定期快照新
+    sources: list[dict[str, Game]] = [await store.preload(shard.is_local)]
+    if events is not None:
+        sources.append(events.restore())
+    for source in sources:
+        for game_id, game in source.items():
+            if game_id not in restored or game.version >= restored[game_id].version:
+                restored[game_id] = game
+    for game_id, game in restored.items():
+        store.put(game_id, game)
+        lobby.add(game_id, game)
+        sync_collector(game_id, game)
+    reaper.start()
+    loop_lag.start()
+    if snapshotter is not None:
+        snapshotter.start()
+    if os.environ.get("PROFILE") == "1":
+        sampler.start()
+    yield
+    sampler.stop()
+    await loop_lag.stop()
+    await reaper.stop()
+    if snapshotter is not None:
+        await snapshotter.stop()
+    await store.flush()
+    if events is not None:
+        events.close()
+
+app = FastAPI(lifespan=lifespan)
+logger = logging.getLogger(__name__)
+
+def system_error(handler: str) -> HTTPException:
+    # 在 except 块中调用：记录 traceback 并计数，客户端只看到 SYSTEM_ERROR
+    logger.exception("unhandled error in %s", handler)
+    metrics.UNHANDLED_ERRORS.inc(handler)
+    return HTTPException(status_code=500, detail=ApiResponse(code=500, msg=err.SYSTEM_ERROR))
+
+@app.exception_handler(HTTPException)
+async def http_error_handler(request: Request, exc: HTTPException):
+    # detail 是 ApiResponse，默认的处理器无法序列化 pydantic 模型
+    detail = exc.detail.model_dump() if isinstance(exc.detail, BaseModel) else exc.detail
+    return JSONResponse(status_code=exc.status_code, content={"detail": detail}, headers=exc.headers)
+
+# 多 worker 部署：SHARD_NODES / SHARD_SELF 见 app.shard，请求会被转到拥有该 game_id 的 worker
+shard = Shard.from_env()
+if shard.enabled:
+    app.add_middleware(ShardRouter, shard=shard)
+
+# 限流：/create、/join、/queue、/ws/queue 与 /move 先按客户端 IP，move（WebSocket 帧与 /move）再按座位和整桌；RATE_LIMIT=0 关闭（压测用）
+# 客户端 IP 只在来源属于 FORWARDED_ALLOW_IPS 时取自 X-Forwarded-For，前面有负载均衡时需设置（见 Dockerfile）
+rate_limit: bool = os.environ.get("RATE_LIMIT", "1") != "0"
+create_limit = RateLimiter("create", rate=1.0, burst=5)
+join_limit = RateLimiter("join", rate=2.0, burst=10)
+move_limit = RateLimiter("move", rate=40.0, burst=80)    # 客户端 IP，同一出口可能有多个座位
+seat_limit = RateLimiter("seat", rate=20.0, burst=40)    # (game_id, pid)，ACK 也算
+table_limit = RateLimiter("table", rate=60.0, burst=120) # game_id，整桌所有座位合计
+
+def allow_move(game_id: str, pid: str) -> bool:
+    """只对已入座的 (game_id, pid) 调用，陌生的 id 不建桶"""
+    return seat_limit.allow((game_id, pid)) and table_limit.allow(game_id)
+
+def allow_http(method: str, path: str, ip: str) -> bool:
+    if method != "POST":
+        return True
+    if path == "/create":
+        return create_limit.allow(ip)
+    if path == "/queue" or path.startswith("/join/"):
+        return join_limit.allow(ip)
+    if path.startswith("/move/"):
+        if not move_limit.allow(ip):
+            return False
+        parts: list[str] = path.split("/")
+        if len(parts) != 4:
+            return True
+        game: Game | None = store.get(parts[2])
+        # 不存在的对局或座位交给路由返回错误，只占 IP 的配额
+        return game is None or parts[3] not in game.pid_int_map or allow_move(parts[2], parts[3])
+    return True
+
+if rate_limit:
+    app.add_middleware(RateLimitMiddleware, check=allow_http,
+                       body=ApiResponse(code=429, msg=err.RATE_LIMITED).model_dump_json().encode())
 
 # 跨域配置（生产环境需限定具体域名）
 app.add_middleware(
@@ -25,234 +132,555 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-games: dict[str, Game] = {}
+# 所有对局经由 store 读写；games 是本进程已加载的对局，lobby / reaper 基于它建索引
+store: GameStore = store_from_env(sticky=shard.enabled)
+games: dict[str, Game] = store.games
 manager = ConnectionManager()
+scheduler = Scheduler()
+actors = ActorRegistry()
+collectors: dict[str, InterCollector] = {} # game_id -> open interactive phase
+# EVENT_LOG 设置时记录每局的 seed 与所有操作，见 app.eventlog
+events: EventLog | None = events_from_env()
+
+def record(game_id: str, kind: str, *args):
+    if events is not None:
+        events.append(game_id, kind, *args)
+
+async def evict_game(game_id: str) -> bool:
+    # 由 reaper 调用：关闭剩余连接、取消计时器并停止 actor
+    store.delete(game_id)
+    record(game_id, DROP)
+    lobby.remove(game_id)
+    collector = collectors.pop(game_id, None)
+    if collector is not None:
+        collector.cancel()
+    scheduler.cancel(game_id)
+    await manager.close_all_connections(game_id)
+    await actors.remove(game_id)
+    return True
+
+reaper = Reaper(games, evict_game)
+# SNAPSHOT_PATH 设置时定期把有变化的对局写入快照文件，见 app.snapshot
+snapshotter: Snapshotter | None = snapshotter_from_env(games)
+
+async def handoff():
+    # 检查点：先落盘，再通知客户端重连到新实例
+    if snapshotter is not None:
+        await snapshotter.flush()
+    await store.flush()
+    if events is not None:
+        events.flush()
+    await manager.shutdown(WsResponse(code=503, msg=RECONNECT), code=WS_SERVICE_RESTART, reason=RECONNECT)
+
+def stop_process():
+    # 与 Ctrl+C / kill 相同，uvicorn 正常关闭并执行 lifespan 的收尾
+    os.kill(os.getpid(), signal.SIGTERM)
+
+# 滚动发布：POST /admin/drain 后不再开新桌，等现有对局结束（可持久化时只需到达检查点）再退出
+drainer = Drainer(games, handoff, stop_process, persistent=snapshotter is not None or events is not None)
+
+def check_serving():
+    if drainer.draining:
+        raise HTTPException(status_code=503, detail=ApiResponse(code=503, msg=err.SERVER_DRAINING))
+
+LOOPBACK: frozenset[str] = frozenset(["127.0.0.1", "::1"])
+
+def check_admin(request: Request, token: str | None):
+    # 设置了 ADMIN_TOKEN 时必须带上 X-Admin-Token；未设置时只接受本机请求（例如 docker exec 里的 curl）
+    expected: str | None = os.environ.get("ADMIN_TOKEN")
+    if expected:
+        allowed: bool = token is not None and hmac.compare_digest(token.encode(), expected.encode())
+    else:
+        allowed = request.client is not None and request.client.host in LOOPBACK
+    if not allowed:
+        raise HTTPException(status_code=403, detail=ApiResponse(code=403, msg=err.INVALID_PARAMS))
+lobby = Lobby(games)
+
+def new_game_id() -> str:
+    # 只生成落在本 worker 上的 id，n 个 worker 时平均尝试 n 次
+    game_id = str(uuid.uuid4())
+    while not shard.is_local(game_id) or game_id in store:
+        game_id = str(uuid.uuid4())
+    return game_id
+
+def create_table(set_num: int, pids: list[str]) -> str:
+    # 匹配成功：直接建好并开始一局
+    game_id = new_game_id()
+    game = Game(set_num=set_num)
+    for pid in pids:
+        game.add_player(pid)
+    game.start_game()
+    store.put(game_id, game)
+    record(game_id, NEW, set_num, game.seed)
+    for pid in pids:
+        record(game_id, JOIN, pid)
+    record(game_id, START)
+    lobby.add(game_id, game)
+    return game_id
+
+matchmaker = Matchmaker(create_table)
+
+def load_game(game_id: str) -> Game:
+    game: Game | None = store.get(game_id)
+    if game is None:
+        raise GameError(err.INVALID_GAME_ID)
+    return game
+
+def commit(game_id: str, game: Game, base: int, *ops: tuple):
+    # base 是修改前的 version；失败的操作不改局面也不推进 version，version 未变时既不写存储也不写日志。
+    # 每局只在自己的 actor 里修改，不会有并发写入
+    if game.version == base:
+        return
+    store.put(game_id, game)
+    for op in ops:
+        record(game_id, *op)
+
+async def send_states(game_id: str, game: Game):
+    start: float = metrics.clock()
+    manager.send_states(game_id, {
+        pid: game.get_personal_state(pid)
+        for pid in game.pid_int_map.keys()
+    })
+    metrics.FANOUT_SECONDS.observe(metrics.clock() - start)
+
+def sync_collector(game_id: str, game: Game):
+    """进入交互阶段时登记 collector 和截止时间；所有人提交后立即结算。"""
+    phase: str = game.curr_move_type
+    collector: InterCollector | None = collectors.get(game_id)
+    if phase not in INTER_MOVE_TYPES:
+        # 阶段在结算前就结束了（例如发起者离开），旧的 collector 不能留给下一次同名阶段
+        if collector is not None:
+            del collectors[game_id]
+            collector.cancel()
+            scheduler.cancel(game_id, collector.phase)
+        return
+    if collector is None or collector.phase != phase:
+        if collector is not None:
+            collector.cancel()
+            scheduler.cancel(game_id, collector.phase)
+        collector = collectors[game_id] = InterCollector(game_id, phase, resolve_collector)
+        scheduler.schedule(game_id, phase, PHASE_TIMEOUTS[phase], collector.expire)
+    if game.inter_is_ready():
+        collector.ready()
+
+async def resolve_collector(collector: InterCollector):
+    if collector.game_id not in store:
+        return
+    try:
+        await actors.get(collector.game_id).call(_resolve_collector, collector)
+    except Exception:
+        logger.exception("unhandled error in resolve_collector")
+        metrics.UNHANDLED_ERRORS.inc("resolve_collector")
+
+async def _resolve_collector(collector: InterCollector):
+    game_id: str = collector.game_id
+    if collectors.get(game_id) is not collector:
+        return
+    del collectors[game_id]
+    scheduler.cancel(game_id, collector.phase)
+    game: Game | None = store.get(game_id)
+    if game is None or game.curr_move_type != collector.phase:
+        return
+    prev = profiler.tag(profiler.TIMER, game_id, collector.phase)
+    try:
+        try:
+            base: int = game.version
+            start: float = metrics.clock()
+            try:
+                game.resolve_inter()
+            finally:
+                metrics.MOVE_SECONDS.observe(metrics.clock() - start, collector.phase)
+            commit(game_id, game, base, (RESOLVE,))
+            metrics.MOVES.inc(collector.phase, collector.reason)
+        except GameError as e:
+            metrics.GAME_ERRORS.inc(e.code)
+            manager.broadcast(message=WsResponse(code=400, msg=e.code), game_id=game_id)
+            return
+        await send_states(game_id, game)
+        sync_collector(game_id, game)
+    finally:
+        profiler.untag(prev)
 
 @app.post("/create")
 async def create_game(data: CreateGameRequest):
+    check_serving()
     try:
-        game_id = str(uuid.uuid4())
-        while game_id in games:
-            game_id = str(uuid.uuid4())
-        games[game_id] = Game(set_num=data.set_num)
-        game_info: GameInfo = games[game_id].get_info()
+        game_id = new_game_id()
+        game = Game(set_num=data.set_num)
+        store.put(game_id, game)
+        record(game_id, NEW, data.set_num, game.seed)
+        lobby.add(game_id, game)
+        game_info: GameInfo = game.get_info()
         game_info.game_id = game_id
         return ApiResponse[GameInfo](code=200, msg='Game Created', data=game_info)
     except GameError as e:
+        metrics.GAME_ERRORS.inc(e.code)
         raise HTTPException(status_code=400, detail=ApiResponse(code=400, msg=e.code))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=ApiResponse(code=500, msg=err.SYSTEM_ERROR))
+        raise system_error("create_game")
 
 @app.get("/get_all")
-async def get_all_game():
+async def get_all_game(set_num: int | None = None, started: bool | None = None, cursor: int = 0, limit: int = DEFAULT_PAGE_SIZE):
+    """按创建顺序分页；例如 ?set_num=5&started=false 只列出 5 人的空桌。
+    下一页传入上一页返回的 next_cursor，为 null 时表示已到末页。
+    """
+    try:
+        page: GamePage = lobby.page(set_num=set_num, started=started, cursor=cursor, limit=limit)
+        return ApiResponse[GamePage](code=200, msg='All Games', data=page)
+    except Exception as e:
+        raise system_error("get_all_game")
+
+@app.get("/stats")
+async def get_stats():
+    return ApiResponse[dict[str, int]](code=200, msg='Connection Stats', data={
+        **manager.get_stats(), **reaper.get_stats(), **matchmaker.get_stats(),
+        **(events.get_stats() if events is not None else {}),
+        **(snapshotter.get_stats() if snapshotter is not None else {}),
+        **create_limit.get_stats(), **join_limit.get_stats(), **move_limit.get_stats(), **seat_limit.get_stats(), **table_limit.get_stats(),
+    })
+
+# 本 worker 的指标，Prometheus 文本格式
+loop_lag = metrics.LoopLag(metrics.LOOP_LAG_SECONDS)
+metrics.REGISTRY.add(metrics.Gauge("games_live", "Games held by this worker, by state", ("state",),
+                                   lambda: {(k,): v for k, v in reaper.live_counts().items()}))
+metrics.REGISTRY.add(metrics.Gauge("ws_connections", "Open game WebSockets",
+                                   read=lambda: {(): sum(len(c) for c in manager.active_connections.values())}))
+metrics.REGISTRY.add(metrics.Gauge("ws_queued_frames", "Frames waiting in per-socket send queues",
+                                   read=lambda: {(): manager.get_stats()["queued_frames"]}))
+metrics.REGISTRY.add(metrics.Gauge("matchmaker_waiting", "Players waiting in /queue",
+                                   read=lambda: {(): matchmaker.get_stats()["queued_players"]}))
+
+@app.get("/metrics")
+async def get_metrics():
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/health")
+async def health():
+    """负载均衡探活：drain 开始后返回 503，流量应切到其他实例。"""
+    stats: dict = drainer.get_stats()
+    if drainer.draining:
+        return JSONResponse(status_code=503, content=ApiResponse(code=503, msg=err.SERVER_DRAINING, data=stats).model_dump())
+    return ApiResponse[dict](code=200, msg='OK', data=stats)
+
+@app.post("/admin/drain")
+async def drain(request: Request, deadline: float = DRAIN_DEADLINE, x_admin_token: str | None = Header(default=None)):
+    """开始 drain；deadline 秒后仍未结束的对局也会被交接（有快照 / 日志时）或直接断开。"""
+    check_admin(request, x_admin_token)
+    if not drainer.draining:
+        drainer.start(deadline)
+        matchmaker.close(GameError(err.SERVER_DRAINING))
+    return ApiResponse[dict](code=200, msg='Draining', data=drainer.get_stats())
+
+# 采样 profiler，默认关闭；事故时打开，折叠栈定期写到 PROFILE_PATH，见 app.profiler
+sampler: profiler.Profiler = profiler.from_env()
+
+@app.post("/admin/profile")
+async def profile(request: Request, enabled: bool = True, rate: float | None = None, reset: bool = False, x_admin_token: str | None = Header(default=None)):
+    """enabled=false 停止采样并立即写出文件；rate 为每秒采样数；reset=true 清空已有样本。"""
+    check_admin(request, x_admin_token)
     try:
-        game_infos: list[GameInfo] = [
-            GameInfo(
-                game_id=gid,
-                set_num=game.get_info().set_num,
-                num_players=game.get_info().num_players,
-                started=game.get_info().started,
-            ) 
-            for gid, game in games.items()
-        ]
-        return ApiResponse[list[GameInfo]](code=200, msg='All Games', data=game_infos)
+        if enabled:
+            sampler.start(rate, reset)
+        else:
+            sampler.stop()
+        return ApiResponse[dict](code=200, msg='Profiling' if sampler.enabled else 'Profile Written', data=sampler.get_stats())
     except Exception as e:
-        raise HTTPException(status_code=500, detail=ApiResponse(code=500, msg=err.SYSTEM_ERROR))
+        raise system_error("profile")
+
+@app.get("/archive/{game_id}")
+async def get_archived_game(game_id: str):
+    state: GameState | None = reaper.get_archived(game_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail=ApiResponse(code=404, msg=err.INVALID_GAME_ID))
+    return ApiResponse[GameState](code=200, msg='Archived Game', data=state)
 
 @app.post("/join/{game_id}")
 async def join_game(data: FetchGameRequest):
+    check_serving()
     try:
-        game = games[data.game_id]
+        game = load_game(data.game_id)
+        base: int = game.version
         pid: str = str(uuid.uuid4())
         while pid in game.pid_int_map:
             pid = str(uuid.uuid4())
         game.add_player(pid)
-        if len(game.players) == game.set_num:
-            game.start_game()
+        ops: list[tuple] = [(JOIN, pid)]
+        try:
+            if len(game.players) == game.set_num:
+                game.start_game()
+                ops.append((START,))
+        finally:
+            # 加入已经成功，即使开局失败也要提交
+            commit(data.game_id, game, base, *ops)
+        lobby.update(data.game_id)
+        if game.started:
             return ApiResponse[str](code=200, msg='Player Joined And Game Started', data=pid)
         return ApiResponse[str](code=200, msg='Player Joined', data=pid)
-    except KeyError as e:
-        raise HTTPException(status_code=404, detail=ApiResponse(code=404, msg=err.INVALID_GAME_ID))
     except GameError as e:
-        raise HTTPException(status_code=400, detail=ApiResponse(code=400, msg=e.code))
+        metrics.GAME_ERRORS.inc(e.code)
+        status_code: int = 404 if e.code == err.INVALID_GAME_ID else 400
+        raise HTTPException(status_code=status_code, detail=ApiResponse(code=status_code, msg=e.code))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=ApiResponse(code=500, msg=err.SYSTEM_ERROR))
-    
+        raise system_error("join_game")
 
-@app.websocket("/ws/{game_id}/{pid}")
-async def websocket_endpoint(websocket: WebSocket, game_id: str, pid: str):
+@app.post("/queue")
+async def queue_game(data: QueueRequest):
+    """排队等待 set_num 人的桌子，人满后自动开局并返回 game_id 和 pid；等待超时返回 408。"""
+    check_serving()
     try:
-        game: Game = games[game_id]
-        await manager.connect(websocket, game_id, pid)
-    except KeyError as e:
-        await websocket.close(code=1008, reason=err.INVALID_GAME_ID)
-        return
+        ticket: Ticket = matchmaker.enqueue(data.set_num)
+        match: QueueMatch = await matchmaker.wait(ticket)
+        return ApiResponse[QueueMatch](code=200, msg='Player Joined And Game Started', data=match)
+    except GameError as e:
+        metrics.GAME_ERRORS.inc(e.code)
+        status_code: int = {err.QUEUE_TIMEOUT: 408, err.SERVER_DRAINING: 503}.get(e.code, 400)
+        raise HTTPException(status_code=status_code, detail=ApiResponse(code=status_code, msg=e.code))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=WsResponse(code=500, msg=err.SYSTEM_ERROR))
+        raise system_error("queue_game")
+
+@app.websocket("/ws/queue")
+async def queue_websocket(websocket: WebSocket, set_num: int):
+    """与 /queue 相同，但可以一直等待：匹配成功后推送一条 ApiResponse[QueueMatch] 并关闭，客户端断开即退出队列。"""
+    # RateLimitMiddleware 只处理 HTTP，这里在握手前按 IP 计入 join 配额，拒绝时握手直接失败
+    client = websocket.client
+    if rate_limit and not join_limit.allow(client.host if client else ""):
+        await websocket.close(code=1008, reason=err.RATE_LIMITED)
+        return
+    await websocket.accept()
+    if drainer.draining:
+        await websocket.close(code=WS_SERVICE_RESTART, reason=err.SERVER_DRAINING)
+        return
+    try:
+        ticket: Ticket = matchmaker.enqueue(set_num)
+    except GameError as e:
+        metrics.GAME_ERRORS.inc(e.code)
+        await websocket.close(code=1008, reason=e.code)
+        return
+    # 等待期间客户端发来任何消息或断开都视为离开队列
+    receive = asyncio.ensure_future(websocket.receive())
+    try:
+        await asyncio.wait({ticket.future, receive}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        receive.cancel()
+        matchmaker.leave(ticket)
+    if ticket.future.cancelled():
+        await websocket.close(code=1000)
+        return
+    try:
+        match: QueueMatch = ticket.future.result()
+        response = ApiResponse[QueueMatch](code=200, msg='Player Joined And Game Started', data=match)
+    except GameError as e:
+        metrics.GAME_ERRORS.inc(e.code)
+        response = ApiResponse(code=503, msg=e.code)
+    except Exception:
+        logger.exception("unhandled error in queue_websocket")
+        metrics.UNHANDLED_ERRORS.inc("queue_websocket")
+        response = ApiResponse(code=500, msg=err.SYSTEM_ERROR)
+    try:
+        await websocket.send_text(response.model_dump_json())
+        await websocket.close(code=1000)
+    except Exception:
+        pass
+
+
+async def apply_request(game_id: str, pid: str, req_data: WsMoveRequest, reply: bool = False, handler: str = profiler.WS) -> PersonalState | None:
+    """在 game 的 actor 中执行，保证同一局的 move 串行处理；分发规则见 app.game.MoveSpec。"""
+    game: Game = load_game(game_id)
+    base: int = game.version
+    # 标签只用已知的名字：EMB / IMP / PLAY 或当前阶段，客户端传入的 type 不直接当标签
+    move: str = req_data.type if req_data.type in ACTION_MOVES else game.curr_move_type
+    prev = profiler.tag(handler, game_id, move)
+    try:
+        start: float = metrics.clock()
+        try:
+            changed: bool = game.apply_move(pid, req_data.type, req_data.move_data)
+        except GameError:
+            metrics.MOVES.inc(move, "rejected")
+            raise
+        finally:
+            metrics.MOVE_SECONDS.observe(metrics.clock() - start, move)
+        commit(game_id, game, base, (MOVE, *move_args(pid, req_data.type, req_data.move_data)))
+        metrics.MOVES.inc(move, "ok" if changed else "collected")
+        # send_states 中间没有 await，整段都算在这个标签下
+        if changed:
+            await send_states(game_id, game)
+        sync_collector(game_id, game)
+
+        if reply:
+            return game.get_personal_state(pid)
+    finally:
+        profiler.untag(prev)
 
+def seat_phase(pid: str) -> str:
+    return f"RECONNECT_{pid}"
+
+async def expire_seat(game_id: str, pid: str):
+    # 宽限期内没有重连，正式移除玩家
+    manager.drop_session(game_id, pid)
+    if game_id not in store:
+        return
+    try:
+        await actors.get(game_id).call(quit_seat, game_id, pid)
+    except GameError:
+        return
+    except Exception:
+        # 在计时器任务里运行，没人等待结果，这里不记录就会丢失
+        logger.exception("unhandled error in expire_seat")
+        metrics.UNHANDLED_ERRORS.inc("expire_seat")
+
+async def quit_seat(game_id: str, pid: str):
+    game: Game = load_game(game_id)
+    if pid not in game.pid_int_map:
+        return # 没有座位的连接，不产生任何事件
+    base: int = game.version
+    game.quit_player(pid)
+    commit(game_id, game, base, (QUIT, pid))
+    manager.broadcast(message=WsResponse(code=500, msg=f"LEAVING_GAME_{pid}"), game_id=game_id)
+    # 离开的可能是当前玩家，轮次和阶段都会变
+    await send_states(game_id, game)
+    # 离开的玩家可能正是交互阶段在等的人
+    sync_collector(game_id, game)
+
+async def send_init(game_id: str):
+    game: Game = load_game(game_id)
+    if game.started:
+        prev = profiler.tag(profiler.WS, game_id, "INIT")
+        try:
+            await send_states(game_id, game)
+        finally:
+            profiler.untag(prev)
+
+def get_personal_state(game_id: str, pid: str) -> PersonalState:
+    prev = profiler.tag(profiler.HTTP_MOVE, game_id, "INIT")
     try:
+        return load_game(game_id).get_personal_state(pid)
+    finally:
+        profiler.untag(prev)
+
+
+# 校验失败的回复是固定的，提前构造好
+FRAME_ERRORS: dict[str, WsResponse] = {
+    err.INVALID_PARAMS: WsResponse(code=400, msg=err.INVALID_PARAMS),
+    err.FRAME_TOO_LARGE: WsResponse(code=413, msg=err.FRAME_TOO_LARGE),
+    err.RATE_LIMITED: WsResponse(code=429, msg=err.RATE_LIMITED),
+}
+
+async def receive_frame(websocket: WebSocket) -> str | bytes:
+    # 文本帧和二进制帧都接受，JSON 也可以用二进制帧发送
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000), message.get("reason"))
+    text: str | None = message.get("text")
+    return text if text is not None else message.get("bytes") or b""
+
+@app.websocket("/ws/{game_id}/{pid}")
+async def websocket_endpoint(websocket: WebSocket, game_id: str, pid: str, proto: str = FULL, fmt: str = JSON, last_seq: int | None = None):
+    """proto=delta: 先发完整快照，之后只发相对客户端最后一次 ACK 的 patch，客户端需回 {"type": "ACK", "seq": n}。
+    fmt=bin: 收发都使用 app.codec 的二进制帧（仅支持 proto=full）。
+    断线后座位保留 RECONNECT_GRACE 秒；重连时带上 last_seq 只补发错过的消息，无需重新 INIT。
+    """
+    if proto not in PROTOCOLS or fmt not in FORMATS or (fmt == BIN and proto == DELTA):
+        await websocket.close(code=1008, reason=err.INVALID_PARAMS)
+        return
+    if drainer.phase == HANDOFF:
+        await websocket.close(code=WS_SERVICE_RESTART, reason=RECONNECT)
+        return
+    game: Game | None = store.get(game_id)
+    if game is None:
+        await websocket.close(code=1008, reason=err.INVALID_GAME_ID)
+        return
+    if pid not in game.pid_int_map:
+        # 只有已入座的玩家可以连接，陌生 pid 不占连接也不触发离座计时
+        await websocket.close(code=1008, reason=err.INVALID_PLAYER_ID)
+        return
+    limited: bool = False # 连续被限流时只回复第一帧
+    close_code: int = 1000
+    try:
+        await manager.connect(websocket, game_id, pid, proto, fmt, last_seq)
+        scheduler.cancel(game_id, seat_phase(pid))
+        reaper.touch(game_id)
         while True:
-            data = await websocket.receive_json()
+            frame: str | bytes = await receive_frame(websocket)
+            # 超出配额的帧在解析前丢弃
+            if rate_limit and not allow_move(game_id, pid):
+                if not limited:
+                    limited = True
+                    manager.send_personal_message(FRAME_ERRORS[err.RATE_LIMITED], game_id, pid)
+                continue
+            limited = False
+            # 原始帧直接校验成 WsMoveRequest，不经过中间 dict；解析是同步的，单独打标签
+            prev = profiler.tag(profiler.WS, game_id, profiler.PARSE)
             try:
-                req_data: WsMoveRequest = WsMoveRequest(**data)
-            except Exception as e:
-                await websocket.send_json(WsResponse(code=500, msg=err.INVALID_PARAMS))
+                if fmt == BIN:
+                    if not isinstance(frame, bytes):
+                        raise GameError(err.INVALID_PARAMS)
+                    req_data: WsMoveRequest = decode_move_request(frame)
+                else:
+                    req_data: WsMoveRequest = parse_move_request(frame)
+            except GameError as e:
+                metrics.GAME_ERRORS.inc(e.code)
+                manager.send_personal_message(FRAME_ERRORS[e.code], game_id, pid)
                 continue  # 校验失败，跳过后续逻辑，等待重发
-            # 处理逻辑
+            finally:
+                profiler.untag(prev)
+            # 处理逻辑：交给该局的 actor 串行执行，队列满时在这里等待
             try:
+                if req_data.type == "ACK":
+                    if req_data.seq is not None:
+                        manager.ack(game_id, pid, req_data.seq)
+                    continue
+                actor: GameActor = actors.get(game_id)
                 if req_data.type == "INIT":
-                    if game.started == False:
-                        continue
-                    for pid in game.pid_int_map.keys():
-                        personal_state: PersonalState = game.get_personal_state(pid)
-                        await manager.send_personal_message(message=WsResponse(state=personal_state), game_id=game_id, pid=pid)
-
-                elif req_data.type in ["EMB", "IMP", "PLAY"]: 
-                    if req_data.type == "EMB": # 1 cindex
-                        game.emb_card(req_data.move_data)
-                    elif req_data.type == "IMP": # 1 tpid, 1 cindex
-                        game.imp_card(req_data.move_data)
-                    elif req_data.type == "PLAY": # 1 cindex
-                        game.play_card(req_data.move_data)
-                    
-                    for pid in game.pid_int_map.keys():
-                        personal_state: PersonalState = game.get_personal_state(pid)
-                        await manager.send_personal_message(message=WsResponse(state=personal_state), game_id=game_id, pid=pid)
-
-                elif game.curr_move_type in SINGLE_MOVE_TYPES: 
-                    if game.curr_move_type == "PICK_FROM_EMBED": # 1 cindex
-                        game.pick_from_embed(req_data.move_data)
-                    elif game.curr_move_type == "TAKE_FROM_PLAYED":  # 1 cindex
-                        game.take_from_played(req_data.move_data)
-                    elif game.curr_move_type == "CHECK_PLAYER_CARDS": # 1 tpid
-                        game.check_player_cards(req_data.move_data)
-                    elif game.curr_move_type == "PICK_PLAYER_PICK_CARD": # 1 tpid, 2 cindexs
-                        game.pick_player_pick_card(req_data.move_data)
-                    elif game.curr_move_type == "CHECK_EMBED_CARDS":
-                        game.check_embed_cards(req_data.move_data)
-                    elif game.curr_move_type == "MOVE_IMPED_CARD": # 2 tpids, 1 cindex
-                        game.move_imped_card(req_data.move_data)
-                    elif game.curr_move_type == "EXCHANGE_WITH_EMBED": # 2 cindexs
-                        game.exchange_with_embed(req_data.move_data)
-                    elif game.curr_move_type == "PICK_PLAYER": # 1 tpid
-                        game.pick_player(req_data.move_data)      
-                    for pid in game.pid_int_map.keys():
-                        personal_state: PersonalState = game.get_personal_state(pid)
-                        await manager.send_personal_message(message=WsResponse(state=personal_state), game_id=game_id, pid=pid)
-
-
-                elif game.curr_move_type in INTER_MOVE_TYPES:
-                    if game.curr_move_type == "EXCHANGE_CARD": # 1 cindex
-                        game.collect_interdata(pid, req_data.move_data)
-                        if game.inter_is_ready(req_num=2):
-                            game.exchange_card()
-                            for pid in game.pid_int_map.keys():
-                                personal_state: PersonalState = game.get_personal_state(pid)
-                                await manager.send_personal_message(message=WsResponse(state=personal_state), game_id=game_id, pid=pid)
-
-                    elif game.curr_move_type == "CHECK_FANREN_PLAYER": # 有犯人卡的玩家会自动传入自己的 pid，有外星人卡的玩家可以选择是否传入，其他玩家不能传入
-                        game.collect_interdata(pid, req_data.move_data)
-                        if game.timer(duration=10):
-                            game.check_fanren_player()
-                            for pid in game.pid_int_map.keys():
-                                personal_state: PersonalState = game.get_personal_state(pid)
-                                await manager.send_personal_message(message=WsResponse(state=personal_state), game_id=game_id, pid=pid)
-
-                    elif game.curr_move_type == "GIVE_TO_NEXT": 
-                        game.collect_interdata(pid, req_data.move_data) # 1 cindex
-                        if game.inter_is_ready(req_num=4):
-                            game.give_to_next()
-                            for pid in game.pid_int_map.keys():
-                                personal_state: PersonalState = game.get_personal_state(pid)
-                                await manager.send_personal_message(message=WsResponse(state=personal_state), game_id=game_id, pid=pid)
-                                
+                    if proto == DELTA:
+                        manager.reset_stream(game_id, pid)
+                    await actor.call(send_init, game_id)
+                else:
+                    await actor.call(apply_request, game_id, pid, req_data)
             except GameError as e:
-                await websocket.send_json(WsResponse(code=400, msg=e.code))
+                metrics.GAME_ERRORS.inc(e.code)
+                manager.send_personal_message(WsResponse(code=400, msg=e.code), game_id, pid)
                 continue
 
     except WebSocketDisconnect:
-        game.quit_player(pid)
-        manager.disconnect(game_id, pid)
-        await websocket.close(code=2000)
-        manager.broadcast(message=WsResponse(code=500, msg=f"LEAVING_GAME_{pid}"))
+        pass
+    except Exception:
+        logger.exception("unhandled error in websocket_endpoint")
+        metrics.UNHANDLED_ERRORS.inc("websocket_endpoint")
+        close_code = 1011
+    finally:
+        # 无论怎样退出都要释放连接，否则连接数指标漂移、座位也不会进入宽限期
+        manager.disconnect(game_id, pid, websocket, code=close_code, reason=err.SYSTEM_ERROR if close_code == 1011 else "")
+        # 被同一 pid 的新连接顶掉时不回收座位
+        if not manager.is_connected(game_id, pid):
+            scheduler.schedule(game_id, seat_phase(pid), RECONNECT_GRACE, expire_seat, game_id, pid)
 
 
 @app.post('/move/{game_id}/{pid}')
-async def http_move(game_id: str, pid: str, req_data: WsMoveRequest):
+async def http_move(game_id: str, pid: str, req_data: BoundedMoveRequest):
     """支持通过 HTTP 发起单步 move 的简化接口（方便前端或无 websocket 的客户端）。
     返回该 pid 的 PersonalState。
-    注意：对于需要多方参与或超时的交互类型，HTTP 接口仅在调用方触发时尝试执行，仍建议使用 websocket。
+    HTTP 与 websocket 共用同一个 actor，move 结果同样会推送给已连接的玩家；队列满时返回 503。
     """
-    try:
-        game: Game = games[game_id]
-    except KeyError:
+    if game_id not in store:
         raise HTTPException(status_code=404, detail=ApiResponse(code=404, msg=err.INVALID_GAME_ID))
 
     try:
+        actor: GameActor = actors.get(game_id)
         # INIT 直接返回个人状态
         if req_data.type == 'INIT':
-            personal_state: PersonalState = game.get_personal_state(pid)
-            return ApiResponse[PersonalState](code=200, msg='OK', data=personal_state)
-
-        # 简化的同步处理：复用 websocket 中的分支逻辑
-        if req_data.type in ['EMB', 'IMP', 'PLAY']:
-            if req_data.type == 'EMB':
-                game.emb_card(req_data.move_data)
-            elif req_data.type == 'IMP':
-                game.imp_card(req_data.move_data)
-            elif req_data.type == 'PLAY':
-                game.play_card(req_data.move_data)
-            personal_state: PersonalState = game.get_personal_state(pid)
-            return ApiResponse[PersonalState](code=200, msg='OK', data=personal_state)
-
-        if game.curr_move_type in SINGLE_MOVE_TYPES:
-            if game.curr_move_type == 'PICK_FROM_EMBED':
-                game.pick_from_embed(req_data.move_data)
-            elif game.curr_move_type == 'TAKE_FROM_PLAYED':
-                game.take_from_played(req_data.move_data)
-            elif game.curr_move_type == 'CHECK_PLAYER_CARDS':
-                game.check_player_cards(req_data.move_data)
-            elif game.curr_move_type == 'PICK_PLAYER_PICK_CARD':
-                game.pick_player_pick_card(req_data.move_data)
-            elif game.curr_move_type == 'CHECK_EMBED_CARDS':
-                game.check_embed_cards(req_data.move_data)
-            elif game.curr_move_type == 'MOVE_IMPED_CARD':
-                game.move_imped_card(req_data.move_data)
-            elif game.curr_move_type == 'EXCHANGE_WITH_EMBED':
-                game.exchange_with_embed(req_data.move_data)
-            elif game.curr_move_type == 'PICK_PLAYER':
-                game.pick_player(req_data.move_data)
-            personal_state: PersonalState = game.get_personal_state(pid)
-            return ApiResponse[PersonalState](code=200, msg='OK', data=personal_state)
-
-        if game.curr_move_type in INTER_MOVE_TYPES:
-            # 对于交互型，HTTP 接口尝试收集并在满足条件时执行
-            if game.curr_move_type == 'EXCHANGE_CARD':
-                game.collect_interdata(pid, req_data.move_data)
-                if game.inter_is_ready(req_num=2):
-                    game.exchange_card()
-            elif game.curr_move_type == 'CHECK_FANREN_PLAYER':
-                game.collect_interdata(pid, req_data.move_data)
-                if game.timer(duration=10):
-                    game.check_fanren_player()
-            elif game.curr_move_type == 'GIVE_TO_NEXT':
-                game.collect_interdata(pid, req_data.move_data)
-                if game.inter_is_ready(req_num=4):
-                    game.give_to_next()
-            personal_state: PersonalState = game.get_personal_state(pid)
-            return ApiResponse[PersonalState](code=200, msg='OK', data=personal_state)
-
-        # 未匹配的情况
-        raise GameError(err.INVALID_MOVE)
+            personal_state: PersonalState = await actor.try_call(get_personal_state, game_id, pid)
+        else:
+            personal_state: PersonalState = await actor.try_call(apply_request, game_id, pid, req_data, True, profiler.HTTP_MOVE)
+        return ApiResponse[PersonalState](code=200, msg='OK', data=personal_state)
 
     except GameError as e:
-        raise HTTPException(status_code=400, detail=ApiResponse(code=400, msg=e.code))
+        metrics.GAME_ERRORS.inc(e.code)
+        status_code: int = {err.GAME_BUSY: 503, err.INVALID_GAME_ID: 404}.get(e.code, 400)
+        raise HTTPException(status_code=status_code, detail=ApiResponse(code=status_code, msg=e.code))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=ApiResponse(code=500, msg=err.SYSTEM_ERROR))
+        raise system_error("http_move")
 
 # TODO: 注意现在的逻辑每开一盘游戏新分配唯一ID，跟登录无关，感觉是适合分布式的。记得处理错误traceback和逻辑整合
-# TODO: Timeout 功能
-# TODO: 锁
 # TODO: 错误类型    
 # TODO: 目前是只实现了 advanced mode
 # TODO: AUTH
\ No newline at end of file
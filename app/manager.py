@@ -1,65 +1,302 @@
-from fastapi import WebSocket
-
+import asyncio
+from collections import deque
 from fastapi import WebSocket
 from typing import Optional, List
 from app.model import *
+from app.delta import DeltaStream
+from app.codec import encode_response
+import app.metrics as metrics
+
+# overflow policy when a client's outbound queue is full
+COALESCE = "COALESCE"      # drop every queued state, keep only the newest one
+DROP = "DROP"              # drop the oldest queued frame
+DISCONNECT = "DISCONNECT"  # evict the slow client
+
+SEND_QUEUE_SIZE = 16
+OVERFLOW_POLICY = COALESCE
+CLOSE_TIMEOUT = 1.0
+
+# wire protocols
+FULL = "full"    # every update carries the whole PersonalState
+DELTA = "delta"  # full snapshot first, then patches against the client's last ACK
+PROTOCOLS = (FULL, DELTA)
+
+# frame encodings
+JSON = "json"
+BIN = "bin"  # app.codec, full protocol only
+FORMATS = (JSON, BIN)
+
+DELTA_FIELDS = ("seq", "base_seq", "patch")
+
+# recent notices kept per seat for replay after a reconnect
+REPLAY_SIZE = 32
+# seconds a seat survives after its socket drops
+RECONNECT_GRACE = 30.0
+
+
+def encode_message(message: BaseModel) -> str:
+    # one pass through pydantic-core's serializer, no intermediate dict
+    if isinstance(message, WsResponse):
+        return message.model_dump_json(exclude={k for k in DELTA_FIELDS if getattr(message, k) is None})
+    return message.model_dump_json()
+
+def encode_frame(message: WsResponse, fmt: str = JSON) -> str | bytes:
+    return encode_response(message) if fmt == BIN else encode_message(message)
+
+
+class Session:
+    """Delivery state of one seat (game_id, pid) that outlives its sockets.
+
+    State frames are numbered; the newest one is kept together with a small
+    ring of notices (errors, LEAVING_GAME...), each tagged with the state seq
+    it followed. A client reconnecting with `last_seq` gets the notices it may
+    have missed and the latest state if it is newer than what it saw.
+    """
+
+    def __init__(self, proto: str = FULL, fmt: str = JSON):
+        self.proto: str = proto
+        self.fmt: str = fmt
+        self.seq: int = 0
+        self.last_state: str | bytes | None = None
+        self.notices: deque[tuple[int, str | bytes]] = deque(maxlen=REPLAY_SIZE)
+        self.delta: DeltaStream = DeltaStream()
+
+    def state_frame(self, state: PersonalState) -> str | bytes | None:
+        if self.proto == DELTA:
+            message = self.delta.next_message(state, self.seq + 1)
+            if message is None:
+                return None
+        else:
+            message = WsResponse(seq=self.seq + 1, state=state)
+        self.seq += 1
+        self.last_state = encode_frame(message, self.fmt)
+        return self.last_state
+
+    def missed(self, last_seq: int) -> list[tuple[str | bytes, bool]]:
+        frames: list[tuple[str | bytes, bool]] = [(frame, False) for tag, frame in self.notices if tag >= last_seq]
+        if self.last_state is not None and self.seq > last_seq:
+            frames.append((self.last_state, True))
+        return frames
+
+
+class Connection:
+    """One socket plus its writer task and bounded outbound queue."""
+
+    def __init__(self, manager: "ConnectionManager", websocket: WebSocket, game_id: str, pid: str):
+        self.manager = manager
+        self.websocket: WebSocket = websocket
+        self.game_id: str = game_id
+        self.pid: str = pid
+        self.queue: deque[tuple[str | bytes, bool]] = deque() # (frame, is_state)
+        self.wakeup: asyncio.Event = asyncio.Event()
+        self.sending: bool = False
+        self.closed: bool = False
+        self.task: asyncio.Task = asyncio.create_task(self._writer())
+
+    def push(self, frame: str | bytes, is_state: bool = True) -> bool:
+        if self.closed:
+            return False
+        if len(self.queue) >= self.manager.maxsize:
+            policy: str = self.manager.policy
+            if policy == DISCONNECT:
+                self.manager.evictions += 1
+                self.manager.disconnect(self.game_id, self.pid, self.websocket, code=1013, reason="SLOW_CONSUMER")
+                return False
+            if policy == COALESCE and is_state:
+                kept = [item for item in self.queue if not item[1]]
+                self.manager.dropped_frames += len(self.queue) - len(kept)
+                self.queue = deque(kept)
+            while len(self.queue) >= self.manager.maxsize:
+                self.queue.popleft()
+                self.manager.dropped_frames += 1
+        self.queue.append((frame, is_state))
+        self.wakeup.set()
+        return True
+
+    def close(self, code: int = 1000, reason: str = ""):
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.clear()
+        if self.task is not asyncio.current_task():
+            self.task.cancel()
+        asyncio.create_task(self._close_socket(code, reason))
+
+    async def _close_socket(self, code: int, reason: str):
+        try:
+            await asyncio.wait_for(self.websocket.close(code=code, reason=reason), CLOSE_TIMEOUT)
+        except Exception:
+            pass
+
+    async def _writer(self):
+        try:
+            while True:
+                while not self.queue:
+                    self.wakeup.clear()
+                    await self.wakeup.wait()
+                frame, _ = self.queue.popleft()
+                self.sending = True
+                start: float = metrics.clock()
+                if type(frame) is bytes:
+                    await self.websocket.send_bytes(frame)
+                else:
+                    await self.websocket.send_text(frame)
+                metrics.WS_SEND_SECONDS.observe(metrics.clock() - start)
+                self.sending = False
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # If sending fails (client closed), clean up the connection
+            self.manager.disconnect(self.game_id, self.pid, self.websocket)
+
 
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: dict[str, dict[str, WebSocket]] = {}
+    def __init__(self, maxsize: int = SEND_QUEUE_SIZE, policy: str = OVERFLOW_POLICY):
+        self.active_connections: dict[str, dict[str, Connection]] = {}
+        self.sessions: dict[str, dict[str, Session]] = {}
+        self.maxsize: int = maxsize
+        self.policy: str = policy
+        self.evictions: int = 0
+        self.dropped_frames: int = 0
 
-    async def connect(self, websocket: WebSocket, game_id: str, pid: str):
+    async def connect(self, websocket: WebSocket, game_id: str, pid: str, proto: str = FULL, fmt: str = JSON, last_seq: int | None = None) -> bool:
+        """Returns True when an existing session was resumed from `last_seq`."""
         await websocket.accept()
         if game_id not in self.active_connections:
             self.active_connections[game_id] = {}
         # 避免重复连接
         if pid in self.active_connections[game_id]:
-            await self.disconnect(game_id, pid)
-        self.active_connections[game_id][pid] = websocket
-
-    def disconnect(self, game_id: str, pid: str):
-        if game_id in self.active_connections and pid in self.active_connections[game_id]:
-            del self.active_connections[game_id][pid]
-            if not self.active_connections[game_id]:
-                del self.active_connections[game_id]
-
-    async def send_personal_message(self, message: WsResponse, game_id: str, pid: str):
-        if game_id in self.active_connections and pid in self.active_connections[game_id]:
-            websocket = self.active_connections[game_id][pid]
-            # WsResponse is a Pydantic model; convert to dict for JSON serialization
-            try:
-                await websocket.send_json(message.dict())
-            except Exception:
-                # If sending fails (client closed), clean up the connection
-                try:
-                    await websocket.close()
-                except Exception:
-                    pass
-                self.disconnect(game_id, pid)
-
-    async def broadcast(self, message: WsResponse, game_id: str, exclude_pid: Optional[str] = None):
-        if game_id not in self.active_connections:
+            self.disconnect(game_id, pid, code=1000, reason="REPLACED")
+            self.active_connections.setdefault(game_id, {})
+        conn = self.active_connections[game_id][pid] = Connection(self, websocket, game_id, pid)
+
+        session = self.get_session(game_id, pid)
+        if session is not None and (session.proto, session.fmt) == (proto, fmt) and last_seq is not None and last_seq <= session.seq:
+            if proto == DELTA:
+                session.delta.ack(last_seq)
+            for frame, is_state in session.missed(last_seq):
+                conn.push(frame, is_state)
+            return True
+        self.sessions.setdefault(game_id, {})[pid] = Session(proto, fmt)
+        return False
+
+    def disconnect(self, game_id: str, pid: str, websocket: WebSocket | None = None, code: int = 1000, reason: str = ""):
+        conns = self.active_connections.get(game_id)
+        if not conns or pid not in conns:
+            return
+        # a newer socket may already have replaced this one
+        if websocket is not None and conns[pid].websocket is not websocket:
             return
-        # Iterate over a static list to allow removal during iteration
-        for pid, websocket in list(self.active_connections[game_id].items()):
+        # the session stays behind so the seat can resume within the grace window
+        conns.pop(pid).close(code, reason)
+        if not conns:
+            del self.active_connections[game_id]
+
+    def get_session(self, game_id: str, pid: str) -> Session | None:
+        return self.sessions.get(game_id, {}).get(pid)
+
+    def drop_session(self, game_id: str, pid: str):
+        sessions = self.sessions.get(game_id)
+        if sessions and sessions.pop(pid, None) and not sessions:
+            del self.sessions[game_id]
+
+    def reset_stream(self, game_id: str, pid: str):
+        session = self.get_session(game_id, pid)
+        if session is not None:
+            session.delta.reset()
+
+    def ack(self, game_id: str, pid: str, seq: int):
+        session = self.get_session(game_id, pid)
+        if session is not None:
+            session.delta.ack(seq)
+
+    def send_personal_message(self, message: WsResponse, game_id: str, pid: str) -> bool:
+        conn = self.active_connections.get(game_id, {}).get(pid)
+        if conn is None:
+            return False
+        session = self.get_session(game_id, pid)
+        return conn.push(encode_frame(message, session.fmt if session else JSON), message.state is not None)
+
+    def broadcast(self, message: WsResponse, game_id: str, exclude_pid: Optional[str] = None) -> list[str]:
+        """Send a notice to the table; seats inside their grace window get it on resume."""
+        encoded: dict[str, str | bytes] = {} # encoded once per format
+        frames: dict[str, str | bytes] = {}
+        for pid, session in self.sessions.get(game_id, {}).items():
             if pid == exclude_pid:
                 continue
-            try:
-                await websocket.send_json(message.dict())
-            except Exception:
-                try:
-                    await websocket.close()
-                except Exception:
-                    pass
-                self.disconnect(game_id, pid)
+            frame = encoded.get(session.fmt)
+            if frame is None:
+                frame = encoded[session.fmt] = encode_frame(message, session.fmt)
+            session.notices.append((session.seq, frame))
+            frames[pid] = frame
+        return self.send_frames(game_id, {
+            pid: frame for pid, frame in frames.items() if pid in self.active_connections.get(game_id, {})
+        }, is_state=message.state is not None)
+
+    def send_states(self, game_id: str, states: dict[str, PersonalState]) -> list[str]:
+        """Number and queue each seat's state in the encoding its session negotiated.
+
+        Seats that are momentarily disconnected still get their frame recorded
+        so a resume only has to send the newest one.
+        """
+        sessions = self.sessions.get(game_id, {})
+        frames: dict[str, str | bytes] = {}
+        for pid, state in states.items():
+            session = sessions.get(pid)
+            if session is None:
+                continue
+            frame = session.state_frame(state)
+            if frame is not None:
+                frames[pid] = frame
+        return self.send_frames(game_id, {
+            pid: frame for pid, frame in frames.items() if pid in self.active_connections.get(game_id, {})
+        })
+
+    def send_frames(self, game_id: str, frames: dict[str, str | bytes], is_state: bool = True) -> list[str]:
+        """Queue pre-encoded frames for several players.
+
+        Never waits on a socket: each connection's writer task drains its own
+        queue, so a slow client only ever delays itself. Returns the pids whose
+        connection was gone or got evicted.
+        """
+        conns = self.active_connections.get(game_id, {})
+        failed: list[str] = []
+        for pid, frame in frames.items():
+            conn = conns.get(pid)
+            if conn is None or not conn.push(frame, is_state):
+                failed.append(pid)
+        return failed
+
+    def is_connected(self, game_id: str, pid: str) -> bool:
+        return pid in self.active_connections.get(game_id, {})
 
     def get_connection_count(self, game_id: str) -> int:
         return len(self.active_connections.get(game_id, {}))
 
-    async def close_all_connections(self, game_id: str):
-        if game_id not in self.active_connections:
-            return
-        for websocket in self.active_connections[game_id].values():
-            await websocket.close(code=1001, reason="Game ended")
-        del self.active_connections[game_id]
+    def get_stats(self) -> dict[str, int]:
+        depths: list[int] = [len(c.queue) for conns in self.active_connections.values() for c in conns.values()]
+        return {
+            "connections": len(depths),
+            "queued_frames": sum(depths),
+            "max_queue_depth": max(depths, default=0),
+            "evictions": self.evictions,
+            "dropped_frames": self.dropped_frames,
+        }
 
+    async def shutdown(self, message: WsResponse, code: int = 1001, reason: str = "", timeout: float = CLOSE_TIMEOUT):
+        """Say goodbye to every client on this worker: queue `message`, give the
+        writers up to `timeout` to flush, then close all sockets."""
+        for game_id in list(self.active_connections):
+            self.broadcast(message, game_id)
+        conns: list[Connection] = [c for conns in self.active_connections.values() for c in conns.values()]
+        deadline: float = asyncio.get_running_loop().time() + timeout
+        while any(c.queue or c.sending for c in conns if not c.closed) and asyncio.get_running_loop().time() < deadline:
+            await asyncio.sleep(0.01)
+        for game_id in list(self.active_connections):
+            for pid in list(self.active_connections.get(game_id, {})):
+                self.disconnect(game_id, pid, code=code, reason=reason)
+
+    async def close_all_connections(self, game_id: str):
+        for pid in list(self.active_connections.get(game_id, {})):
+            self.disconnect(game_id, pid, code=1001, reason="Game ended")
+        self.sessions.pop(game_id, None)
@@ -0,0 +1,101 @@
+import asyncio
+import uuid
+from collections import deque
+from typing import Callable
+
+from app.game import MIN_NUM_PLAYERS, MAX_NUM_PLAYERS
+from app.model import QueueMatch
+from app.error import GameError
+import app.error as err
+
+# seconds a /queue request waits for its table before giving up
+QUEUE_WAIT = 30.0
+
+
+class Ticket:
+    __slots__ = ("pid", "set_num", "future")
+
+    def __init__(self, set_num: int):
+        self.pid: str = str(uuid.uuid4())
+        self.set_num: int = set_num
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+
+
+class Matchmaker:
+    """FIFO of waiting players per table size.
+
+    Enqueue is a deque append. Leaving the queue only cancels the ticket's
+    future; cancelled tickets are skipped when a batch is popped, so both
+    ends stay O(1) amortized. Once `set_num` live tickets are waiting,
+    `create(set_num, pids)` builds and starts the table and every ticket
+    resolves to its QueueMatch.
+    """
+
+    def __init__(self, create: Callable[[int, list[str]], str]):
+        self.create: Callable[[int, list[str]], str] = create
+        self.queues: dict[int, deque[Ticket]] = {
+            n: deque() for n in range(MIN_NUM_PLAYERS, MAX_NUM_PLAYERS + 1)
+        }
+        self.waiting: dict[int, int] = {n: 0 for n in self.queues}
+        self.matched: int = 0
+
+    def enqueue(self, set_num: int) -> Ticket:
+        if set_num not in self.queues:
+            raise GameError(err.INVALID_PLAYER_NUM)
+        ticket = Ticket(set_num)
+        self.queues[set_num].append(ticket)
+        self.waiting[set_num] += 1
+        if self.waiting[set_num] >= set_num:
+            self._fill(set_num)
+        return ticket
+
+    def leave(self, ticket: Ticket) -> bool:
+        """False if the ticket was already matched (the seat exists)."""
+        if ticket.future.done():
+            return False
+        ticket.future.cancel()
+        self.waiting[ticket.set_num] -= 1
+        return True
+
+    def _fill(self, set_num: int):
+        queue: deque[Ticket] = self.queues[set_num]
+        batch: list[Ticket] = []
+        while len(batch) < set_num:
+            ticket = queue.popleft()
+            if not ticket.future.done():
+                batch.append(ticket)
+        self.waiting[set_num] -= set_num
+        try:
+            game_id: str = self.create(set_num, [t.pid for t in batch])
+        except Exception as e:
+            for t in batch:
+                t.future.set_exception(e)
+            return
+        self.matched += set_num
+        for t in batch:
+            t.future.set_result(QueueMatch(game_id=game_id, pid=t.pid))
+
+    def close(self, error: Exception):
+        """Fail every waiting ticket, e.g. when the worker drains."""
+        for set_num, queue in self.queues.items():
+            while queue:
+                ticket = queue.popleft()
+                if not ticket.future.done():
+                    ticket.future.set_exception(error)
+            self.waiting[set_num] = 0
+
+    async def wait(self, ticket: Ticket, timeout: float = QUEUE_WAIT) -> QueueMatch:
+        try:
+            await asyncio.wait({ticket.future}, timeout=timeout)
+        finally:
+            # client gone or timed out: free the slot unless the table is already built
+            self.leave(ticket)
+        if ticket.future.cancelled():
+            raise GameError(err.QUEUE_TIMEOUT)
+        return ticket.future.result()
+
+    def get_stats(self) -> dict[str, int]:
+        return {
+            "queued_players": sum(self.waiting.values()),
+            "matched_players": self.matched,
+        }
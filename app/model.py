@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, Generic, TypeVar
+from typing import Any, Optional, Generic, TypeVar
 
 # game model
 class Card(BaseModel):
@@ -34,6 +34,10 @@ class GameInfo(BaseModel):
     num_players: int
     started: bool
 
+class GamePage(BaseModel):
+    games: list[GameInfo] = []
+    next_cursor: Optional[int] = None  # pass back as ?cursor= for the next page, None on the last page
+
 class PersonalState(BaseModel):
     player: Player
     other_cards_num: dict[str, int] = {}
@@ -61,9 +65,17 @@ class CreateGameRequest(BaseModel):
 class FetchGameRequest(BaseModel):
     game_id: str
 
+class QueueRequest(BaseModel):
+    set_num: int
+
+class QueueMatch(BaseModel):
+    game_id: str
+    pid: str
+
 class WsMoveRequest(BaseModel):
-    type: str = Field(..., description="INIT?EMB/IMP/PLAY/CONT_PLAY")
+    type: str = Field(..., description="INIT?EMB/IMP/PLAY/CONT_PLAY/ACK")
     move_data: SingleMoveData = None
+    seq: Optional[int] = None  # ACK: last state seq the client has applied (delta protocol)
 
 # response model
 T = TypeVar("T")
@@ -72,10 +84,19 @@ class ApiResponse(BaseModel, Generic[T]):
     msg: str = "SUCCESS"  # 提示信息
     data: Optional[T] = None  # 业务数据（泛型，支持不同类型）
 
+class PatchOp(BaseModel):
+    op: str  # add / remove / replace
+    path: str
+    value: Any = None
+
 class WsResponse(BaseModel):
     code: int = 200  # 200成功，4xx/5xx失败
     msg: str = "SUCCESS"  # 提示信息
     state: Optional[PersonalState] = None
+    # delta protocol: full snapshot carries state + seq, updates carry patch against base_seq
+    seq: Optional[int] = None
+    base_seq: Optional[int] = None
+    patch: Optional[list[PatchOp]] = None
 
 # class GameInfoReponse(BaseModel):
 #     game_id: str
@@ -0,0 +1,197 @@
+"""Opt-in sampling profiler for the event loop thread.
+
+    curl -X POST -H 'X-Admin-Token: ...' 'localhost:8000/admin/profile?enabled=true&rate=100'
+    flamegraph.pl profile.folded > profile.svg      # or load it into speedscope
+
+The endpoint needs X-Admin-Token when ADMIN_TOKEN is set and is only
+reachable from loopback when it is not, since sampling costs CPU and
+writes PROFILE_PATH.
+
+When the loop runs on the main thread (uvicorn's default), sampling uses
+SIGPROF: an interval timer on process CPU time fires `rate` times per
+CPU-second and the handler counts the frame that was executing. Idle time
+costs nothing and short moves are caught exactly. Otherwise ("wall" mode)
+a daemon thread wakes `rate` times a second and reads the loop thread's
+stack with sys._current_frames(); it only gets the GIL when the loop
+releases it, so it misses work shorter than sys.getswitchinterval() and is
+mainly useful for long stalls.
+
+The loop itself only pays for `tag()`: handlers mark the synchronous
+section they are in with (handler, game_id, move), and each stack is
+prefixed with that tag, so a flame graph splits by handler, table and
+move type. Tags are set and cleared without an await in between, so a
+sample never carries the tag of another task.
+
+Every `dump_interval` seconds a thread rewrites PROFILE_PATH with the
+aggregated stacks in the folded format ("frame;frame;frame count"). At
+most MAX_STACKS distinct stacks are kept, later ones are counted under
+"[truncated]".
+"""
+import os
+import signal
+import sys
+import threading
+import time
+from typing import Any
+
+PROFILE_RATE = 100.0  # samples per second
+MAX_PROFILE_RATE = 1000.0
+PROFILE_DUMP_INTERVAL = 10.0
+PROFILE_PATH = "profile.folded"
+MAX_DEPTH = 64
+MAX_STACKS = 20_000
+
+# sampling modes
+CPU = "cpu"
+WALL = "wall"
+
+# handlers
+WS = "ws"
+HTTP_MOVE = "http_move"
+TIMER = "timer"
+PARSE = "PARSE"  # move label while the frame is still being validated
+
+Tag = tuple[str, str, str]  # (handler, game_id, move)
+
+# set by the loop thread, read by the sampler; a tuple swap is atomic under the GIL
+current: Tag | None = None
+
+
+def tag(handler: str, game_id: str, move: str) -> Tag | None:
+    """Mark the running synchronous section; pass the result to `untag` when it ends."""
+    global current
+    prev: Tag | None = current
+    current = (handler, game_id, move)
+    return prev
+
+
+def untag(prev: Tag | None = None):
+    global current
+    current = prev
+
+
+def _frame_name(frame) -> str:
+    module: str = frame.f_globals.get("__name__") or os.path.basename(frame.f_code.co_filename)
+    return f"{module}:{frame.f_code.co_qualname}"
+
+
+class Profiler:
+    def __init__(self,
+                 path: str = PROFILE_PATH,
+                 rate: float = PROFILE_RATE,
+                 dump_interval: float = PROFILE_DUMP_INTERVAL):
+        self.path: str = path
+        self.rate: float = rate
+        self.dump_interval: float = dump_interval
+        self.stacks: dict[str, int] = {}
+        self.samples: int = 0
+        self.dumps: int = 0
+        self.last_dump_ms: float = 0.0
+        self.mode: str | None = None
+        self.prev_handler: Any = None
+        self.thread_id: int | None = None # the loop thread being sampled
+        self.thread: threading.Thread | None = None
+        self.stop_event: threading.Event = threading.Event()
+        self.names: dict[Any, str] = {} # code object -> frame name, saves re-formatting per sample
+
+    @property
+    def enabled(self) -> bool:
+        return self.thread is not None
+
+    def start(self, rate: float | None = None, reset: bool = False):
+        """Call from the loop thread; that is the thread that gets sampled."""
+        if rate is not None:
+            self.rate = min(max(rate, 1.0), MAX_PROFILE_RATE)
+        if reset:
+            self.stacks = {}
+            self.samples = 0
+        if self.thread is not None:
+            if self.mode == CPU:
+                signal.setitimer(signal.ITIMER_PROF, 1.0 / self.rate, 1.0 / self.rate)
+            return
+        self.thread_id = threading.get_ident()
+        self.mode = CPU if hasattr(signal, "setitimer") and threading.current_thread() is threading.main_thread() else WALL
+        if self.mode == CPU:
+            self.prev_handler = signal.signal(signal.SIGPROF, self._on_signal)
+            signal.setitimer(signal.ITIMER_PROF, 1.0 / self.rate, 1.0 / self.rate)
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if self.thread is None:
+            return
+        if self.mode == CPU:
+            signal.setitimer(signal.ITIMER_PROF, 0)
+            signal.signal(signal.SIGPROF, self.prev_handler or signal.SIG_DFL)
+        self.stop_event.set()
+        self.thread.join()
+        self.thread = None
+        self.dump()
+
+    def _on_signal(self, signum, frame):
+        self.sample(frame)
+
+    def sample(self, frame):
+        if frame is None:
+            return
+        names: list[str] = []
+        while frame is not None and len(names) < MAX_DEPTH:
+            code = frame.f_code
+            name: str | None = self.names.get(code)
+            if name is None:
+                name = self.names[code] = _frame_name(frame)
+            names.append(name)
+            frame = frame.f_back
+        names.reverse()
+        t: Tag | None = current
+        if t is not None:
+            names[:0] = (t[0], f"game:{t[1]}", f"move:{t[2]}")
+        key: str = ";".join(names)
+        if key not in self.stacks and len(self.stacks) >= MAX_STACKS:
+            key = "[truncated]"
+        self.stacks[key] = self.stacks.get(key, 0) + 1
+        self.samples += 1
+
+    def dump(self):
+        start: float = time.perf_counter()
+        tmp: str = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            for key, n in list(self.stacks.items()):
+                f.write(f"{key} {n}\n")
+        os.replace(tmp, self.path)
+        self.dumps += 1
+        self.last_dump_ms = (time.perf_counter() - start) * 1000
+
+    def _run(self):
+        next_dump: float = time.monotonic() + self.dump_interval
+        while not self.stop_event.wait(1.0 / self.rate if self.mode == WALL else self.dump_interval):
+            if self.mode == WALL:
+                self.sample(sys._current_frames().get(self.thread_id))
+            if time.monotonic() >= next_dump:
+                next_dump = time.monotonic() + self.dump_interval
+                try:
+                    self.dump()
+                except OSError:
+                    pass # keep sampling, the next dump retries
+
+    def get_stats(self) -> dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "mode": self.mode,
+            "rate": self.rate,
+            "path": self.path,
+            "samples": self.samples,
+            "stacks": len(self.stacks),
+            "dumps": self.dumps,
+            "last_dump_ms": round(self.last_dump_ms, 2),
+        }
+
+
+def from_env() -> Profiler:
+    """PROFILE_RATE / PROFILE_PATH / PROFILE_DUMP_INTERVAL; PROFILE=1 starts sampling at startup."""
+    return Profiler(
+        os.environ.get("PROFILE_PATH", PROFILE_PATH),
+        float(os.environ.get("PROFILE_RATE", PROFILE_RATE)),
+        float(os.environ.get("PROFILE_DUMP_INTERVAL", PROFILE_DUMP_INTERVAL)),
+    )
@@ -0,0 +1,103 @@
+"""Token-bucket rate limits for REST calls and WebSocket frames.
+
+A bucket holds up to `burst` tokens and refills at `rate` per second; each
+request takes one. Buckets live in an OrderedDict as (tokens, updated)
+tuples, least recently used first. A bucket untouched for burst / rate
+seconds is full again, which is the same as having no entry, so sweep()
+pops those off the front. At most `max_keys` buckets are kept; a new key
+beyond that evicts the least recently used one, so rotating IPs or pids
+cannot exhaust memory and cannot lock out keys that show up later.
+Keys should still only be created for things that exist (a seated pid,
+a live game) so that junk keys cannot churn real ones out.
+
+RateLimitMiddleware answers refused HTTP requests with a pre-encoded 429
+before routing or body validation run.
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable
+
+import app.metrics as metrics
+
+MAX_KEYS = 100_000
+SWEEP_INTERVAL = 10.0
+
+
+class RateLimiter:
+    def __init__(self, name: str, rate: float, burst: float, max_keys: int = MAX_KEYS):
+        self.name: str = name
+        self.rate: float = rate
+        self.burst: float = burst
+        self.max_keys: int = max_keys
+        self.full_after: float = burst / rate # idle seconds after which a bucket is full
+        self.buckets: OrderedDict[Hashable, tuple[float, float]] = OrderedDict()
+        self.next_sweep: float = 0.0
+        self.rejected: int = 0
+        self.evicted: int = 0
+
+    def allow(self, key: Hashable) -> bool:
+        now: float = time.monotonic()
+        if now >= self.next_sweep:
+            self.sweep(now)
+        entry: tuple[float, float] | None = self.buckets.get(key)
+        if entry is None:
+            if len(self.buckets) >= self.max_keys:
+                self.buckets.popitem(last=False)
+                self.evicted += 1
+            tokens: float = self.burst
+        else:
+            tokens = min(self.burst, entry[0] + (now - entry[1]) * self.rate)
+            self.buckets.move_to_end(key)
+        if tokens < 1:
+            return self._reject()
+        self.buckets[key] = (tokens - 1, now)
+        return True
+
+    def _reject(self) -> bool:
+        self.rejected += 1
+        metrics.RATE_LIMITED.inc(self.name)
+        return False
+
+    def sweep(self, now: float):
+        # least recently used first: stop at the first bucket still refilling
+        cutoff: float = now - self.full_after
+        while self.buckets:
+            key, (_, updated) = next(iter(self.buckets.items()))
+            if updated > cutoff:
+                break
+            del self.buckets[key]
+        self.next_sweep = now + max(self.full_after, SWEEP_INTERVAL)
+
+    def get_stats(self) -> dict[str, int]:
+        return {
+            f"ratelimit_{self.name}_keys": len(self.buckets),
+            f"ratelimit_{self.name}_rejected": self.rejected,
+            f"ratelimit_{self.name}_evicted": self.evicted,
+        }
+
+
+class RateLimitMiddleware:
+    """ASGI middleware: `check(method, path, client_ip)` returns False to refuse an HTTP request."""
+
+    def __init__(self, app: Callable[..., Awaitable[Any]], check: Callable[[str, str, str], bool], body: bytes):
+        self.app = app
+        self.check: Callable[[str, str, str], bool] = check
+        self.start: dict = {
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", b"1"),
+            ],
+        }
+        self.body: dict = {"type": "http.response.body", "body": body}
+
+    async def __call__(self, scope: dict, receive: Callable, send: Callable):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        client = scope.get("client")
+        if self.check(scope["method"], scope["path"], client[0] if client else ""):
+            return await self.app(scope, receive, send)
+        await send(self.start)
+        await send(self.body)
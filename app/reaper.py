@@ -0,0 +1,146 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable
+
+from app.game import Game
+from app.model import GameState
+
+# game states, each with its own idle TTL in seconds
+LOBBY = "lobby"        # waiting for players
+ACTIVE = "active"      # started, not finished
+FINISHED = "finished"  # finished, or started and everyone left
+GAME_TTLS: dict[str, float] = {
+    LOBBY: 600.0,
+    ACTIVE: 1800.0,
+    FINISHED: 120.0,
+}
+SWEEP_INTERVAL = 15.0
+# final states of evicted finished games kept in memory, 0 disables the archive
+ARCHIVE_SIZE = 256
+
+logger = logging.getLogger(__name__)
+
+
+def game_status(game: Game) -> str:
+    if game.finished or (game.started and not game.players):
+        return FINISHED
+    return ACTIVE if game.started else LOBBY
+
+
+class Reaper:
+    """Evicts games that stayed idle longer than the TTL of their state.
+
+    Activity is read from `Game.version`, which every move bumps, so the
+    engine needs no extra bookkeeping; sockets and other non-mutating
+    traffic call `touch`. Evicting is left to the `evict` callback, which
+    owns the game's sockets, timers and actor and may return False to keep
+    the game.
+    """
+
+    def __init__(self,
+                 games: dict[str, Game],
+                 evict: Callable[[str], Awaitable[Any]],
+                 ttls: dict[str, float] = GAME_TTLS,
+                 interval: float = SWEEP_INTERVAL,
+                 archive_size: int = ARCHIVE_SIZE):
+        self.games: dict[str, Game] = games
+        self.evict: Callable[[str], Awaitable[Any]] = evict
+        self.ttls: dict[str, float] = ttls
+        self.interval: float = interval
+        self.seen: dict[str, tuple[int, float]] = {} # game_id -> (version, last activity)
+        self.archive: deque[tuple[str, GameState]] | None = deque(maxlen=archive_size) if archive_size else None
+        self.evicted: dict[str, int] = {LOBBY: 0, ACTIVE: 0, FINISHED: 0}
+        self.task: asyncio.Task | None = None
+
+    def touch(self, game_id: str):
+        game = self.games.get(game_id)
+        if game is not None:
+            self.seen[game_id] = (game.version, time.monotonic())
+
+    def expired(self, now: float | None = None) -> list[tuple[str, str]]:
+        now = time.monotonic() if now is None else now
+        expired: list[tuple[str, str]] = []
+        for gid, game in self.games.items():
+            seen = self.seen.get(gid)
+            if seen is None or seen[0] != game.version:
+                self.seen[gid] = (game.version, now)
+                continue
+            status: str = game_status(game)
+            if now - seen[1] >= self.ttls[status]:
+                expired.append((gid, status))
+        for gid in [gid for gid in self.seen if gid not in self.games]:
+            del self.seen[gid]
+        return expired
+
+    async def sweep(self, now: float | None = None) -> int:
+        expired = self.expired(now)
+        for gid, status in expired:
+            game = self.games.get(gid)
+            if game is None:
+                continue
+            state: GameState | None = None
+            if status == FINISHED and self.archive is not None:
+                try:
+                    state = game.get_state()
+                except Exception:
+                    # the game is still evicted, it just stays out of the archive
+                    logger.exception("cannot archive game %s", gid)
+            # evict may decline (False) to keep the game
+            try:
+                if await self.evict(gid) is False:
+                    continue
+            except Exception:
+                logger.exception("cannot evict game %s", gid)
+                continue
+            if state is not None:
+                self.archive.append((gid, state))
+            self.seen.pop(gid, None)
+            self.evicted[status] += 1
+        return len(expired)
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task is None:
+            return
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        self.task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.sweep()
+            except Exception:
+                # sweep() already isolates each game; this only keeps the task alive
+                logger.exception("reaper sweep failed")
+
+    def get_archived(self, game_id: str) -> GameState | None:
+        for gid, state in reversed(self.archive or ()):
+            if gid == game_id:
+                return state
+        return None
+
+    def live_counts(self) -> dict[str, int]:
+        live: dict[str, int] = {LOBBY: 0, ACTIVE: 0, FINISHED: 0}
+        for game in self.games.values():
+            live[game_status(game)] += 1
+        return live
+
+    def get_stats(self) -> dict[str, int]:
+        live: dict[str, int] = self.live_counts()
+        return {
+            "live_games": len(self.games),
+            **{f"live_{k}": v for k, v in live.items()},
+            "evicted_games": sum(self.evicted.values()),
+            **{f"evicted_{k}": v for k, v in self.evicted.items()},
+            "archived_games": len(self.archive or ()),
+        }
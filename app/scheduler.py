@@ -0,0 +1,54 @@
+import asyncio
+from typing import Any, Callable
+
+
+class Scheduler:
+    """Per-game phase deadlines on top of the event loop's own timer heap.
+
+    Each (game_id, phase) owns at most one `loop.call_at` handle, so an idle
+    table costs nothing until its deadline fires. Callbacks may be plain
+    functions or coroutine functions.
+    """
+
+    def __init__(self):
+        self.handles: dict[str, dict[str, asyncio.TimerHandle]] = {}
+        self.tasks: set[asyncio.Task] = set()
+
+    def schedule(self, game_id: str, phase: str, delay: float, callback: Callable[..., Any], *args) -> bool:
+        phases = self.handles.setdefault(game_id, {})
+        if phase in phases:
+            return False
+        loop = asyncio.get_running_loop()
+        phases[phase] = loop.call_at(loop.time() + delay, self._fire, game_id, phase, callback, args)
+        return True
+
+    def pending(self, game_id: str, phase: str) -> bool:
+        return phase in self.handles.get(game_id, {})
+
+    def deadline(self, game_id: str, phase: str) -> float | None:
+        handle = self.handles.get(game_id, {}).get(phase)
+        return handle.when() if handle else None
+
+    def cancel(self, game_id: str, phase: str | None = None):
+        phases = self.handles.get(game_id)
+        if not phases:
+            return
+        for key in ([phase] if phase else list(phases)):
+            handle = phases.pop(key, None)
+            if handle:
+                handle.cancel()
+        if not phases:
+            del self.handles[game_id]
+
+    def _fire(self, game_id: str, phase: str, callback: Callable[..., Any], args: tuple):
+        phases = self.handles.get(game_id)
+        if phases is not None:
+            phases.pop(phase, None)
+            if not phases:
+                del self.handles[game_id]
+        result = callback(*args)
+        if asyncio.iscoroutine(result):
+            task = asyncio.ensure_future(result)
+            # keep a strong reference until the task is done
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
@@ -0,0 +1,115 @@
+"""Game-affine sharding across worker processes.
+
+Every worker gets the same node list (SHARD_NODES, the public base URLs of
+all workers) and its own SHARD_SELF. A consistent hash ring maps each
+game_id to one node: /create only mints ids that hash to the local node,
+and ShardRouter bounces any request for a foreign game to its owner
+(307 for HTTP; for WebSockets close code WS_REDIRECT with the owner's
+base URL as reason), so a table's state and sockets always live in one
+process.
+"""
+import bisect
+import hashlib
+import os
+import re
+from typing import Any, Awaitable, Callable
+
+VNODES = 64
+WS_REDIRECT = 4307
+
+# paths addressing one game, group 1 is the game_id
+GAME_PATHS: list[re.Pattern] = [
+    re.compile(r"^/join/([^/]+)$"),
+    re.compile(r"^/move/([^/]+)/[^/]+$"),
+    re.compile(r"^/archive/([^/]+)$"),
+    re.compile(r"^/ws/([^/]+)/[^/]+$"),
+]
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    def __init__(self, nodes: list[str], vnodes: int = VNODES):
+        if not nodes:
+            raise ValueError("empty ring")
+        self.nodes: list[str] = list(nodes)
+        points: list[tuple[int, str]] = sorted(
+            (_hash(f"{node}#{i}"), node) for node in self.nodes for i in range(vnodes)
+        )
+        self.keys: list[int] = [k for k, _ in points]
+        self.owners: list[str] = [node for _, node in points]
+
+    def owner(self, key: str) -> str:
+        i = bisect.bisect(self.keys, _hash(key)) % len(self.keys)
+        return self.owners[i]
+
+
+class Shard:
+    """This worker's view of the ring; a single-node shard owns everything."""
+
+    def __init__(self, nodes: list[str] | None = None, me: str | None = None):
+        nodes = [n.rstrip("/") for n in (nodes or []) if n]
+        me = (me or "").rstrip("/")
+        if len(nodes) > 1 and me not in nodes:
+            raise ValueError(f"SHARD_SELF {me!r} is not in SHARD_NODES")
+        self.me: str = me
+        self.ring: HashRing | None = HashRing(nodes) if len(nodes) > 1 else None
+
+    @classmethod
+    def from_env(cls) -> "Shard":
+        return cls(os.environ.get("SHARD_NODES", "").split(","), os.environ.get("SHARD_SELF"))
+
+    @property
+    def enabled(self) -> bool:
+        return self.ring is not None
+
+    def owner(self, game_id: str) -> str:
+        return self.ring.owner(game_id) if self.ring else self.me
+
+    def is_local(self, game_id: str) -> bool:
+        return self.ring is None or self.ring.owner(game_id) == self.me
+
+
+def game_id_of(path: str) -> str | None:
+    for pattern in GAME_PATHS:
+        m = pattern.match(path)
+        if m:
+            return m.group(1)
+    return None
+
+
+class ShardRouter:
+    """ASGI middleware sending requests for games owned by another worker there."""
+
+    def __init__(self, app: Callable[..., Awaitable[Any]], shard: Shard):
+        self.app = app
+        self.shard: Shard = shard
+
+    async def __call__(self, scope: dict, receive: Callable, send: Callable):
+        if scope["type"] not in ("http", "websocket") or not self.shard.enabled:
+            return await self.app(scope, receive, send)
+        game_id = game_id_of(scope["path"])
+        if game_id is None or self.shard.is_local(game_id):
+            return await self.app(scope, receive, send)
+
+        if scope["type"] == "http":
+            target: str = self.shard.owner(game_id) + scope["path"]
+            if scope.get("query_string"):
+                target += "?" + scope["query_string"].decode("latin-1")
+            await send({
+                "type": "http.response.start",
+                "status": 307,
+                "headers": [(b"location", target.encode("latin-1")), (b"content-length", b"0")],
+            })
+            await send({"type": "http.response.body", "body": b""})
+        else:
+            # close reasons are capped at 123 bytes: send only the owner's base URL,
+            # the client reconnects there with the same path and query
+            base: str = self.shard.owner(game_id)
+            if base.startswith("http"):
+                base = "ws" + base[4:]
+            await receive() # websocket.connect
+            await send({"type": "websocket.accept"})
+            await send({"type": "websocket.close", "code": WS_REDIRECT, "reason": base})
@@ -0,0 +1,198 @@
+"""Where games live.
+
+MemoryStore keeps Game objects in this process (the default). SharedStore
+additionally replicates Game.dump() snapshots into a table server for
+shard failover: when sharded workers restart, or SHARD_NODES changes,
+each one preloads the games it now owns:
+
+    python -m app.store --address /tmp/embalming-store.sock
+    GAME_STORE=shared python -m app.cluster --workers 4
+
+It does not let several workers serve the same game. Sockets, interactive
+phase collectors, the lobby and the reaper are per worker, and the table
+is only read by preload(), so SharedStore requires sticky routing
+(app.shard): every game has exactly one owner, whose in-process copy is
+authoritative. Reads never leave the process; writes are shipped to the
+table in order by a single background thread, off the event loop.
+"""
+import abc
+import argparse
+import asyncio
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from multiprocessing.managers import BaseManager
+from typing import Callable
+
+from app.game import Game
+
+MEMORY = "memory"
+SHARED = "shared"
+STORE_ADDRESS = "/tmp/embalming-store.sock"
+STORE_AUTHKEY = b"embalming"
+
+logger = logging.getLogger(__name__)
+
+
+class GameStore(abc.ABC):
+    """get / put / delete / ids over game_id -> Game.
+
+    `games` holds the Game objects this process currently has loaded; it is
+    what the lobby and the reaper index.
+    """
+
+    def __init__(self):
+        self.games: dict[str, Game] = {}
+
+    @abc.abstractmethod
+    def get(self, game_id: str) -> Game | None:
+        ...
+
+    @abc.abstractmethod
+    def put(self, game_id: str, game: Game):
+        ...
+
+    @abc.abstractmethod
+    def delete(self, game_id: str):
+        ...
+
+    @abc.abstractmethod
+    def ids(self) -> list[str]:
+        ...
+
+    def __contains__(self, game_id: str) -> bool:
+        return self.get(game_id) is not None
+
+    async def preload(self, owns: Callable[[str], bool]) -> dict[str, Game]:
+        """Games kept outside this process that `owns` accepts, read at startup."""
+        return {}
+
+    async def flush(self):
+        """Wait until every write so far has left this process."""
+
+
+class MemoryStore(GameStore):
+    def get(self, game_id: str) -> Game | None:
+        return self.games.get(game_id)
+
+    def put(self, game_id: str, game: Game):
+        self.games[game_id] = game
+
+    def delete(self, game_id: str):
+        self.games.pop(game_id, None)
+
+    def ids(self) -> list[str]:
+        return list(self.games)
+
+    def __contains__(self, game_id: str) -> bool:
+        return game_id in self.games
+
+
+class SnapshotTable:
+    """Server side of SharedStore: game_id -> (version, snapshot)."""
+
+    def __init__(self):
+        self.rows: dict[str, tuple[int, bytes]] = {}
+        self.lock = threading.Lock() # the manager serves each client on its own thread
+
+    def get(self, game_id: str) -> tuple[int, bytes] | None:
+        return self.rows.get(game_id)
+
+    def put(self, game_id: str, version: int, data: bytes):
+        with self.lock:
+            self.rows[game_id] = (version, data)
+
+    def delete(self, game_id: str):
+        with self.lock:
+            self.rows.pop(game_id, None)
+
+    def ids(self) -> list[str]:
+        return list(self.rows)
+
+
+class TableManager(BaseManager):
+    pass
+
+
+class SharedStore(MemoryStore):
+    """MemoryStore whose writes are replicated to a SnapshotTable server.
+
+    The snapshot is taken on the loop, where the game is consistent between
+    jobs; the round trip (about 40 us) runs on a one-thread executor, which
+    also keeps each game's writes in order.
+    """
+
+    def __init__(self, address: str = STORE_ADDRESS, authkey: bytes = STORE_AUTHKEY):
+        super().__init__()
+        TableManager.register("table")
+        self.manager = TableManager(address=address, authkey=authkey)
+        self.manager.connect()
+        self.table = self.manager.table()
+        self.executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="game-store")
+        self.pending: Future | None = None
+
+    def _submit(self, fn: Callable, *args):
+        self.pending = self.executor.submit(fn, *args)
+        self.pending.add_done_callback(self._done)
+
+    def _done(self, future: Future):
+        if future.exception() is not None:
+            logger.error("game store write failed", exc_info=future.exception())
+
+    def put(self, game_id: str, game: Game):
+        super().put(game_id, game)
+        self._submit(self.table.put, game_id, game.version, game.dump())
+
+    def delete(self, game_id: str):
+        super().delete(game_id)
+        self._submit(self.table.delete, game_id)
+
+    def _fetch(self, owns: Callable[[str], bool]) -> dict[str, tuple[int, bytes]]:
+        rows: dict[str, tuple[int, bytes]] = {}
+        for game_id in self.table.ids():
+            if owns(game_id):
+                row = self.table.get(game_id)
+                if row is not None:
+                    rows[game_id] = row
+        return rows
+
+    async def preload(self, owns: Callable[[str], bool]) -> dict[str, Game]:
+        rows = await asyncio.get_running_loop().run_in_executor(self.executor, self._fetch, owns)
+        return {game_id: Game.load(data) for game_id, (_, data) in rows.items()}
+
+    async def flush(self):
+        # the executor runs jobs in order, so the last one finishing means all have
+        if self.pending is not None:
+            await asyncio.wrap_future(self.pending)
+
+
+def from_env(sticky: bool) -> GameStore:
+    """`sticky` says whether every game_id is routed to a single worker."""
+    kind: str = os.environ.get("GAME_STORE", MEMORY)
+    if kind == SHARED:
+        if not sticky:
+            raise ValueError("GAME_STORE=shared needs sticky routing, set SHARD_NODES / SHARD_SELF")
+        return SharedStore(
+            os.environ.get("GAME_STORE_ADDRESS", STORE_ADDRESS),
+            os.environ.get("GAME_STORE_AUTHKEY", STORE_AUTHKEY.decode()).encode(),
+        )
+    if kind != MEMORY:
+        raise ValueError(f"unknown GAME_STORE {kind!r}")
+    return MemoryStore()
+
+
+def serve(address: str = STORE_ADDRESS, authkey: bytes = STORE_AUTHKEY):
+    table = SnapshotTable()
+    TableManager.register("table", callable=lambda: table)
+    if os.path.exists(address):
+        os.unlink(address)
+    TableManager(address=address, authkey=authkey).get_server().serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="shared game snapshot table for GAME_STORE=shared")
+    parser.add_argument("--address", default=STORE_ADDRESS)
+    parser.add_argument("--authkey", default=STORE_AUTHKEY.decode())
+    args = parser.parse_args()
+    serve(args.address, args.authkey.encode())
@@ -0,0 +1,242 @@
+"""Headless engine benchmark: seeded random-but-legal games through Game.
+
+    python -m bench.engine                       # compare with bench/baseline.json
+    python -m bench.engine --save                # record a new baseline
+    python -m bench.engine --games 500 --sizes 4 5
+
+Every game is driven through Game.apply_move (which dispatches to emb_card,
+imp_card, play_card and the follow-up moves) and resolve_inter, the same
+entry points the server uses. For each table size it reports:
+
+    moves_per_s       engine throughput, move generation excluded
+    view_us           cost of an uncached get_personal_state
+    peak_bytes_move   transient allocation high-water per move (tracemalloc pass)
+    net_blocks_move   memory blocks still held per move, a leak indicator
+
+The number of moves and finished games only depends on the seed, so a
+change there means the engine's behaviour changed, not its speed. `stuck`
+counts tables left in a phase with no legal move (e.g. gui-zhai-bu played
+while the embalm zone is empty). Timing
+baselines are machine specific: record them with --save on the box that
+runs the comparison.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+from app.error import GameError
+from app.game import (
+    Game, MIN_NUM_PLAYERS, MAX_NUM_PLAYERS, FAN_REN,
+    DEFAULT, TAKE_FROM_PLAYED, CHECK_PLAYER_CARDS, CHECK_EMBED_CARDS, MOVE_IMPED_CARD, PICK_FROM_EMBED,
+    EXCHANGE_WITH_EMBED, PICK_PLAYER_PICK_CARD, PICK_PLAYER, EXCHANGE_CARD, GIVE_TO_NEXT, CHECK_FANREN_PLAYER,
+)
+from app.model import SingleMoveData
+
+BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+GAMES = 2000
+MAX_MOVES = 500 # per game, guards against a table that cannot progress
+ALLOC_GAMES = 50
+# slower / bigger than the baseline by more than this fraction is a regression
+TOLERANCE = 0.15
+
+# metric -> True when higher is better
+METRICS: dict[str, bool] = {
+    "moves_per_s": True,
+    "view_us": False,
+    "peak_bytes_move": False,
+    "net_blocks_move": False,
+}
+
+
+def _md(tpids: list[str] = (), cindexs: list[int] = ()) -> SingleMoveData:
+    return SingleMoveData.model_construct(tpids=list(tpids), cindexs=list(cindexs))
+
+
+def next_move(game: Game, rng: random.Random) -> tuple[str, str, SingleMoveData | None] | None:
+    """A legal (pid, req_type, move_data) for the current player, None if there is none."""
+    seat = game.players[game.curr]
+    others = [p for p in game.players if p is not seat]
+    phase: str = game.curr_move_type
+    if phase == DEFAULT:
+        cindexs = [i for i, c in enumerate(seat.hand) if c != FAN_REN]
+        if not cindexs:
+            return None
+        req_type: str = rng.choice(("EMB", "IMP", "PLAY"))
+        return seat.pid, req_type, _md([rng.choice(game.players).pid], [rng.choice(cindexs)])
+    if phase == TAKE_FROM_PLAYED:
+        return (seat.pid, phase, _md(cindexs=[rng.randrange(len(game.played))])) if game.played else None
+    if phase in (CHECK_PLAYER_CARDS, PICK_PLAYER):
+        return seat.pid, phase, _md([rng.choice(others).pid])
+    if phase == PICK_PLAYER_PICK_CARD:
+        targets = [p for p in others if p.hand]
+        if not targets or not seat.hand:
+            return None
+        target = rng.choice(targets)
+        return seat.pid, phase, _md([target.pid], [rng.randrange(len(seat.hand)), rng.randrange(len(target.hand))])
+    if phase == CHECK_EMBED_CARDS:
+        return seat.pid, phase, None
+    if phase == MOVE_IMPED_CARD:
+        sources = [p for p in game.players if p.imped]
+        if not sources:
+            return None
+        source = rng.choice(sources)
+        return seat.pid, phase, _md([source.pid, rng.choice(game.players).pid], [rng.randrange(len(source.imped))])
+    if phase in (PICK_FROM_EMBED, EXCHANGE_WITH_EMBED):
+        if not game.embed or not seat.hand:
+            return None
+        if phase == PICK_FROM_EMBED:
+            return seat.pid, phase, _md(cindexs=[rng.randrange(len(game.embed))])
+        return seat.pid, phase, _md(cindexs=[rng.randrange(len(seat.hand)), rng.randrange(len(game.embed))])
+    return None
+
+
+def play(n: int, seed: int, stats: dict, views: bool = True, trace: bool = False):
+    """Play one table to the end (or MAX_MOVES) and add to `stats`."""
+    rng = random.Random(seed)
+    clock = time.perf_counter
+    game = Game(n, seed=seed)
+    for i in range(n):
+        game.add_player(f"p{i}")
+    game.start_game()
+
+    moves: int = 0
+    while not game.finished and moves < MAX_MOVES:
+        phase: str = game.curr_move_type
+        if trace:
+            tracemalloc.reset_peak()
+            before: int = tracemalloc.get_traced_memory()[0]
+        t0 = clock()
+        try:
+            if phase in (EXCHANGE_CARD, GIVE_TO_NEXT, CHECK_FANREN_PLAYER):
+                t_gen = 0.0
+                for pid in sorted(game.inter_pids()):
+                    g0 = clock()
+                    hand = game._seat(pid).hand
+                    md = _md([pid], [rng.randrange(len(hand))] if hand else [])
+                    t_gen += clock() - g0
+                    if hand or phase == CHECK_FANREN_PLAYER:
+                        game.apply_move(pid, phase, md)
+                game.resolve_inter()
+                t0 += t_gen
+            else:
+                g0 = clock()
+                move = next_move(game, rng)
+                t0 += clock() - g0
+                if move is None:
+                    stats["stuck"] += 1
+                    break
+                game.apply_move(*move)
+        except GameError:
+            stats["rejected"] += 1
+        stats["engine_s"] += clock() - t0
+        moves += 1
+        if trace:
+            stats["peak_bytes"] += tracemalloc.get_traced_memory()[1] - before
+
+        if views:
+            v0 = clock()
+            for seat in game.players:
+                game.get_personal_state(seat.pid)
+            stats["view_s"] += clock() - v0
+            stats["views"] += len(game.players)
+    stats["moves"] += moves
+    stats["finished"] += game.finished
+
+
+def run_size(n: int, games: int, seed: int) -> dict:
+    stats: dict = {"moves": 0, "finished": 0, "stuck": 0, "rejected": 0, "engine_s": 0.0, "view_s": 0.0, "views": 0}
+    for g in range(games):
+        play(n, seed * 1_000_003 + n * 10_007 + g, stats)
+
+    # allocation pass: tracemalloc slows everything down, so it runs separately on a few games
+    alloc = {"moves": 0, "finished": 0, "stuck": 0, "rejected": 0, "engine_s": 0.0, "view_s": 0.0, "views": 0, "peak_bytes": 0}
+    gc.collect()
+    gc.disable()
+    blocks0: int = sys.getallocatedblocks()
+    tracemalloc.start()
+    for g in range(ALLOC_GAMES):
+        play(n, seed * 1_000_003 + n * 10_007 + g, alloc, views=False, trace=True)
+    tracemalloc.stop()
+    blocks1: int = sys.getallocatedblocks()
+    gc.enable()
+
+    return {
+        "games": games,
+        "moves": stats["moves"],
+        "finished": stats["finished"],
+        "stuck": stats["stuck"],
+        "rejected": stats["rejected"],
+        "moves_per_s": round(stats["moves"] / stats["engine_s"]),
+        "view_us": round(stats["view_s"] / max(stats["views"], 1) * 1e6, 2),
+        "peak_bytes_move": round(alloc["peak_bytes"] / max(alloc["moves"], 1)),
+        "net_blocks_move": round((blocks1 - blocks0) / max(alloc["moves"], 1), 2),
+    }
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list[str]:
+    problems: list[str] = []
+    if baseline.get("machine") != current["machine"]:
+        print(f"note: baseline recorded on {baseline.get('machine')}, timings may not compare")
+    for size, cur in current["sizes"].items():
+        base = baseline.get("sizes", {}).get(size)
+        if base is None:
+            continue
+        if base["games"] == cur["games"] and (base["moves"], base["finished"]) != (cur["moves"], cur["finished"]):
+            problems.append(f"{size}p: engine behaviour changed, moves {base['moves']} -> {cur['moves']}, "
+                            f"finished {base['finished']} -> {cur['finished']}")
+        for metric, higher_is_better in METRICS.items():
+            b, c = base.get(metric), cur[metric]
+            if not b:
+                continue
+            change: float = (c - b) / abs(b)
+            if (-change if higher_is_better else change) > tolerance:
+                problems.append(f"{size}p: {metric} {b} -> {c} ({change:+.0%})")
+    return problems
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="headless Game throughput benchmark")
+    parser.add_argument("--games", type=int, default=GAMES, help="games per table size")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(range(MIN_NUM_PLAYERS, MAX_NUM_PLAYERS + 1)))
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--save", action="store_true", help="write the results as the new baseline")
+    args = parser.parse_args(argv)
+
+    current: dict = {
+        "seed": args.seed,
+        "python": platform.python_version(),
+        "machine": f"{platform.machine()} {platform.processor() or platform.node()}",
+        "sizes": {},
+    }
+    print(f"{'size':>4} {'moves':>8} {'fin':>5} {'stuck':>5} {'moves/s':>9} {'view us':>8} {'peak B/mv':>9} {'blocks/mv':>9}")
+    for n in args.sizes:
+        r = current["sizes"][str(n)] = run_size(n, args.games, args.seed)
+        print(f"{n:>4} {r['moves']:>8} {r['finished']:>5} {r['stuck']:>5} {r['moves_per_s']:>9} "
+              f"{r['view_us']:>8} {r['peak_bytes_move']:>9} {r['net_blocks_move']:>9}")
+
+    if args.save:
+        with open(args.baseline, "w") as f:
+            json.dump(current, f, indent=2)
+            f.write("\n")
+        print(f"baseline written to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print("no baseline, run with --save to record one")
+        return 0
+    with open(args.baseline) as f:
+        problems = compare(current, json.load(f), args.tolerance)
+    for p in problems:
+        print("REGRESSION", p)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,375 @@
+"""Load generator: many concurrent tables over real HTTP + WebSocket on localhost.
+
+    python -m bench.load                                  # in-process server, ramp 25 50 100 200 tables
+    python -m bench.load --tables 100 400 1000 --duration 20
+    python -m bench.load --url http://127.0.0.1:8000 --server-pid 1234
+
+Each simulated table runs the production flow: POST /create, POST
+/join/{game_id} for every seat, one /ws/{game_id}/{pid} socket per seat,
+INIT, then scripted legal moves chosen from each seat's PersonalState.
+Finished or stuck tables are replaced, so every step of the ramp holds its
+number of tables for --duration seconds. Per step it reports:
+
+    moves/s      turn moves answered by a state broadcast
+    msgs/s       frames received by all clients
+    p50/p99 ms   move sent -> last seat of the table got the new state
+    lag p99/max  event-loop lag of the server (in-process) or of this client
+    rss MB       server resident memory
+
+Without --url the app runs in a thread of this process on its own event
+loop, which shares the GIL with the clients: good for comparing builds,
+pessimistic in absolute numbers. Point --url at a separate uvicorn to find
+the real knee; start it with RATE_LIMIT=0, every simulated table comes
+from the same IP.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import threading
+import time
+from urllib.parse import urlsplit
+
+import websockets
+
+INTERACTIVE = ("EXCHANGE_CARD", "GIVE_TO_NEXT", "CHECK_FANREN_PLAYER")
+RAMP = [25, 50, 100, 200]
+DURATION = 10.0
+SET_NUM = 4
+THINK = 0.05 # seconds a seat waits before answering its turn
+STALL = 5.0 # a table without a new state for this long counts as stuck
+LAG_TICK = 0.05
+
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def rss_mb(pid: int) -> float:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+async def http_json(host: str, port: int, method: str, path: str, body: dict | None = None) -> tuple[int, dict | None]:
+    """Just enough HTTP/1.1 for the JSON endpoints: one request per connection."""
+    reader, writer = await asyncio.open_connection(host, port)
+    payload: bytes = json.dumps(body).encode() if body is not None else b""
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: {host}:{port}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode() + payload
+    )
+    await writer.drain()
+    data: bytes = await reader.read()
+    writer.close()
+    head, _, content = data.partition(b"\r\n\r\n")
+    status = int(head.split(b" ", 2)[1])
+    return status, json.loads(content) if content else None
+
+
+class LagProbe:
+    """Samples how late a periodic timer fires on the loop it runs on."""
+
+    def __init__(self, tick: float = LAG_TICK):
+        self.tick: float = tick
+        self.samples: list[float] = []
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start: float = loop.time()
+            await asyncio.sleep(self.tick)
+            self.samples.append(max(0.0, loop.time() - start - self.tick))
+
+    def take(self) -> list[float]:
+        samples, self.samples = self.samples, []
+        return samples
+
+
+class Stats:
+    def __init__(self):
+        self.latencies: list[float] = []
+        self.moves: int = 0
+        self.frames: int = 0
+        self.errors: int = 0
+        self.finished: int = 0
+        self.stuck: int = 0
+        self.failed: int = 0
+
+    def reset(self):
+        self.__init__()
+
+
+class Table:
+    def __init__(self, runner: "Runner", set_num: int, rng: random.Random):
+        self.runner = runner
+        self.set_num: int = set_num
+        self.rng: random.Random = rng
+        self.game_id: str = ""
+        self.pids: list[str] = []
+        self.sent_at: float | None = None # pending move
+        self.mover: str | None = None
+        self.received: int = 0
+        self.last_state: float = 0.0
+        self.done: asyncio.Event = asyncio.Event()
+        self.sends: set[asyncio.Task] = set()
+        self.busy: set[str] = set() # seats with a move on its way
+
+    async def run(self):
+        r = self.runner
+        status, body = await http_json(r.host, r.port, "POST", "/create", {"set_num": self.set_num})
+        if status != 200:
+            raise RuntimeError(f"/create {status} {body}")
+        self.game_id = body["data"]["game_id"]
+        for _ in range(self.set_num):
+            status, body = await http_json(r.host, r.port, "POST", f"/join/{self.game_id}", {"game_id": self.game_id})
+            if status != 200:
+                raise RuntimeError(f"/join {status} {body}")
+            self.pids.append(body["data"])
+        socks = [await websockets.connect(f"ws://{r.host}:{r.port}/ws/{self.game_id}/{pid}", max_size=None) for pid in self.pids]
+        self.last_state = time.monotonic()
+        seats = [asyncio.create_task(self.seat(i, ws)) for i, ws in enumerate(socks)]
+        try:
+            while not self.done.is_set():
+                try:
+                    await asyncio.wait_for(self.done.wait(), STALL)
+                except asyncio.TimeoutError:
+                    if time.monotonic() - self.last_state >= STALL:
+                        r.stats.stuck += 1
+                        break
+        finally:
+            for t in seats + list(self.sends):
+                t.cancel()
+            for ws in socks:
+                await ws.close()
+
+    async def seat(self, i: int, ws):
+        r = self.runner
+        pid: str = self.pids[i]
+        await ws.send('{"type": "INIT"}')
+        answered: int = -1 # state count this seat already answered in an interactive phase
+        count: int = 0
+        async for raw in ws:
+            r.stats.frames += 1
+            msg: dict = json.loads(raw)
+            state: dict | None = msg.get("state")
+            if state is None:
+                if msg.get("code") != 200:
+                    r.stats.errors += 1
+                    if self.mover == pid:
+                        self.sent_at = None # rejected, no broadcast follows
+                continue
+            count += 1
+            now: float = time.monotonic()
+            self.last_state = now
+            if self.sent_at is not None:
+                self.received += 1
+                if self.received >= self.set_num:
+                    r.stats.latencies.append(now - self.sent_at)
+                    r.stats.moves += 1
+                    self.sent_at = None
+            if state["finished"]:
+                r.stats.finished += 1 if i == 0 else 0
+                self.done.set()
+                return
+            if not state["started"] or state["curr"] is None:
+                continue
+            if pid in self.busy:
+                continue # already thinking about a move, e.g. repeated INIT states
+            phase: str = state["curr_move_type"]
+            if phase in INTERACTIVE:
+                if answered == count or not state["player"]["hand_cards"]:
+                    continue
+                answered = count
+                move = {"type": phase, "move_data": {"tpids": [pid], "cindexs": [self.rng.randrange(len(state["player"]["hand_cards"]))]}}
+            elif self.pids[state["curr"]] == pid:
+                move = self.next_move(pid, phase, state)
+                if move is None:
+                    continue # no legal move, the stall timer retires the table
+            else:
+                continue
+            # think in a separate task, a seat that is "thinking" still reads its frames on time
+            self.busy.add(pid)
+            task = asyncio.create_task(self.send(ws, pid, phase, move))
+            self.sends.add(task)
+            task.add_done_callback(self.sends.discard)
+
+    async def send(self, ws, pid: str, phase: str, move: dict):
+        if self.runner.think:
+            await asyncio.sleep(self.runner.think * self.rng.random() * 2)
+        # interactive phases resolve only once every seat answered, which is think time, not latency
+        if self.sent_at is None and phase not in INTERACTIVE:
+            self.sent_at, self.received, self.mover = time.monotonic(), 0, pid
+        self.busy.discard(pid)
+        await ws.send(json.dumps(move))
+
+    def next_move(self, pid: str, phase: str, state: dict) -> dict | None:
+        rng = self.rng
+        hand: list[dict] = state["player"]["hand_cards"]
+        others: list[str] = [p for p in self.pids if p != pid]
+
+        def move(tpids: list[str], cindexs: list[int], req_type: str = phase) -> dict:
+            return {"type": req_type, "move_data": {"tpids": tpids, "cindexs": cindexs}}
+
+        if phase == "DEFAULT":
+            playable = [i for i, c in enumerate(hand) if c["name"] != "fan-ren"]
+            return move([rng.choice(self.pids)], [rng.choice(playable)], rng.choice(("EMB", "IMP", "PLAY"))) if playable else None
+        if phase == "TAKE_FROM_PLAYED":
+            return move([], [rng.randrange(len(state["played_cards"]))]) if state["played_cards"] else None
+        if phase in ("CHECK_PLAYER_CARDS", "PICK_PLAYER"):
+            return move([rng.choice(others)], [])
+        if phase == "PICK_PLAYER_PICK_CARD":
+            targets = [p for p in others if state["other_cards_num"].get(p)]
+            if not targets or not hand:
+                return None
+            t = rng.choice(targets)
+            return move([t], [rng.randrange(len(hand)), rng.randrange(state["other_cards_num"][t])])
+        if phase == "CHECK_EMBED_CARDS":
+            return {"type": phase}
+        if phase == "MOVE_IMPED_CARD":
+            imped = dict(state["other_imped_cards"])
+            imped[pid] = state["player"]["imped_cards"]
+            sources = [p for p, cards in imped.items() if cards]
+            if not sources:
+                return None
+            s = rng.choice(sources)
+            return move([s, rng.choice(self.pids)], [rng.randrange(len(imped[s]))])
+        if phase in ("PICK_FROM_EMBED", "EXCHANGE_WITH_EMBED"):
+            embed: int = len(state["embed_cards"])
+            if not embed or not hand:
+                return None
+            if phase == "PICK_FROM_EMBED":
+                return move([], [rng.randrange(embed)])
+            return move([], [rng.randrange(len(hand)), rng.randrange(embed)])
+        return None
+
+
+class Runner:
+    def __init__(self, host: str, port: int, set_num: int, think: float, seed: int):
+        self.host: str = host
+        self.port: int = port
+        self.set_num: int = set_num
+        self.think: float = think
+        self.rng: random.Random = random.Random(seed)
+        self.stats: Stats = Stats()
+
+    async def keep(self, stop: asyncio.Event):
+        # one slot: play tables back to back until told to stop
+        while not stop.is_set():
+            table = Table(self, self.set_num, random.Random(self.rng.random()))
+            try:
+                await table.run()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.stats.failed += 1
+                await asyncio.sleep(0.5)
+
+
+def serve_in_thread(port: int) -> tuple[asyncio.AbstractEventLoop, LagProbe]:
+    import uvicorn
+    os.environ.setdefault("RATE_LIMIT", "0")
+    config = uvicorn.Config("app.main:app", host="127.0.0.1", port=port, log_level="warning", ws_max_queue=1024)
+    server = uvicorn.Server(config)
+    loop = asyncio.new_event_loop()
+    probe = LagProbe()
+    threading.Thread(target=loop.run_until_complete, args=(server.serve(),), daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    asyncio.run_coroutine_threadsafe(probe.run(), loop)
+    return loop, probe
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def ramp(args, host: str, port: int, server_probe: LagProbe | None, server_pid: int) -> list[dict]:
+    runner = Runner(host, port, args.set_num, args.think, args.seed)
+    client_probe = LagProbe()
+    probe_task = asyncio.create_task(client_probe.run())
+    stop = asyncio.Event()
+    slots: list[asyncio.Task] = []
+    rows: list[dict] = []
+    print(f"{'tables':>6} {'moves/s':>8} {'msgs/s':>8} {'p50 ms':>7} {'p99 ms':>7} {'lag p99':>7} {'lag max':>7} "
+          f"{'rss MB':>7} {'done':>5} {'stuck':>5} {'fail':>5} {'errors':>6}")
+    for tables in args.tables:
+        while len(slots) < tables:
+            slots.append(asyncio.create_task(runner.keep(stop)))
+            if len(slots) % 50 == 0:
+                await asyncio.sleep(0) # let the first connects through
+        await asyncio.sleep(min(2.0, args.duration / 4)) # warm-up
+        runner.stats.reset()
+        (server_probe or client_probe).take()
+        start: float = time.monotonic()
+        await asyncio.sleep(args.duration)
+        elapsed: float = time.monotonic() - start
+        s: Stats = runner.stats
+        lag: list[float] = (server_probe or client_probe).take()
+        row = {
+            "tables": tables,
+            "moves_per_s": round(s.moves / elapsed, 1),
+            "msgs_per_s": round(s.frames / elapsed, 1),
+            "p50_ms": round(percentile(s.latencies, 0.50) * 1000, 2),
+            "p99_ms": round(percentile(s.latencies, 0.99) * 1000, 2),
+            "lag_p99_ms": round(percentile(lag, 0.99) * 1000, 2),
+            "lag_max_ms": round(max(lag, default=0.0) * 1000, 2),
+            "rss_mb": round(rss_mb(server_pid), 1),
+            "finished": s.finished, "stuck": s.stuck, "failed": s.failed, "errors": s.errors,
+        }
+        rows.append(row)
+        print(f"{tables:>6} {row['moves_per_s']:>8} {row['msgs_per_s']:>8} {row['p50_ms']:>7} {row['p99_ms']:>7} "
+              f"{row['lag_p99_ms']:>7} {row['lag_max_ms']:>7} {row['rss_mb']:>7} {s.finished:>5} {s.stuck:>5} "
+              f"{s.failed:>5} {s.errors:>6}", flush=True)
+    stop.set()
+    for t in slots:
+        t.cancel()
+    await asyncio.gather(*slots, return_exceptions=True)
+    probe_task.cancel()
+    return rows
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="concurrent table load generator")
+    parser.add_argument("--url", help="server to test, default: run app.main:app in-process")
+    parser.add_argument("--server-pid", type=int, help="pid of the --url server, for RSS")
+    parser.add_argument("--tables", type=int, nargs="+", default=RAMP, help="concurrency ramp")
+    parser.add_argument("--duration", type=float, default=DURATION, help="seconds measured per step")
+    parser.add_argument("--set-num", type=int, default=SET_NUM)
+    parser.add_argument("--think", type=float, default=THINK, help="mean seconds before a seat moves")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="also write the rows to this file")
+    args = parser.parse_args(argv)
+
+    server_probe: LagProbe | None = None
+    if args.url:
+        parts = urlsplit(args.url)
+        host, port = parts.hostname, parts.port or 80
+        server_pid: int = args.server_pid or 0
+        if not server_pid:
+            print("note: lag is this client's loop; pass --server-pid for server RSS")
+    else:
+        host, port = "127.0.0.1", free_port()
+        _, server_probe = serve_in_thread(port)
+        server_pid = os.getpid()
+
+    rows: list[dict] = asyncio.run(ramp(args, host, port, server_probe, server_pid))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import pytest
+
+from app.codec import (
+    MAX_FRAME_BYTES, MAX_PID_LEN, MAX_TYPE_LEN,
+    decode_move_request, decode_response, encode_move_request, encode_response, parse_move_request,
+)
+from app.error import GameError
+import app.error as err
+from app.game import Game
+from app.model import SingleMoveData, WsMoveRequest, WsResponse
+
+
+def state():
+    game = Game(4, seed=5)
+    for pid in ("a", "b", "c", "d"):
+        game.add_player(pid)
+    game.start_game()
+    return game.get_personal_state("b")
+
+
+def test_response_round_trip():
+    message = WsResponse(code=200, msg="OK", seq=7, state=state())
+    decoded = decode_response(encode_response(message))
+    assert decoded.seq == 7 and decoded.msg == "OK"
+    assert decoded.state.model_dump() == message.state.model_dump()
+
+
+def test_notice_round_trip():
+    decoded = decode_response(encode_response(WsResponse(code=500, msg="LEAVING_GAME_a")))
+    assert (decoded.code, decoded.msg, decoded.state, decoded.seq) == (500, "LEAVING_GAME_a", None, None)
+
+
+@pytest.mark.parametrize("req", [
+    WsMoveRequest(type="INIT"),
+    WsMoveRequest(type="IMP", move_data=SingleMoveData(tpids=["b"], cindexs=[2])),
+    WsMoveRequest(type="ACK", seq=12),
+    WsMoveRequest(type="SOMETHING_NEW", move_data=SingleMoveData(tpids=[], cindexs=[0, 1])),
+])
+def test_move_request_round_trip(req):
+    assert decode_move_request(encode_move_request(req)).model_dump() == req.model_dump()
+
+
+@pytest.mark.parametrize("frame", [b"", b"\x01", b"\x02\x00", b"\x02\x01\x01\x01\x05ab", b"\x02\x00\x00junk"])
+def test_malformed_request_is_invalid_params(frame):
+    with pytest.raises(GameError) as e:
+        decode_move_request(frame)
+    assert e.value.code == err.INVALID_PARAMS
+
+
+@pytest.mark.parametrize("req", [
+    WsMoveRequest(type="X" * (MAX_TYPE_LEN + 1)),
+    WsMoveRequest(type="IMP", move_data=SingleMoveData(tpids=["p" * (MAX_PID_LEN + 1)], cindexs=[0])),
+])
+def test_binary_and_json_frames_share_the_length_caps(req):
+    for decode, frame in ((decode_move_request, encode_move_request(req)), (parse_move_request, req.model_dump_json())):
+        with pytest.raises(GameError) as e:
+            decode(frame)
+        assert e.value.code == err.INVALID_PARAMS
+
+
+def test_text_frames_are_measured_in_bytes():
+    frame = '{"type": "EMB", "move_data": {"tpids": ["' + "好" * 700 + '"], "cindexs": [0]}}'
+    assert len(frame) < MAX_FRAME_BYTES < len(frame.encode())
+    with pytest.raises(GameError) as e:
+        parse_move_request(frame)
+    assert e.value.code == err.FRAME_TOO_LARGE
@@ -0,0 +1,71 @@
+import asyncio
+
+import app.main as main
+from app.collector import EXPIRED
+from app.game import Game, DEFAULT, EXCHANGE_CARD, BAN_ZHANG, XUE_SHENG_HUI_ZHANG, GUI_ZHAI_BU
+from app.model import SingleMoveData, WsMoveRequest
+
+
+def exchanging(game_id: str) -> Game:
+    # p0 played ban-zhang and picked p2
+    game = Game(3, seed=5)
+    for pid in ("p0", "p1", "p2"):
+        game.add_player(pid)
+    game.start_game()
+    for seat in game.players:
+        seat.hand = bytearray([XUE_SHENG_HUI_ZHANG, BAN_ZHANG, GUI_ZHAI_BU])
+    game.curr, game.curr_move_type, game.t_pid_interact = 0, EXCHANGE_CARD, "p2"
+    main.store.put(game_id, game)
+    return game
+
+
+def submit(game_id: str, pid: str, cindex: int):
+    return main.apply_request(game_id, pid, WsMoveRequest(type=EXCHANGE_CARD, move_data=SingleMoveData(tpids=[], cindexs=[cindex])))
+
+
+def run(game_id: str, body):
+    async def wrapper():
+        try:
+            await body()
+        finally:
+            main.collectors.pop(game_id, None)
+            main.scheduler.cancel(game_id)
+            main.store.delete(game_id)
+            await main.actors.remove(game_id)
+
+    asyncio.run(wrapper())
+
+
+def test_initiator_leaving_closes_the_phase():
+    game_id = "collector-initiator"
+
+    async def body():
+        game = exchanging(game_id)
+        main.sync_collector(game_id, game)
+        collector = main.collectors[game_id]
+        await submit(game_id, "p2", 0)
+        await main.quit_seat(game_id, "p0")
+        assert game.curr_move_type == DEFAULT and game.players[game.curr].pid == "p1"
+        assert game_id not in main.collectors and collector.future.cancelled()
+        assert not main.scheduler.pending(game_id, EXCHANGE_CARD)
+
+    run(game_id, body)
+
+
+def test_target_leaving_after_submitting_skips_the_exchange():
+    game_id = "collector-target"
+
+    async def body():
+        game = exchanging(game_id)
+        main.sync_collector(game_id, game)
+        await submit(game_id, "p2", 0)
+        await main.quit_seat(game_id, "p2")
+        assert game.inter_pids() == {"p0"}
+        hand = bytes(game.players[0].hand)
+        collector = main.collectors[game_id]
+        collector.expire()
+        await collector.task
+        assert collector.reason == EXPIRED
+        assert game.curr_move_type == DEFAULT and bytes(game.players[0].hand) == hand
+
+    run(game_id, body)
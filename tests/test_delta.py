@@ -0,0 +1,87 @@
+import copy
+
+from app.delta import DeltaStream, MAX_DELTA_LAG, diff
+from app.game import Game, FAN_REN
+from app.model import SingleMoveData
+
+
+def apply_patch(doc, ops):
+    doc = copy.deepcopy(doc)
+    for op in ops:
+        *parents, last = [p.replace("~1", "/").replace("~0", "~") for p in op.path.split("/")[1:]]
+        target = doc
+        for key in parents:
+            target = target[int(key)] if isinstance(target, list) else target[key]
+        if op.op == "remove":
+            del target[last]
+        elif last == "-":
+            target.append(op.value)
+        elif isinstance(target, list):
+            target[int(last)] = op.value
+        else:
+            target[last] = op.value
+    return doc
+
+
+def states(n: int = 4) -> list:
+    game = Game(3, seed=7)
+    for pid in ("a", "b", "c"):
+        game.add_player(pid)
+    game.start_game()
+    out = [game.get_personal_state("a")]
+    while len(out) < n and not game.finished:
+        pid = game.players[game.curr].pid
+        cindex = next(i for i, c in enumerate(game.players[game.curr].hand) if c != FAN_REN)
+        game.apply_move(pid, "EMB", SingleMoveData.model_construct(tpids=[], cindexs=[cindex]))
+        out.append(game.get_personal_state("a"))
+    return out
+
+
+def test_diff_round_trips():
+    old = {"a": [1, 2], "b": {"x": 1, "y/z": 2}, "c": 1}
+    new = {"a": [1, 2, 3], "b": {"x": 2}, "d": None}
+    assert apply_patch(old, diff(old, new)) == new
+
+
+def test_first_frame_is_full_then_patches_against_ack():
+    s0, s1, s2 = states(3)
+    stream = DeltaStream()
+    first = stream.next_message(s0, 1)
+    assert first.state is s0 and first.patch is None
+
+    # not acked yet: still a full snapshot
+    assert stream.next_message(s1, 2).state is s1
+    stream.ack(2)
+    patch = stream.next_message(s2, 3)
+    assert patch.state is None and patch.base_seq == 2
+    assert apply_patch(s1.model_dump(mode="json"), patch.patch) == s2.model_dump(mode="json")
+
+
+def test_unchanged_state_is_not_resent():
+    s0, = states(1)
+    stream = DeltaStream()
+    stream.next_message(s0, 1)
+    stream.ack(1)
+    assert stream.next_message(s0, 2) is None
+
+
+def test_stale_or_unknown_acks_are_ignored():
+    s0, s1 = states(2)
+    stream = DeltaStream()
+    stream.next_message(s0, 1)
+    stream.ack(1)
+    stream.next_message(s1, 2)
+    stream.ack(2)
+    stream.ack(1)
+    stream.ack(99)
+    assert stream.acked == 2
+
+
+def test_client_too_far_behind_gets_a_snapshot():
+    s0, s1 = states(2)
+    stream = DeltaStream()
+    stream.next_message(s0, 1)
+    stream.ack(1)
+    for seq in range(2, MAX_DELTA_LAG + 1):
+        stream.next_message(s0 if seq % 2 else s1, seq)
+    assert stream.next_message(s1, MAX_DELTA_LAG + 1).state is s1
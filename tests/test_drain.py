@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from app.drain import DRAINING, HANDOFF, SERVING, Drainer
+from app.game import Game, DEFAULT, TAKE_FROM_PLAYED
+import app.main as main
+
+
+def table(started: bool = True) -> Game:
+    game = Game(3, seed=4)
+    for pid in ("a", "b", "c"):
+        game.add_player(pid)
+    if started:
+        game.start_game()
+    return game
+
+
+def drainer(games: dict[str, Game], persistent: bool = False) -> tuple[Drainer, list[str]]:
+    steps: list[str] = []
+
+    async def handoff():
+        steps.append(HANDOFF)
+
+    return Drainer(games, handoff, lambda: steps.append("exit"), persistent=persistent, poll=0.01), steps
+
+
+def test_persistent_drain_only_waits_for_a_checkpoint():
+    games = {"lobby": table(started=False), "busy": table()}
+    games["busy"].curr_move_type = TAKE_FROM_PLAYED
+    d, _ = drainer(games, persistent=True)
+    assert d.pending() == ["busy"]
+    games["busy"].curr_move_type = DEFAULT
+    assert d.pending() == [] # started but between turns
+
+
+def test_plain_drain_waits_for_games_to_finish():
+    games = {"lobby": table(started=False), "live": table()}
+    d, _ = drainer(games)
+    assert d.pending() == ["live"]
+    games["live"].finished = True
+    assert d.pending() == []
+
+
+def test_hands_off_then_exits_once_tables_are_done():
+    games = {"live": table()}
+
+    async def run():
+        d, steps = drainer(games)
+        assert d.phase == SERVING and not d.draining
+        d.start(deadline=60.0)
+        await asyncio.sleep(0.05)
+        assert d.phase == DRAINING and steps == []
+        assert d.get_stats()["pending_games"] == 1
+        games["live"].finished = True
+        await d.task
+        assert d.phase == HANDOFF and steps == [HANDOFF, "exit"]
+
+    asyncio.run(run())
+
+
+def test_deadline_stops_waiting_and_exits_even_if_handoff_fails():
+    games = {"live": table()}
+
+    async def run():
+        exited: list[bool] = []
+
+        async def broken_handoff():
+            raise RuntimeError("disk full")
+
+        d = Drainer(games, broken_handoff, lambda: exited.append(True), poll=0.01)
+        d.start(deadline=0.05)
+        d.start(deadline=60.0) # a second call does not restart the drain
+        try:
+            await d.task
+        except RuntimeError:
+            pass
+        assert exited == [True] and d.pending() == ["live"]
+
+    asyncio.run(run())
+
+
+def admin_request(host: str) -> Request:
+    return Request({"type": "http", "client": (host, 5000), "headers": []})
+
+
+def test_admin_calls_fail_closed(monkeypatch):
+    monkeypatch.delenv("ADMIN_TOKEN", raising=False)
+    main.check_admin(admin_request("127.0.0.1"), None) # no token configured: loopback only
+    with pytest.raises(HTTPException):
+        main.check_admin(admin_request("203.0.113.7"), None)
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+    main.check_admin(admin_request("203.0.113.7"), "secret")
+    with pytest.raises(HTTPException):
+        main.check_admin(admin_request("127.0.0.1"), "wrong")
+
+
+def test_admin_endpoints_refuse_remote_callers_without_a_token(monkeypatch):
+    monkeypatch.delenv("ADMIN_TOKEN", raising=False)
+    for endpoint in (main.drain, main.profile):
+        with pytest.raises(HTTPException) as e:
+            asyncio.run(endpoint(admin_request("203.0.113.7"), x_admin_token=None))
+        assert e.value.status_code == 403
+    assert not main.drainer.draining and not main.sampler.enabled
@@ -0,0 +1,186 @@
+import pytest
+
+from app.error import GameError
+import app.error as err
+from app.game import (
+    Game, MIN_NUM_PLAYERS, MAX_NUM_PLAYERS, XUE_SHENG_HUI_ZHANG, BAN_ZHANG, FAN_REN, GONG_FAN, GUI_ZHAI_BU,
+    WAI_XING_REN, DEFAULT, CHECK_FANREN_PLAYER, TAKE_FROM_PLAYED, PICK_FROM_EMBED,
+)
+from app.model import SingleMoveData
+from bench.engine import play
+
+
+def seated(n: int = 3, seed: int = 1, start: bool = True) -> Game:
+    game = Game(n, seed=seed)
+    for i in range(n):
+        game.add_player(f"p{i}")
+    if start:
+        game.start_game()
+    return game
+
+
+# <===== version =====>
+def test_successful_calls_bump_version_once():
+    game = Game(3, seed=1)
+    game.add_player("p0")
+    assert game.version == 1
+    game.add_player("p1")
+    game.add_player("p2")
+    game.start_game()
+    assert game.version == 4
+
+
+def test_rejected_calls_leave_version_alone():
+    game = Game(3, seed=1)
+    game.add_player("p0")
+    with pytest.raises(GameError):
+        game.add_player("p0")
+    with pytest.raises(GameError):
+        game.quit_player("stranger") # lobby games cannot be left
+    with pytest.raises(GameError):
+        game.start_game()
+    assert game.version == 1
+
+
+def test_personal_view_is_cached_until_version_moves():
+    game = seated()
+    view = game.get_personal_state("p0")
+    assert game.get_personal_state("p0") is view
+    with pytest.raises(GameError):
+        game.apply_move("p0", "EMB", None)
+    assert game.get_personal_state("p0") is view
+    game.quit_player("p2")
+    assert game.get_personal_state("p0") is not view
+
+
+# <===== winners =====>
+def finish(game: Game, hands: dict[str, list[int]]):
+    for seat in game.players:
+        seat.hand = bytearray(hands[seat.pid])
+    game.finished = True
+
+
+def test_player_without_cards_has_no_role():
+    game = seated()
+    finish(game, {"p0": [], "p1": [FAN_REN], "p2": [GUI_ZHAI_BU]})
+    assert game.get_winners() == ["p1"]
+    assert game.get_state().winners == ["p1"]
+
+
+def test_more_than_one_card_at_the_end_is_rejected():
+    game = seated()
+    finish(game, {"p0": [FAN_REN, GUI_ZHAI_BU], "p1": [], "p2": []})
+    with pytest.raises(GameError):
+        game.get_winners()
+
+
+def test_required_points_follow_the_dealt_table_size():
+    game = seated(4)
+    game.quit_player("p3")
+    finish(game, {"p0": [GUI_ZHAI_BU], "p1": [BAN_ZHANG], "p2": [GONG_FAN]})
+    game.embed = bytearray([XUE_SHENG_HUI_ZHANG, XUE_SHENG_HUI_ZHANG, BAN_ZHANG]) # 8 points, enough for 4 seats
+    assert game.get_winners() == ["p1"]
+
+
+@pytest.mark.parametrize("n", range(MIN_NUM_PLAYERS, MAX_NUM_PLAYERS + 1))
+def test_seeded_games_are_always_viewable(n):
+    stats = {"moves": 0, "finished": 0, "stuck": 0, "rejected": 0, "engine_s": 0.0, "view_s": 0.0, "views": 0}
+    for seed in range(100):
+        play(n, seed, stats) # views every seat after every move
+    assert stats["finished"] > 0 and stats["rejected"] == 0
+
+
+# <===== move dispatch =====>
+def md(tpids=(), cindexs=()) -> SingleMoveData:
+    return SingleMoveData(tpids=list(tpids), cindexs=list(cindexs))
+
+
+def current(game: Game) -> str:
+    return game.players[game.curr].pid
+
+
+def test_missing_params_are_rejected_before_dispatch():
+    game = seated()
+    with pytest.raises(GameError) as e:
+        game.apply_move(current(game), "IMP", md(cindexs=[0]))
+    assert e.value.code == err.INVALID_PARAMS
+
+
+def test_unknown_type_and_wrong_player_are_rejected():
+    game = seated()
+    with pytest.raises(GameError) as e:
+        game.apply_move(current(game), "NOPE", md([], [0]))
+    assert e.value.code == err.INVALID_MOVE
+    other = next(p.pid for p in game.players if p.pid != current(game))
+    with pytest.raises(GameError) as e:
+        game.apply_move(other, "EMB", md([], [0]))
+    assert e.value.code == err.INVALID_PLAYER_ID
+
+
+def test_action_moves_dispatch_to_their_method():
+    game = seated()
+    pid = current(game)
+    cindex = next(i for i, c in enumerate(game.players[game.curr].hand) if c != FAN_REN)
+    assert game.apply_move(pid, "EMB", md([], [cindex])) is True
+    assert game.embed_pids == [pid]
+
+
+def test_moves_after_the_end_are_rejected():
+    game = seated()
+    cindex = next(i for i, c in enumerate(game.players[game.curr].hand) if c != FAN_REN)
+    game.finished = True # a legal move in every other respect
+    version = game.version
+    with pytest.raises(GameError) as e:
+        game.apply_move(current(game), "EMB", md([], [cindex]))
+    assert e.value.code == err.INVALID_MOVE
+    assert game.version == version and not game.embed
+
+
+def test_check_fanren_player_records_the_holders_that_answered():
+    game = seated()
+    for seat, hand in zip(game.players, ([XUE_SHENG_HUI_ZHANG, BAN_ZHANG], [FAN_REN, BAN_ZHANG], [WAI_XING_REN, GONG_FAN])):
+        seat.hand = bytearray(hand)
+    game.curr, game.curr_move_type = 0, CHECK_FANREN_PLAYER
+    assert game.inter_pids() == {"p1", "p2"}
+    with pytest.raises(GameError):
+        game.apply_move("p0", CHECK_FANREN_PLAYER, None) # holds neither card
+    game.apply_move("p1", CHECK_FANREN_PLAYER, None)
+    assert not game.inter_is_ready() # wai-xing-ren may stay silent until the deadline
+    game.resolve_inter()
+    assert game.players[0].checked_players == ["p1"]
+    assert game.curr_move_type == DEFAULT and game.curr == 1
+
+
+# <===== quitting =====>
+def test_quitting_an_earlier_seat_keeps_the_turn():
+    game = seated()
+    game.curr = 2
+    pid = current(game)
+    game.quit_player("p0")
+    assert current(game) == pid and game.curr == 1
+    cindex = next(i for i, c in enumerate(game.players[game.curr].hand) if c != FAN_REN)
+    assert game.apply_move(pid, "EMB", md([], [cindex])) is True
+
+
+def test_quitting_the_current_seat_passes_the_turn_on():
+    game = seated()
+    game.curr = 2
+    game.curr_move_type = TAKE_FROM_PLAYED # a follow-up the leaver never finished
+    game.jump_curr, game.jump_move_type = 2, PICK_FROM_EMBED
+    game.quit_player("p2")
+    assert current(game) == "p0" and game.curr_move_type == DEFAULT
+    assert game.jump_curr is None
+    with pytest.raises(GameError) as e:
+        game.apply_move("p1", "EMB", md([], [0]))
+    assert e.value.code == err.INVALID_PLAYER_ID
+
+
+def test_game_ends_when_nobody_left_can_move():
+    game = seated()
+    for seat in game.players:
+        del seat.hand[1:]
+    game.players[game.curr].hand.append(XUE_SHENG_HUI_ZHANG)
+    game.quit_player(current(game))
+    assert game.finished
+    with pytest.raises(GameError):
+        game.apply_move(game.players[0].pid, "EMB", md([], [0]))
@@ -0,0 +1,77 @@
+from app.game import Game
+from app.lobby import Lobby, _Bucket
+
+
+def table(set_num: int, started: bool = False) -> Game:
+    game = Game(set_num, seed=1)
+    if started:
+        for i in range(set_num):
+            game.add_player(f"p{i}")
+        game.start_game()
+    return game
+
+
+def lobby(specs: list[tuple[int, bool]]) -> tuple[Lobby, dict[str, Game]]:
+    games: dict[str, Game] = {}
+    index = Lobby(games)
+    for i, (set_num, started) in enumerate(specs):
+        games[f"g{i}"] = table(set_num, started)
+        index.add(f"g{i}", games[f"g{i}"])
+    return index, games
+
+
+def walk(index: Lobby, limit: int, **filters) -> list[str]:
+    ids: list[str] = []
+    cursor: int = 0
+    while True:
+        page = index.page(cursor=cursor, limit=limit, **filters)
+        ids.extend(info.game_id for info in page.games)
+        if page.next_cursor is None:
+            return ids
+        cursor = page.next_cursor
+
+
+def test_cursor_pages_skip_tombstones_before_and_after_compaction():
+    index, games = lobby([(3, False)] * 12)
+    for gid in ("g1", "g4", "g5"): # below the compaction threshold
+        index.remove(gid)
+        del games[gid]
+    bucket: _Bucket = index.buckets[(3, False)]
+    assert bucket.dead and len(bucket) == 9
+    assert walk(index, 2) == ["g0", "g2", "g3", "g6", "g7", "g8", "g9", "g10", "g11"]
+
+    for gid in ("g0", "g2", "g6", "g8"): # more than half dead: compacted
+        index.remove(gid)
+        del games[gid]
+    assert not bucket.dead and len(bucket.seqs) == 5
+    assert walk(index, 2) == ["g3", "g7", "g9", "g10", "g11"]
+
+
+def test_removal_between_pages_does_not_repeat_or_skip():
+    index, games = lobby([(4, False)] * 6)
+    first = index.page(limit=3)
+    assert [g.game_id for g in first.games] == ["g0", "g1", "g2"]
+    index.remove("g1")
+    index.remove("g3")
+    rest = index.page(cursor=first.next_cursor, limit=3)
+    assert [g.game_id for g in rest.games] == ["g4", "g5"] and rest.next_cursor is None
+
+
+def test_filters_merge_buckets_in_creation_order():
+    index, games = lobby([(3, False), (5, True), (3, True), (5, False), (3, False)])
+    assert walk(index, 2) == ["g0", "g1", "g2", "g3", "g4"]
+    assert walk(index, 2, set_num=3) == ["g0", "g2", "g4"]
+    assert walk(index, 2, started=False) == ["g0", "g3", "g4"]
+    assert walk(index, 10, set_num=5, started=True) == ["g1"]
+    assert index.total(set_num=3) == 3 and index.total(started=True) == 2
+
+
+def test_update_moves_a_table_to_the_started_bucket():
+    index, games = lobby([(3, False), (3, False)])
+    for i in range(3):
+        games["g1"].add_player(f"p{i}")
+    games["g1"].start_game()
+    index.update("g1")
+    assert walk(index, 5, started=False) == ["g0"]
+    assert walk(index, 5, started=True) == ["g1"]
+    assert walk(index, 5) == ["g0", "g1"] # keeps its place in creation order
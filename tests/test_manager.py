@@ -0,0 +1,39 @@
+from app.game import Game
+from app.manager import DELTA, Session
+
+
+def state():
+    game = Game(3, seed=3)
+    for pid in ("a", "b", "c"):
+        game.add_player(pid)
+    game.start_game()
+    return game.get_personal_state("a")
+
+
+def test_resume_replays_notices_after_last_seq_and_newest_state():
+    session = Session()
+    s = state()
+    session.notices.append((session.seq, "before"))
+    first = session.state_frame(s)
+    session.notices.append((session.seq, "after-1"))
+    last = session.state_frame(s)
+    session.notices.append((session.seq, "after-2"))
+
+    assert session.missed(1) == [("after-1", False), ("after-2", False), (last, True)]
+    assert first != last # every state frame carries its own seq
+
+
+def test_up_to_date_client_only_gets_new_notices():
+    session = Session()
+    session.state_frame(state())
+    session.notices.append((session.seq, "notice"))
+    assert session.missed(session.seq) == [("notice", False)]
+
+
+def test_delta_session_does_not_number_unchanged_states():
+    session = Session(proto=DELTA)
+    s = state()
+    session.state_frame(s)
+    session.delta.ack(1)
+    assert session.state_frame(s) is None
+    assert session.seq == 1
@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+
+from app.error import GameError
+import app.error as err
+from app.matchmaker import Matchmaker
+
+
+def matchmaker() -> tuple[Matchmaker, list[tuple[int, list[str]]]]:
+    tables: list[tuple[int, list[str]]] = []
+
+    def create(set_num: int, pids: list[str]) -> str:
+        tables.append((set_num, pids))
+        return f"t{len(tables)}"
+
+    return Matchmaker(create), tables
+
+
+def test_tables_are_built_per_size_in_arrival_order():
+    async def run():
+        mm, tables = matchmaker()
+        threes = [mm.enqueue(3) for _ in range(2)]
+        fours = [mm.enqueue(4) for _ in range(3)]
+        assert tables == [] and mm.get_stats()["queued_players"] == 5
+        threes.append(mm.enqueue(3))
+        assert tables == [(3, [t.pid for t in threes])]
+        assert {t.future.result().game_id for t in threes} == {"t1"}
+        assert not any(t.future.done() for t in fours)
+        assert mm.get_stats() == {"queued_players": 3, "matched_players": 3}
+
+        with pytest.raises(GameError) as e:
+            mm.enqueue(7)
+        assert e.value.code == err.INVALID_PLAYER_NUM
+
+    asyncio.run(run())
+
+
+def test_cancelled_tickets_are_skipped():
+    async def run():
+        mm, tables = matchmaker()
+        first, gone = mm.enqueue(3), mm.enqueue(3)
+        assert mm.leave(gone)
+        rest = [mm.enqueue(3), mm.enqueue(3)]
+        assert tables == [(3, [first.pid] + [t.pid for t in rest])]
+        assert not mm.leave(first) # already seated
+        assert mm.get_stats()["queued_players"] == 0
+
+    asyncio.run(run())
+
+
+def test_close_fails_every_waiter():
+    async def run():
+        mm, _ = matchmaker()
+        tickets = [mm.enqueue(3), mm.enqueue(5)]
+        mm.close(GameError(err.SERVER_DRAINING))
+        for ticket in tickets:
+            with pytest.raises(GameError) as e:
+                await mm.wait(ticket)
+            assert e.value.code == err.SERVER_DRAINING
+        assert mm.get_stats()["queued_players"] == 0
+
+    asyncio.run(run())
+
+
+def test_wait_times_out_and_frees_the_slot():
+    async def run():
+        mm, tables = matchmaker()
+        ticket = mm.enqueue(3)
+        with pytest.raises(GameError) as e:
+            await mm.wait(ticket, timeout=0.01)
+        assert e.value.code == err.QUEUE_TIMEOUT
+        assert mm.get_stats()["queued_players"] == 0
+        others = [mm.enqueue(3) for _ in range(3)]
+        assert tables == [(3, [t.pid for t in others])]
+
+    asyncio.run(run())
+
+
+def test_failed_table_creation_reaches_the_waiters():
+    async def run():
+        def create(set_num: int, pids: list[str]) -> str:
+            raise GameError(err.SERVER_DRAINING)
+
+        mm = Matchmaker(create)
+        tickets = [mm.enqueue(3) for _ in range(3)]
+        for ticket in tickets:
+            with pytest.raises(GameError):
+                await mm.wait(ticket)
+
+    asyncio.run(run())
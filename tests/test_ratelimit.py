@@ -0,0 +1,46 @@
+import pytest
+
+import app.ratelimit as ratelimit
+from app.ratelimit import RateLimiter
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now: list[float] = [100.0]
+    monkeypatch.setattr(ratelimit.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_burst_then_refill(clock):
+    limit = RateLimiter("t", rate=2.0, burst=3)
+    assert [limit.allow("ip") for _ in range(4)] == [True, True, True, False]
+    clock[0] += 0.5 # one token back
+    assert limit.allow("ip") and not limit.allow("ip")
+    assert limit.get_stats()["ratelimit_t_rejected"] == 2
+
+
+def test_full_table_evicts_the_least_recently_used_key(clock):
+    limit = RateLimiter("t", rate=1.0, burst=2, max_keys=3)
+    for key in ("a", "b", "c"):
+        limit.allow(key)
+    limit.allow("a") # "b" is now the stalest
+    assert limit.allow("new")
+    assert list(limit.buckets) == ["c", "a", "new"]
+    assert limit.get_stats()["ratelimit_t_evicted"] == 1
+
+
+def test_junk_keys_cannot_lock_out_later_keys(clock):
+    limit = RateLimiter("t", rate=1.0, burst=1, max_keys=100)
+    for i in range(1000):
+        limit.allow(("junk", i))
+    assert limit.allow(("game", "pid"))
+    assert len(limit.buckets) == 100
+
+
+def test_sweep_drops_buckets_that_have_refilled(clock):
+    limit = RateLimiter("t", rate=1.0, burst=2)
+    limit.allow("old")
+    clock[0] += 1.0
+    limit.allow("recent")
+    limit.sweep(clock[0] + 1.5) # "old" idle 2.5 s >= burst / rate, "recent" only 1.5 s
+    assert list(limit.buckets) == ["recent"]
@@ -0,0 +1,73 @@
+import asyncio
+
+from app.game import Game
+from app.reaper import ACTIVE, FINISHED, LOBBY, Reaper
+
+
+def table(started: bool = False, finished: bool = False) -> Game:
+    game = Game(3, seed=1)
+    for pid in ("a", "b", "c"):
+        game.add_player(pid)
+    if started:
+        game.start_game()
+    if finished:
+        for seat in game.players:
+            del seat.hand[1:] # one role card each
+        game.finished = True
+    return game
+
+
+def reaper(games: dict[str, Game], keep: set[str] = frozenset()) -> tuple[Reaper, list[str]]:
+    evicted: list[str] = []
+
+    async def evict(gid: str) -> bool:
+        if gid in keep:
+            return False
+        evicted.append(gid)
+        del games[gid]
+        return True
+
+    return Reaper(games, evict, ttls={LOBBY: 10.0, ACTIVE: 20.0, FINISHED: 5.0}), evicted
+
+
+def test_idle_games_expire_after_their_state_ttl():
+    games = {"lobby": table(), "active": table(started=True), "done": table(started=True, finished=True)}
+    r, evicted = reaper(games)
+    r.expired(now=0.0) # first sighting
+    assert asyncio.run(r.sweep(now=6.0)) == 1
+    assert evicted == ["done"]
+    asyncio.run(r.sweep(now=21.0))
+    assert sorted(evicted) == ["active", "done", "lobby"]
+    assert r.get_archived("done") is not None
+
+
+def test_activity_restarts_the_clock():
+    games = {"g": table()}
+    r, evicted = reaper(games)
+    r.expired(now=0.0)
+    games["g"].start_game()
+    asyncio.run(r.sweep(now=15.0)) # version moved: seen again at 15
+    asyncio.run(r.sweep(now=30.0))
+    assert evicted == []
+
+
+def test_unviewable_game_is_still_evicted_and_does_not_stop_the_sweep():
+    def broken():
+        raise ValueError("broken")
+
+    bad = table(started=True, finished=True)
+    bad.get_state = broken
+    games = {"bad": bad, "lobby": table()}
+    r, evicted = reaper(games)
+    r.expired(now=0.0)
+    asyncio.run(r.sweep(now=100.0))
+    assert sorted(evicted) == ["bad", "lobby"]
+    assert r.get_archived("bad") is None
+
+
+def test_declined_eviction_keeps_the_game():
+    games = {"g": table()}
+    r, evicted = reaper(games, keep={"g"})
+    r.expired(now=0.0)
+    asyncio.run(r.sweep(now=100.0))
+    assert "g" in games and r.get_stats()["evicted_games"] == 0
@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+
+from app.shard import WS_REDIRECT, HashRing, Shard, ShardRouter, game_id_of
+
+NODES = ["http://w1:8001", "http://w2:8002", "http://w3:8003"]
+KEYS = [f"game-{i}" for i in range(3000)]
+
+
+def test_ring_is_deterministic_and_balanced():
+    a, b = HashRing(NODES), HashRing(list(reversed(NODES)))
+    owners = [a.owner(k) for k in KEYS]
+    assert owners == [b.owner(k) for k in KEYS]
+    for node in NODES:
+        assert 600 < owners.count(node) < 1400
+
+
+def test_adding_a_node_only_moves_keys_to_it():
+    before = HashRing(NODES)
+    after = HashRing(NODES + ["http://w4:8004"])
+    moved = [k for k in KEYS if before.owner(k) != after.owner(k)]
+    assert all(after.owner(k) == "http://w4:8004" for k in moved)
+    assert len(moved) < len(KEYS) / 2
+
+
+def test_shard_configuration():
+    assert Shard().is_local("anything") and not Shard().enabled
+    assert Shard(["http://w1:8001"], "").is_local("anything") # one node owns everything
+    with pytest.raises(ValueError):
+        Shard(NODES, "http://elsewhere:9000")
+    shard = Shard([n + "/" for n in NODES], NODES[0] + "/")
+    assert shard.enabled and shard.me == NODES[0]
+    assert sum(shard.is_local(k) for k in KEYS) == sum(shard.owner(k) == NODES[0] for k in KEYS)
+
+
+def test_game_paths():
+    assert game_id_of("/move/g1/p1") == "g1"
+    assert game_id_of("/ws/g1/p1") == "g1"
+    assert game_id_of("/join/g1") == "g1"
+    assert game_id_of("/ws/queue") is None and game_id_of("/create") is None
+
+
+def route(scope: dict, shard: Shard) -> tuple[list[dict], bool]:
+    sent: list[dict] = []
+    reached: list[bool] = []
+
+    async def app(scope, receive, send):
+        reached.append(True)
+
+    async def receive():
+        return {"type": "websocket.connect"}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(ShardRouter(app, shard)(scope, receive, send))
+    return sent, bool(reached)
+
+
+def foreign_game(shard: Shard) -> str:
+    return next(k for k in KEYS if not shard.is_local(k))
+
+
+def test_http_request_for_a_foreign_game_is_redirected_with_its_query():
+    shard = Shard(NODES, NODES[0])
+    gid = foreign_game(shard)
+    sent, reached = route({"type": "http", "path": f"/move/{gid}/p1", "query_string": b"fmt=bin&x=1"}, shard)
+    assert not reached and sent[0]["status"] == 307
+    assert dict(sent[0]["headers"])[b"location"] == f"{shard.owner(gid)}/move/{gid}/p1?fmt=bin&x=1".encode()
+
+
+def test_websocket_for_a_foreign_game_is_closed_with_the_owner():
+    shard = Shard(NODES, NODES[0])
+    gid = foreign_game(shard)
+    sent, reached = route({"type": "websocket", "path": f"/ws/{gid}/p1", "query_string": b""}, shard)
+    assert not reached
+    assert sent == [
+        {"type": "websocket.accept"},
+        {"type": "websocket.close", "code": WS_REDIRECT, "reason": "ws" + shard.owner(gid)[4:]},
+    ]
+
+
+def test_local_games_and_other_paths_pass_through():
+    shard = Shard(NODES, NODES[0])
+    local = next(k for k in KEYS if shard.is_local(k))
+    assert route({"type": "http", "path": f"/join/{local}", "query_string": b""}, shard) == ([], True)
+    assert route({"type": "http", "path": "/create", "query_string": b""}, shard) == ([], True)
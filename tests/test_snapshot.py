@@ -0,0 +1,64 @@
+import asyncio
+
+from app.game import Game
+from app.snapshot import Snapshotter, load
+
+
+def table(seed: int, started: bool = True) -> Game:
+    game = Game(3, seed=seed)
+    for pid in ("a", "b", "c"):
+        game.add_player(pid)
+    if started:
+        game.start_game()
+    return game
+
+
+def test_round_trip_restores_every_live_game(tmp_path):
+    games = {f"g{i}": table(i, started=bool(i % 2)) for i in range(5)}
+    snap = Snapshotter(games, str(tmp_path / "games.snap"), batch=2)
+    assert asyncio.run(snap.flush()) == 5
+
+    restored = load(snap.path)
+    assert sorted(restored) == sorted(games)
+    for gid, game in games.items():
+        assert restored[gid].dump() == game.dump()
+        assert restored[gid].get_personal_state("a") == game.get_personal_state("a")
+
+
+def test_only_changed_games_are_written_and_evicted_ones_are_dropped(tmp_path):
+    games = {"a": table(1), "b": table(2), "c": table(3)}
+    snap = Snapshotter(games, str(tmp_path / "games.snap"))
+    asyncio.run(snap.flush())
+    games["a"].quit_player("c")
+    del games["b"]
+    assert asyncio.run(snap.flush()) == 2 # one update, one tombstone
+    assert asyncio.run(snap.flush()) == 0
+
+    restored = load(snap.path)
+    assert sorted(restored) == ["a", "c"]
+    assert restored["a"].version == games["a"].version
+
+
+def test_finished_games_are_not_restored(tmp_path):
+    games = {"done": table(1), "live": table(2)}
+    games["done"].finished = True
+    snap = Snapshotter(games, str(tmp_path / "games.snap"))
+    asyncio.run(snap.flush())
+    assert list(load(snap.path)) == ["live"]
+
+
+def test_pass_yields_between_batches_and_tolerates_evictions(tmp_path):
+    games = {f"g{i}": table(i) for i in range(6)}
+    snap = Snapshotter(games, str(tmp_path / "games.snap"), batch=2)
+
+    async def run():
+        async def evict_during_pass():
+            await asyncio.sleep(0) # runs after the first batch
+            del games["g5"]
+            games["new"] = table(99)
+
+        _, rows = await asyncio.gather(evict_during_pass(), snap.collect())
+        return rows
+
+    rows = asyncio.run(run())
+    assert sorted(gid for gid, _, _ in rows) == ["g0", "g1", "g2", "g3", "g4"]
@@ -0,0 +1,70 @@
+import asyncio
+import multiprocessing
+import os
+import time
+
+import pytest
+
+from app.game import Game
+from app.store import GameStore, MemoryStore, SharedStore, serve
+
+
+def lobby_game() -> Game:
+    game = Game(3, seed=2)
+    game.add_player("a")
+    return game
+
+
+def test_incomplete_backend_fails_on_construction():
+    class Partial(GameStore):
+        def get(self, game_id):
+            return None
+
+    with pytest.raises(TypeError):
+        Partial()
+
+
+def test_memory_store_keeps_games_in_process():
+    store = MemoryStore()
+    game = lobby_game()
+    store.put("g", game)
+    assert store.get("g") is game and store.games == {"g": game}
+    assert "g" in store and store.ids() == ["g"]
+    store.delete("g")
+    assert "g" not in store and store.get("g") is None
+
+
+@pytest.fixture
+def table_server(tmp_path):
+    address = str(tmp_path / "store.sock")
+    proc = multiprocessing.get_context("fork").Process(target=serve, args=(address, b"test"), daemon=True)
+    proc.start()
+    deadline = time.monotonic() + 5
+    while not os.path.exists(address):
+        assert time.monotonic() < deadline, "table server did not start"
+        time.sleep(0.01)
+    yield address
+    proc.terminate()
+    proc.join()
+
+
+def test_shared_store_replicates_writes_and_preloads_owned_games(table_server):
+    async def run():
+        writer = SharedStore(table_server, b"test")
+        game = lobby_game()
+        writer.put("mine", game)
+        game.add_player("b")
+        writer.put("mine", game)
+        writer.put("theirs", lobby_game())
+        writer.put("gone", lobby_game())
+        writer.delete("gone")
+        await writer.flush()
+
+        restarted = SharedStore(table_server, b"test")
+        assert restarted.ids() == [] # nothing is read until preload
+        loaded = await restarted.preload(lambda gid: gid != "theirs")
+        assert list(loaded) == ["mine"]
+        assert loaded["mine"].version == game.version
+        assert list(loaded["mine"].pid_int_map) == ["a", "b"]
+
+    asyncio.run(run())